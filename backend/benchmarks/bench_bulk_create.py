@@ -0,0 +1,73 @@
+"""
+Пропускная способность создания карточек: по одной и пакетами.
+
+Приложение запускается в процессе через httpx.ASGITransport, поэтому
+измеряется работа API и БД без сетевых накладных расходов. Используется
+БД из DATABASE_URL; таблицы создаются при необходимости.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_bulk_create --cards 500 --batch-size 100
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from benchmarks.common import make_jpeg, register_and_login
+
+
+async def _run(cards: int, batch_size: int) -> list[dict]:
+    from httpx import ASGITransport, AsyncClient
+    from src.core.db_session import create_db_and_tables
+    from src.core.main import app
+
+    await create_db_and_tables()
+    images = [make_jpeg(seed) for seed in range(cards * 2)]
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        headers = await register_and_login(client, f"bench-{uuid.uuid4().hex[:8]}@example.com")
+        results = []
+
+        start = time.perf_counter()
+        for i in range(cards):
+            response = await client.post(
+                "/api/cards/",
+                headers=headers,
+                data={"title": f"Card {i}", "description": "single", "price": "10"},
+                files={"file": (f"{i}.jpg", images[i], "image/jpeg")},
+            )
+            response.raise_for_status()
+        elapsed = time.perf_counter() - start
+        results.append({"mode": "single", "cards": cards, "seconds": round(elapsed, 3),
+                        "cards_per_second": round(cards / elapsed, 2)})
+
+        start = time.perf_counter()
+        created = 0
+        for offset in range(0, cards, batch_size):
+            chunk = range(offset, min(offset + batch_size, cards))
+            items = [{"title": f"Card {i}", "description": "batch", "price": 10} for i in chunk]
+            files = [("files", (f"{i}.jpg", images[cards + i], "image/jpeg")) for i in chunk]
+            response = await client.post(
+                "/api/cards/batch", headers=headers, data={"items": json.dumps(items)}, files=files
+            )
+            response.raise_for_status()
+            created += response.json()["created"]
+        elapsed = time.perf_counter() - start
+        results.append({"mode": "batch", "cards": created, "batch_size": batch_size, "seconds": round(elapsed, 3),
+                        "cards_per_second": round(created / elapsed, 2)})
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    for result in asyncio.run(_run(args.cards, args.batch_size)):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Задержка поиска похожих фото по индексу векторов признаков (EmbeddingIndex).
+
+Индекс заполняется случайными нормированными векторами, после чего
+измеряется задержка одиночных запросов и пакетов запросов. Для части
+запросов результат сверяется с полным перебором.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_embedding_search --vectors 1000000 --queries 200 --batch 16
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import latency_summary, peak_rss_mb
+
+
+def _build_index(index, count: int, chunk: int, rng: np.random.Generator) -> float:
+    """Заполняет индекс порциями и возвращает время заполнения в секундах"""
+    start = time.perf_counter()
+    for offset in range(0, count, chunk):
+        size = min(chunk, count - offset)
+        vectors = rng.standard_normal((size, index.dim), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        index.add_many(range(offset, offset + size), vectors)
+    return time.perf_counter() - start
+
+
+def _exact_top_k(index, query: np.ndarray, k: int) -> list[int]:
+    """Полный перебор для сверки результатов"""
+    vectors = np.asarray(np.memmap(index._vectors_path, dtype=np.float32, mode="r").reshape(-1, index.dim))
+    scores = vectors @ (query / np.linalg.norm(query))
+    return [int(row) for row in np.argsort(-scores)[:k]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=16, help="Размер пакета запросов")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--block-rows", type=int, default=65536)
+    parser.add_argument("--verify", type=int, default=5, help="Число запросов для сверки с полным перебором")
+    args = parser.parse_args()
+
+    from src.cards.embeddings import EmbeddingIndex
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        index = EmbeddingIndex(directory, block_rows=args.block_rows)
+        build_seconds = _build_index(index, args.vectors, 100_000, rng)
+        queries = rng.standard_normal((args.queries, index.dim), dtype=np.float32)
+
+        # Прогрев: первый проход отображает файл и загружает его в page cache
+        index.search(queries[:1], args.k)
+
+        single = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, args.k)
+            single.append(time.perf_counter() - start)
+
+        batched = []
+        for offset in range(0, len(queries), args.batch):
+            batch = queries[offset:offset + args.batch]
+            start = time.perf_counter()
+            index.search(batch, args.k)
+            # Задержка в пересчете на один запрос пакета
+            batched.extend([(time.perf_counter() - start) / len(batch)] * len(batch))
+
+        verified = all(
+            [match[0] for match in index.search(query, args.k)[0]] == _exact_top_k(index, query, args.k)
+            for query in queries[:args.verify]
+        )
+
+        print(json.dumps({
+            "vectors": args.vectors,
+            "dim": index.dim,
+            "k": args.k,
+            "index_mb": round(os.path.getsize(index._vectors_path) / (1024 * 1024), 2),
+            "build_seconds": round(build_seconds, 2),
+            "single_query": latency_summary(single),
+            "batched_query_per_item": latency_summary(batched),
+            "batch": args.batch,
+            "matches_exact_search": verified,
+            "peak_rss_mb": round(peak_rss_mb(), 2),
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
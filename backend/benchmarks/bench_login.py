@@ -0,0 +1,86 @@
+"""
+Задержка проверки пароля argon2 под конкурентной нагрузкой.
+
+Сравниваются два режима:
+    inline — verify_password прямо в event loop (поведение до выноса в пул);
+    pool   — verify_password_async через ограниченный пул потоков.
+
+Кроме задержки самих логинов измеряется задержка event loop: фоновая
+задача засыпает на 10 мс, и превышение этого времени показывает, насколько
+остальные запросы воркера стоят в очереди за хэшированием.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_login --concurrency 32 --requests 256
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import latency_summary
+
+
+async def _heartbeat(lags: list[float], stop: asyncio.Event, interval: float = 0.01) -> None:
+    """Фиксирует, насколько позже запланированного просыпается event loop"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def _run(mode: str, concurrency: int, total: int, password_hash: str) -> dict:
+    from fastapi import HTTPException
+    from src.auth.utils import verify_password, verify_password_async
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    rejected = 0
+
+    async def login() -> None:
+        nonlocal rejected
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if mode == "inline":
+                    verify_password("benchmark-password", password_hash)
+                else:
+                    await verify_password_async("benchmark-password", password_hash)
+            except HTTPException:
+                rejected += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    lags: list[float] = []
+    stop = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await heartbeat
+
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "rejected_503": rejected,
+        "login": latency_summary(latencies),
+        "event_loop_lag": latency_summary(lags),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=256)
+    args = parser.parse_args()
+
+    from src.auth.utils import get_password_hash
+
+    password_hash = get_password_hash("benchmark-password")
+    for mode in ("inline", "pool"):
+        print(json.dumps(asyncio.run(_run(mode, args.concurrency, args.requests, password_hash))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Микробенчмарки горячих функций API.
+
+    photo_hashed_name — имя файла фото при загрузке;
+    zip_create        — create_zip_archive (архив в памяти);
+    zip_stream        — iter_zip_archive (потоковая выгрузка, как в API);
+    jwt_encode        — create_access_token при логине;
+    jwt_decode        — проверка токена в get_current_user;
+    argon2_verify     — verify_password с параметрами хэширования из Settings.
+
+Каждая функция сначала прогревается, затем вызывается --iterations раз
+(для argon2 и ZIP — меньше, они на порядки медленнее); по задержкам
+отдельных вызовов считаются ops/s и p50/p95/p99 в микросекундах.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_micro --iterations 10000
+    python -m benchmarks.bench_micro --only jwt_encode,jwt_decode
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Callable
+
+from benchmarks.common import latency_summary, peak_rss_mb
+
+# Доля --iterations для медленных функций
+_SLOW_FRACTION = 100
+
+
+def _measure(name: str, func: Callable[[], object], iterations: int, warmup: int = 3) -> dict:
+    """Вызывает func iterations раз и возвращает пропускную способность и перцентили задержки"""
+    for _ in range(warmup):
+        func()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+    return {
+        "name": name,
+        "ops_per_second": round(iterations / elapsed, 2),
+        **latency_summary(latencies, unit="us"),
+    }
+
+
+def _prepare_photos(directory: str, count: int, size_kb: int) -> list[str]:
+    """Создает несжимаемые файлы, имитирующие JPEG, и возвращает их имена"""
+    names = []
+    for i in range(count):
+        name = f"{i:06d}.jpg"
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(os.urandom(size_kb * 1024))
+        names.append(name)
+    return names
+
+
+def _cases(iterations: int, zip_files: int, zip_size_kb: int, directory: str) -> dict[str, tuple[Callable, int]]:
+    """Функции бенчмарков с числом итераций для каждой"""
+    from src.auth.utils import create_access_token, decode_token, get_password_hash, verify_password
+    from src.core.storage import LocalPhotoStorage
+    from src.core.utils import create_zip_archive, iter_zip_archive, photo_hashed_name
+
+    names = _prepare_photos(directory, zip_files, zip_size_kb)
+    paths = [os.path.join(directory, name) for name in names]
+    storage = LocalPhotoStorage(directory)
+    token = create_access_token({"sub": "1"})
+    password_hash = get_password_hash("benchmark-password")
+    slow = max(iterations // _SLOW_FRACTION, 10)
+
+    def zip_create() -> None:
+        create_zip_archive([open(path, "rb") for path in paths]).getbuffer()
+
+    def zip_stream() -> None:
+        async def drain() -> None:
+            async for _ in iter_zip_archive(names, storage=storage):
+                pass
+        asyncio.run(drain())
+
+    return {
+        "photo_hashed_name": (lambda: photo_hashed_name("bench@example.com"), iterations),
+        "zip_create": (zip_create, slow),
+        "zip_stream": (zip_stream, slow),
+        "jwt_encode": (lambda: create_access_token({"sub": "1"}), iterations),
+        "jwt_decode": (lambda: decode_token(token), iterations),
+        "argon2_verify": (lambda: verify_password("benchmark-password", password_hash), slow),
+    }
+
+
+def run(iterations: int, zip_files: int, zip_size_kb: int, only: list[str]) -> dict:
+    """Выполняет выбранные микробенчмарки и возвращает результаты"""
+    with tempfile.TemporaryDirectory() as directory:
+        cases = _cases(iterations, zip_files, zip_size_kb, directory)
+        unknown = set(only) - set(cases)
+        if unknown:
+            raise SystemExit(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+        results = [
+            _measure(name, func, count)
+            for name, (func, count) in cases.items()
+            if not only or name in only
+        ]
+    return {
+        "benchmark": "micro",
+        "zip_files": zip_files,
+        "zip_size_kb": zip_size_kb,
+        "results": results,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--zip-files", type=int, default=20)
+    parser.add_argument("--zip-size-kb", type=int, default=256)
+    parser.add_argument("--only", default="", help="comma-separated benchmark names")
+    args = parser.parse_args()
+
+    only = [name for name in args.only.split(",") if name]
+    print(json.dumps(run(args.iterations, args.zip_files, args.zip_size_kb, only)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Стоимость построения и сериализации ответа со списком карточек.
+
+Сравниваются два пути для страницы из --cards карточек:
+    before — ORM объекты Card, CardInDB.model_validate для каждой, затем
+             FastAPI превращает ответ в dict, валидирует его по
+             response_model повторно и сериализует через json.dumps;
+    after  — строки со столбцами CARD_OUT_COLUMNS, один вызов
+             card_list_adapter.validate_python и ModelResponse
+             (model_dump_json в pydantic-core, без повторной валидации).
+
+Карточки загружаются из SQLite в памяти, поэтому замер включает и
+загрузку строк из БД (ORM объекты против кортежей); build — построение
+моделей, serialize — получение тела ответа.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_serialization --cards 10000 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from benchmarks.common import latency_summary, peak_rss_mb
+
+
+def _prepare(cards: int):
+    """Создает SQLite в памяти с cards карточками одного пользователя"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from src.core.base_model import Base
+    from src.user.model import User
+    from src.cards.model import Card
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(email="bench@example.com", password="hash")
+        session.add(user)
+        session.flush()
+        now = datetime.utcnow()
+        session.add_all(
+            Card(
+                title=f"Card {i}",
+                description="Serialization benchmark card",
+                price=10.5 + i,
+                photo_path=f"ab/cd/{i:064x}.jpg",
+                content_hash=f"{i:064x}",
+                variants={"thumb": f"ab/cd/{i:064x}.thumb.jpg", "medium": f"ab/cd/{i:064x}.medium.jpg"},
+                width=1920,
+                height=1080,
+                orientation="landscape",
+                byte_size=350_000,
+                image_format="JPEG",
+                captured_at=now,
+                dominant_color="#a0b0c0",
+                user_id=user.id,
+                created_at=now,
+                updated_at=now,
+            )
+            for i in range(cards)
+        )
+        session.commit()
+    return engine
+
+
+def _before(session, user_id: int) -> tuple[float, float, int]:
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    from sqlalchemy import select
+    from src.cards.model import Card
+    from src.cards.schemas import CardInDB, CardPage
+
+    field = create_model_field(name="Response", type_=CardPage, mode="serialization")
+    start = time.perf_counter()
+    cards = session.execute(select(Card).where(Card.user_id == user_id)).scalars().all()
+    page = CardPage(items=[CardInDB.model_validate(card) for card in cards])
+    built = time.perf_counter()
+    # То же, что делает FastAPI для обработчика с response_model: dump модели,
+    # повторная валидация по response_model, сериализация в dict и json.dumps
+    content = asyncio.run(serialize_response(field=field, response_content=page))
+    body = JSONResponse(content).body
+    session.expunge_all()
+    return built - start, time.perf_counter() - built, len(body)
+
+
+def _after(session, user_id: int) -> tuple[float, float, int]:
+    from sqlalchemy import select
+    from src.cards.model import Card
+    from src.cards.repository import CARD_OUT_COLUMNS
+    from src.cards.schemas import CardPage, card_list_adapter
+    from src.core.responses import ModelResponse
+
+    start = time.perf_counter()
+    rows = session.execute(select(*CARD_OUT_COLUMNS).where(Card.user_id == user_id)).all()
+    page = CardPage(items=card_list_adapter.validate_python(rows, from_attributes=True))
+    built = time.perf_counter()
+    body = ModelResponse(page).body
+    return built - start, time.perf_counter() - built, len(body)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from sqlalchemy.orm import Session
+
+    engine = _prepare(args.cards)
+    results = []
+    with Session(engine) as session:
+        for name, variant in (("before", _before), ("after", _after)):
+            variant(session, 1)
+            build, serialize, total = [], [], []
+            for _ in range(args.repeat):
+                build_seconds, serialize_seconds, body_size = variant(session, 1)
+                build.append(build_seconds)
+                serialize.append(serialize_seconds)
+                total.append(build_seconds + serialize_seconds)
+            results.append({
+                "name": name,
+                "cards": args.cards,
+                "body_bytes": body_size,
+                "build": latency_summary(build),
+                "serialize": latency_summary(serialize),
+                **latency_summary(total),
+            })
+    print(json.dumps({"benchmark": "serialization", "results": results, "peak_rss_mb": round(peak_rss_mb(), 1)}))
+
+
+if __name__ == "__main__":
+    main()
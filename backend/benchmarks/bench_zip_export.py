@@ -0,0 +1,96 @@
+"""
+Сравнение выгрузки ZIP архива: create_zip_archive (BytesIO) и iter_zip_archive (поток).
+
+Каждый вариант запускается в отдельном процессе, чтобы пиковый RSS
+не смешивался между замерами.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_zip_export --files 500 --size-kb 2048
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import peak_rss_mb
+
+
+def _prepare_photos(directory: str, count: int, size_kb: int) -> None:
+    """Создает несжимаемые файлы, имитирующие JPEG"""
+    for i in range(count):
+        with open(os.path.join(directory, f"{i:06d}.jpg"), "wb") as f:
+            f.write(os.urandom(size_kb * 1024))
+
+
+def _run_variant(variant: str, directory: str) -> dict:
+    """Выполняет один вариант выгрузки в текущем процессе и возвращает метрики"""
+    from src.core.storage import LocalPhotoStorage
+    from src.core.utils import create_zip_archive, get_photo_file, iter_zip_archive
+
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+    baseline_rss = peak_rss_mb()
+    start = time.perf_counter()
+    ttfb = None
+    total_bytes = 0
+
+    if variant == "legacy":
+        files = [get_photo_file(path) for path in paths]
+        buffer = create_zip_archive(files)
+        while chunk := buffer.read(64 * 1024):
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+            total_bytes += len(chunk)
+    else:
+        async def drain() -> None:
+            nonlocal ttfb, total_bytes
+            async for chunk in iter_zip_archive(paths, storage=LocalPhotoStorage(directory)):
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                total_bytes += len(chunk)
+
+        asyncio.run(drain())
+
+    return {
+        "variant": variant,
+        "ttfb_ms": round((ttfb or 0.0) * 1000, 2),
+        "total_ms": round((time.perf_counter() - start) * 1000, 2),
+        "archive_mb": round(total_bytes / (1024 * 1024), 2),
+        "peak_rss_mb": round(peak_rss_mb(), 2),
+        "rss_growth_mb": round(peak_rss_mb() - baseline_rss, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--size-kb", type=int, default=1024)
+    parser.add_argument("--worker", choices=["legacy", "stream"], help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(_run_variant(args.worker, args.dir)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        _prepare_photos(directory, args.files, args.size_kb)
+        results = []
+        for variant in ("legacy", "stream"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_zip_export", "--worker", variant, "--dir", directory],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    for result in results:
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
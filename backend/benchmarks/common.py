@@ -0,0 +1,87 @@
+import resource
+import sys
+
+
+def peak_rss_mb() -> float:
+    """
+    Возвращает пиковый RSS текущего процесса в мегабайтах.
+
+    ru_maxrss на Linux измеряется в килобайтах, на macOS — в байтах.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """
+    Возвращает перцентиль выборки методом ближайшего ранга.
+
+    Args:
+        values: Значения выборки
+        pct: Перцентиль от 0 до 100
+
+    Returns:
+        Значение перцентиля или 0.0 для пустой выборки
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+# Множители перевода секунд в единицы сводки задержек
+_LATENCY_UNITS = {"ms": 1000, "us": 1000 * 1000}
+
+
+def latency_summary(latencies: list[float], unit: str = "ms") -> dict:
+    """Сводка задержек в миллисекундах (unit="ms") или микросекундах (unit="us"): p50/p95/p99 и максимум"""
+    scale = _LATENCY_UNITS[unit]
+    return {
+        "count": len(latencies),
+        f"p50_{unit}": round(percentile(latencies, 50) * scale, 2),
+        f"p95_{unit}": round(percentile(latencies, 95) * scale, 2),
+        f"p99_{unit}": round(percentile(latencies, 99) * scale, 2),
+        f"max_{unit}": round(max(latencies, default=0.0) * scale, 2),
+    }
+
+
+def make_jpeg(seed: int, size: int = 256) -> bytes:
+    """
+    Создает уникальное JPEG изображение.
+
+    Содержимое зависит от seed, поэтому разные вызовы не схлопываются
+    дедупликацией контентно-адресуемого хранилища.
+    """
+    import io
+    import random
+    from PIL import Image
+
+    rng = random.Random(seed)
+    image = Image.new("RGB", (size, size), tuple(rng.randrange(256) for _ in range(3)))
+    pixels = image.load()
+    for _ in range(size * 4):
+        pixels[rng.randrange(size), rng.randrange(size)] = tuple(rng.randrange(256) for _ in range(3))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+async def register_and_login(client, email: str, password: str = "benchmark-password") -> dict:
+    """
+    Регистрирует пользователя (если его еще нет) и возвращает заголовки авторизации.
+
+    Args:
+        client: httpx.AsyncClient, подключенный к приложению
+        email: Email пользователя
+        password: Пароль пользователя
+
+    Returns:
+        Заголовки с Bearer токеном
+    """
+    await client.post("/api/auth/register", json={"email": email, "password": password, "full_name": "Benchmark"})
+    response = await client.post("/api/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
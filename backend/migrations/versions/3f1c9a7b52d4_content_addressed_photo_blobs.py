@@ -0,0 +1,45 @@
+"""Content addressed photo blobs
+
+Revision ID: 3f1c9a7b52d4
+Revises: cd3adc0e2880
+Create Date: 2026-10-18 10:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7b52d4'
+down_revision: Union[str, Sequence[str], None] = 'cd3adc0e2880'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('photo_blobs',
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('photo_path', sa.String(length=255), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_photo_blobs_content_hash'), 'photo_blobs', ['content_hash'], unique=True)
+    op.create_index(op.f('ix_photo_blobs_id'), 'photo_blobs', ['id'], unique=False)
+    op.add_column('cards', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_cards_content_hash'), 'cards', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_cards_content_hash'), table_name='cards')
+    op.drop_column('cards', 'content_hash')
+    op.drop_index(op.f('ix_photo_blobs_id'), table_name='photo_blobs')
+    op.drop_index(op.f('ix_photo_blobs_content_hash'), table_name='photo_blobs')
+    op.drop_table('photo_blobs')
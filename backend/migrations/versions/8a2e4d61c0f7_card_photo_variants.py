@@ -0,0 +1,28 @@
+"""Card photo variants
+
+Revision ID: 8a2e4d61c0f7
+Revises: 3f1c9a7b52d4
+Create Date: 2026-10-18 11:03:17.552091
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a2e4d61c0f7'
+down_revision: Union[str, Sequence[str], None] = '3f1c9a7b52d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('cards', sa.Column('variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('cards', 'variants')
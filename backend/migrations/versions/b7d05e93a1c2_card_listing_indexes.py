@@ -0,0 +1,38 @@
+"""Card listing indexes
+
+Revision ID: b7d05e93a1c2
+Revises: 8a2e4d61c0f7
+Create Date: 2026-10-18 12:41:55.310274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d05e93a1c2'
+down_revision: Union[str, Sequence[str], None] = '8a2e4d61c0f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в cards, но не может выполняться внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index('ix_cards_user_id_created_at_id', 'cards', ['user_id', 'created_at', 'id'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_cards_user_id_price', 'cards', ['user_id', 'price'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_cards_user_id_title', 'cards', ['user_id', 'title'],
+                        unique=False, postgresql_concurrently=True,
+                        postgresql_ops={'title': 'varchar_pattern_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_cards_user_id_title', table_name='cards', postgresql_concurrently=True)
+        op.drop_index('ix_cards_user_id_price', table_name='cards', postgresql_concurrently=True)
+        op.drop_index('ix_cards_user_id_created_at_id', table_name='cards', postgresql_concurrently=True)
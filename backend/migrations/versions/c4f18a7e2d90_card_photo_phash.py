@@ -0,0 +1,34 @@
+"""Card photo perceptual hash
+
+Revision ID: c4f18a7e2d90
+Revises: b7d05e93a1c2
+Create Date: 2026-10-18 13:22:07.518903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f18a7e2d90'
+down_revision: Union[str, Sequence[str], None] = 'b7d05e93a1c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('cards', sa.Column('phash', sa.BigInteger(), nullable=True))
+    # Индекс по updated_at нужен для инкрементального обновления индекса похожих фото
+    with op.get_context().autocommit_block():
+        op.create_index('ix_cards_updated_at', 'cards', ['updated_at'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_cards_updated_at', table_name='cards', postgresql_concurrently=True)
+    op.drop_column('cards', 'phash')
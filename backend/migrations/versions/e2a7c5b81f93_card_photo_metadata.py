@@ -0,0 +1,53 @@
+"""Card photo metadata
+
+Revision ID: e2a7c5b81f93
+Revises: 5d9b3e7f1a46
+Create Date: 2026-10-18 14:48:12.307514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a7c5b81f93'
+down_revision: Union[str, Sequence[str], None] = '5d9b3e7f1a46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Столбцы без значения по умолчанию добавляются без перезаписи таблицы;
+    # существующие карточки заполняет python -m src.cards.backfill_metadata
+    op.add_column('cards', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('cards', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('cards', sa.Column('orientation', sa.String(length=10), nullable=True))
+    op.add_column('cards', sa.Column('byte_size', sa.BigInteger(), nullable=True))
+    op.add_column('cards', sa.Column('image_format', sa.String(length=10), nullable=True))
+    op.add_column('cards', sa.Column('captured_at', sa.DateTime(), nullable=True))
+    op.add_column('cards', sa.Column('dominant_color', sa.String(length=7), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index('ix_cards_user_id_orientation_width', 'cards', ['user_id', 'orientation', 'width'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_cards_user_id_height', 'cards', ['user_id', 'height'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_cards_user_id_captured_at', 'cards', ['user_id', 'captured_at'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_cards_user_id_captured_at', table_name='cards', postgresql_concurrently=True)
+        op.drop_index('ix_cards_user_id_height', table_name='cards', postgresql_concurrently=True)
+        op.drop_index('ix_cards_user_id_orientation_width', table_name='cards', postgresql_concurrently=True)
+    op.drop_column('cards', 'dominant_color')
+    op.drop_column('cards', 'captured_at')
+    op.drop_column('cards', 'image_format')
+    op.drop_column('cards', 'byte_size')
+    op.drop_column('cards', 'orientation')
+    op.drop_column('cards', 'height')
+    op.drop_column('cards', 'width')
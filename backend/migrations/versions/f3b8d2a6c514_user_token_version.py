@@ -0,0 +1,34 @@
+"""User token version
+
+Revision ID: f3b8d2a6c514
+Revises: e2a7c5b81f93
+Create Date: 2026-10-18 16:12:44.519306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d2a6c514'
+down_revision: Union[str, Sequence[str], None] = 'e2a7c5b81f93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Постоянное значение по умолчанию добавляется без перезаписи таблицы (PostgreSQL 11+)
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_revoked_updated_at', 'users', ['updated_at'], unique=False,
+                        postgresql_where=sa.text('token_version > 0'), postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_revoked_updated_at', table_name='users', postgresql_concurrently=True)
+    op.drop_column('users', 'token_version')
@@ -3,15 +3,15 @@ from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.auth.service import AuthService
-from src.core.db_session import get_db
+from src.core.db_session import get_read_db
 from src.core.service_factory import ServiceFactory
-from src.user.schemas import UserInDB
+from src.user.schemas import CurrentUser
 from src.auth.service import oauth2_scheme
 
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
-    db: Annotated[AsyncSession, Depends(get_db)]
-) -> UserInDB:
+    db: Annotated[AsyncSession, Depends(get_read_db)]
+) -> CurrentUser:
     """Зависимость для получения текущего пользователя по токену"""
     auth_service = ServiceFactory.create(AuthService, db)
     user = await auth_service.get_current_user(token)
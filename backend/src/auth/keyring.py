@@ -0,0 +1,151 @@
+from datetime import datetime, timezone
+from typing import Optional
+import json
+import logging
+import os
+import time
+from pydantic import BaseModel, model_validator
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class KeyringFile(BaseModel):
+    """
+    Формат файла ключей подписи JWT_KEYS_FILE.
+
+    Пример:
+        {"active_kid": "2026-10", "keys": {"2026-10": "<секрет>", "2026-07": "<предыдущий секрет>"}}
+    """
+    active_kid: str
+    keys: dict[str, str]
+
+    @model_validator(mode="after")
+    def _check_active_kid(self) -> "KeyringFile":
+        if self.active_kid not in self.keys:
+            raise ValueError(f"Active key {self.active_kid!r} is not in keys")
+        return self
+
+
+class SigningKeyring:
+    """
+    Ключи подписи JWT в памяти процесса.
+
+    Новые токены подписываются активным ключом, его идентификатор
+    записывается в заголовок kid; проверяются токены, подписанные любым
+    ключом из набора. Файл ключей перечитывается без перезапуска, если
+    изменилось время его модификации (проверяется не чаще раза в
+    reload_seconds). Ротация: добавить новый ключ, сделать его активным,
+    а старый удалить после истечения срока выданных им refresh токенов.
+
+    Без файла ключей используется один ключ SECRET_KEY с kid "default".
+    Токены без kid (выданные до появления ключей) проверяются SECRET_KEY,
+    пока файла ключей нет. С файлом ключей они принимаются только до
+    legacy_until: иначе ротация никогда не выводила бы SECRET_KEY из
+    обращения, и его владелец мог бы выпускать токены без kid бессрочно.
+    """
+    def __init__(
+        self,
+        secret_key: str,
+        keys_file: Optional[str] = None,
+        reload_seconds: float = 10,
+        legacy_until: Optional[datetime] = None
+    ):
+        """
+        Инициализация набора ключей
+
+        Args:
+            secret_key: Ключ по умолчанию и ключ проверки токенов без kid
+            keys_file: Путь к JSON файлу ключей (формат KeyringFile)
+            reload_seconds: Минимальный интервал между проверками изменения файла
+            legacy_until: До какого момента при файле ключей принимать токены без kid
+                (время без пояса считается UTC); None — не принимать
+
+        Raises:
+            ValueError: если файл ключей не удалось прочитать
+        """
+        self.secret_key = secret_key
+        self.keys_file = os.path.expanduser(keys_file) if keys_file else None
+        self.reload_seconds = reload_seconds
+        if legacy_until is not None and legacy_until.tzinfo is None:
+            legacy_until = legacy_until.replace(tzinfo=timezone.utc)
+        self.legacy_until = legacy_until
+        self.active_kid = "default"
+        self._keys: dict[str, str] = {"default": secret_key}
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        if self.keys_file:
+            self._load(self.keys_file, os.stat(self.keys_file).st_mtime)
+
+    def _load(self, path: str, mtime: float) -> None:
+        with open(path) as keys_file:
+            keyring = KeyringFile.model_validate(json.load(keys_file))
+        self._keys = keyring.keys
+        self.active_kid = keyring.active_kid
+        self._mtime = mtime
+        logger.info("Loaded %d JWT signing keys, active kid %s", len(self._keys), self.active_kid)
+
+    def maybe_reload(self, force: bool = False) -> None:
+        """
+        Перечитывает файл ключей, если он изменился.
+
+        Ошибка чтения не сбрасывает уже загруженные ключи: она логируется,
+        а испорченный файл перечитывается после следующего изменения.
+
+        Args:
+            force: Проверить файл, не дожидаясь reload_seconds
+        """
+        if not self.keys_file:
+            return
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_seconds:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.keys_file).st_mtime
+        except OSError:
+            logger.exception("Failed to stat JWT signing keys file %s", self.keys_file)
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            self._load(self.keys_file, mtime)
+        except (OSError, ValueError):
+            # Испорченный файл не перечитывается, пока его не изменят снова
+            self._mtime = mtime
+            logger.exception("Failed to reload JWT signing keys from %s", self.keys_file)
+
+    def signing_key(self) -> tuple[str, str]:
+        """Идентификатор и секрет активного ключа"""
+        self.maybe_reload()
+        return self.active_kid, self._keys[self.active_kid]
+
+    def verification_key(self, kid: Optional[str]) -> Optional[str]:
+        """
+        Секрет для проверки токена с заголовком kid
+
+        Returns:
+            Секрет или None, если ключ неизвестен (в том числе уже выведен из набора)
+            или токены без kid больше не принимаются
+        """
+        if kid is None:
+            if not self.keys_file:
+                return self.secret_key
+            if self.legacy_until is not None and datetime.now(timezone.utc) < self.legacy_until:
+                return self.secret_key
+            return None
+        self.maybe_reload()
+        key = self._keys.get(kid)
+        if key is None:
+            # Другой воркер мог уже подписать токен новым ключом
+            self.maybe_reload(force=True)
+            key = self._keys.get(kid)
+        return key
+
+
+signing_keyring = SigningKeyring(
+    settings.SECRET_KEY,
+    keys_file=settings.JWT_KEYS_FILE,
+    reload_seconds=settings.JWT_KEYS_RELOAD_SECONDS,
+    legacy_until=settings.JWT_ACCEPT_LEGACY_UNTIL
+)
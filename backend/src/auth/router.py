@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
+from src.core.responses import ModelResponse
 from src.core.service_factory import ServiceFactory
-from src.user.schemas import UserInDB
-from .schemas import TokenResponse, LoginRequest
+from src.user.schemas import CurrentUser
+from .schemas import TokenResponse, LoginRequest, RefreshRequest
 from src.user.schemas import UserCreate
 from .service import AuthService
 from typing import Optional
@@ -10,6 +11,7 @@ from .service import oauth2_scheme
 from src.core.service_factory import ServiceFactory
 from src.user.service import UserService
 from .service import AuthService
+from .dependencies import get_current_user
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -18,9 +20,17 @@ async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     auth_service: AuthService = Depends(ServiceFactory.get_dependency(AuthService))
 ):
-    return await auth_service.authenticate_user(
+    return ModelResponse(await auth_service.authenticate_user(
         LoginRequest(email=form_data.username, password=form_data.password)
-    )
+    ))
+
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh(
+    refresh_data: RefreshRequest,
+    auth_service: AuthService = Depends(ServiceFactory.get_dependency(AuthService))
+):
+    """Обновление access токена по refresh токену без повторного ввода пароля"""
+    return ModelResponse(await auth_service.refresh_tokens(refresh_data))
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
 async def register(
@@ -30,6 +40,15 @@ async def register(
     """Регистрация нового пользователя"""
     return await auth_service.register_user(user_data)
 
+@router.post("/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_tokens(
+    current_user: CurrentUser = Depends(get_current_user),
+    auth_service: AuthService = Depends(ServiceFactory.get_dependency(AuthService))
+):
+    """Отзыв всех выданных пользователю токенов (выход на всех устройствах)"""
+    await auth_service.revoke_tokens(current_user.id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @router.get("/test-auth", dependencies=[Depends(ServiceFactory.get_dependency(AuthService))])
 async def test_auth():
     """Тестовый endpoint для проверки аутентификации"""
@@ -2,17 +2,49 @@ from fastapi import HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.core.config import settings
-from jose import jwt, JWTError
-from src.auth.utils import verify_password, create_access_token
+from jwt import InvalidTokenError
+from src.auth.utils import verify_password_async, create_access_token, create_refresh_token, decode_token
 from src.user.service import UserService
-from src.auth.schemas import LoginRequest, TokenResponse
+from src.user.cache import user_cache
+from src.auth.schemas import LoginRequest, RefreshRequest, TokenResponse
 from datetime import timedelta
 from typing import Optional
-from src.user.schemas import UserInDB, UserCreate
-from src.auth.utils import get_password_hash
+from src.user.schemas import CurrentUser, UserInDB, UserCreate
+from src.user.token_versions import token_versions
+from src.auth.utils import get_password_hash_async
+from src.core.metrics import registry
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+AUTH_TOKEN_CHECKS = registry.counter(
+    "auth_token_checks_total",
+    "Access token checks by result: claims (no database lookup), database (user cache or database), revoked, inactive",
+    ("result",)
+)
+
+
+def _issue_tokens(user: UserInDB) -> TokenResponse:
+    """Выдает пару access и refresh токенов"""
+    return TokenResponse(
+        access_token=create_access_token(
+            data=_token_claims(user),
+            expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        ),
+        refresh_token=create_refresh_token(data={"sub": str(user.id), "ver": user.token_version}),
+        expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    )
+
+
+def _token_claims(user: UserInDB) -> dict:
+    """Claims access токена, достаточные для аутентификации без запроса к БД"""
+    return {
+        "sub": str(user.id),
+        "email": user.email,
+        "name": user.full_name,
+        "active": user.is_active,
+        "ver": user.token_version,
+    }
+
 class AuthService:
     """
     Сервис аутентификации пользователей.
@@ -39,45 +71,121 @@ class AuthService:
             login_data: Данные для входа (email и пароль)
             
         Returns:
-            TokenResponse: Объект с access токеном
+            TokenResponse: Объект с access и refresh токенами
             
         Raises:
-            HTTPException: При неверных учетных данных
+            HTTPException: При неверных учетных данных, неактивном пользователе или перегрузке пула хэширования (503)
         """
         user = await self.user_service.get_user_by_email(login_data.email)
-        if not user or not verify_password(login_data.password, user.password):
+        if not user or not await verify_password_async(login_data.password, user.password):
             raise HTTPException(status_code=400, detail="Incorrect email or password")
-            
-        access_token = create_access_token(
-            data={"sub": str(user.id)},
-            expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        )
-        return TokenResponse(access_token=access_token)
+        if not user.is_active:
+            raise HTTPException(status_code=400, detail="Inactive user")
+        return _issue_tokens(user)
 
-    async def get_current_user(self, token: str) -> UserInDB:
+    async def refresh_tokens(self, refresh_data: RefreshRequest) -> TokenResponse:
+        """
+        Выдает новые токены по refresh токену без проверки пароля.
+
+        Вместо argon2 проверяется только HMAC подпись, а пользователь
+        загружается из БД, чтобы claims нового access токена были актуальны
+        и отозванный refresh токен (token_version) был отклонен.
+
+        Args:
+            refresh_data: Refresh токен, выданный при логине или предыдущем обновлении
+
+        Returns:
+            TokenResponse: Новые access и refresh токены
+
+        Raises:
+            HTTPException: При невалидном, истекшем или отозванном refresh токене
+                или неактивном пользователе
+        """
+        try:
+            payload = decode_token(refresh_data.refresh_token, token_type="refresh")
+            user_id = int(payload["sub"])
+        except (InvalidTokenError, KeyError, ValueError):
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+        user = await self.user_service.get(user_id)
+        if user is None or not user.is_active or payload.get("ver", 0) < user.token_version:
+            raise HTTPException(status_code=401, detail="Refresh token has been revoked")
+        return _issue_tokens(user)
+
+    async def get_current_user(self, token: str) -> CurrentUser:
         """
         Получает текущего пользователя по токену.
+
+        При AUTH_STATELESS_TOKENS пользователь строится из claims токена,
+        а отзыв проверяется по версиям токенов в памяти процесса: запрос
+        к БД нужен только для их периодического обновления. Иначе (и для
+        токенов, выданных без claims) пользователь сначала ищется в кэше,
+        и только при промахе загружается из БД. Кэш у каждого воркера свой,
+        поэтому запись из кэша сверяется с теми же версиями токенов: отзыв
+        токенов и смена пароля в другом воркере действуют не позже чем через
+        TOKEN_VERSION_REFRESH_SECONDS. Удаление пользователя тоже увеличивает
+        версию его токенов, поэтому действует в других воркерах в тот же срок.
         
         Args:
             token: JWT токен аутентификации
             
         Returns:
-            UserInDB: Данные пользователя
+            CurrentUser: Данные пользователя (UserInDB, если он загружен из кэша или БД)
             
         Raises:
-            HTTPException: При невалидном токене или отсутствии пользователя
+            HTTPException: При невалидном или отозванном токене, отсутствии
+                или неактивности пользователя
         """
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            payload = decode_token(token)
             user_id = payload.get("sub")
             if user_id is None:
                 raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        except JWTError:
+        except InvalidTokenError:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        user = await self.user_service.get(int(user_id))
+        user_id = int(user_id)
+        version = payload.get("ver")
+        if settings.AUTH_STATELESS_TOKENS and version is not None and "email" in payload:
+            if token_versions.is_stale(settings.TOKEN_VERSION_REFRESH_SECONDS):
+                await self.user_service.refresh_token_versions()
+            if not token_versions.is_current(user_id, version):
+                AUTH_TOKEN_CHECKS.inc(result="revoked")
+                raise HTTPException(status_code=401, detail="Token has been revoked")
+            if not payload.get("active", True):
+                AUTH_TOKEN_CHECKS.inc(result="inactive")
+                raise HTTPException(status_code=401, detail="Inactive user")
+            AUTH_TOKEN_CHECKS.inc(result="claims")
+            # Подпись проверена, поэтому повторная валидация claims не нужна
+            return CurrentUser.model_construct(
+                id=user_id,
+                email=payload["email"],
+                full_name=payload.get("name"),
+                is_active=True,
+                token_version=version
+            )
+
+        user = await user_cache.get(user_id)
+        if user is not None:
+            # Кэш своего воркера не видит отзывов в других воркерах: запись старше
+            # известной версии токенов пользователя перечитывается из БД
+            if token_versions.is_stale(settings.TOKEN_VERSION_REFRESH_SECONDS):
+                await self.user_service.refresh_token_versions()
+            if user.token_version < token_versions.get(user_id):
+                await user_cache.invalidate(user_id)
+                user = None
         if user is None:
-            raise HTTPException(status_code=404, detail="User not found")
+            user = await self.user_service.get(user_id)
+            if user is None:
+                raise HTTPException(status_code=404, detail="User not found")
+            await user_cache.set(user)
+        if version is not None and version < user.token_version:
+            AUTH_TOKEN_CHECKS.inc(result="revoked")
+            raise HTTPException(status_code=401, detail="Token has been revoked")
+        if not user.is_active:
+            AUTH_TOKEN_CHECKS.inc(result="inactive")
+            raise HTTPException(status_code=401, detail="Inactive user")
+        AUTH_TOKEN_CHECKS.inc(result="database")
         return user
 
     async def register_user(self, user_data: UserCreate) -> dict:
@@ -103,7 +211,7 @@ class AuthService:
             
         new_user = await self.user_service.create(UserCreate(
             email=user_data.email,
-            password=get_password_hash(user_data.password),
+            password=await get_password_hash_async(user_data.password),
             full_name=user_data.full_name)
             )
         
@@ -111,4 +219,20 @@ class AuthService:
             "message": "User registered successfully",
             "user_id": new_user.id,
             "email": new_user.email
-        }
\ No newline at end of file
+        }
+
+    async def revoke_tokens(self, user_id: int) -> None:
+        """
+        Отзывает все выданные пользователю токены.
+
+        В текущем воркере отзыв действует сразу, в остальных — после
+        обновления версий токенов (TOKEN_VERSION_REFRESH_SECONDS).
+
+        Args:
+            user_id: Идентификатор пользователя
+
+        Raises:
+            HTTPException: Если пользователь не найден
+        """
+        if await self.user_service.revoke_tokens(user_id) is None:
+            raise HTTPException(status_code=404, detail="User not found")
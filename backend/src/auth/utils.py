@@ -3,8 +3,16 @@ from typing import Optional
 import jwt
 from passlib.context import CryptContext
 from src.core.config import settings
+from src.core.executors import password_hash_pool
+from src.auth.keyring import signing_keyring
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=settings.ARGON2_TIME_COST,
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2__parallelism=settings.ARGON2_PARALLELISM
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -12,12 +20,46 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Проверка пароля в пуле хэширования, не блокирующая event loop"""
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Хэширование пароля в пуле хэширования, не блокирующее event loop"""
+    return await password_hash_pool.run(get_password_hash, password)
+
+def _encode_token(data: dict, token_type: str, expires_delta: timedelta) -> str:
+    """Подписывает токен активным ключом и записывает его идентификатор в заголовок kid"""
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    to_encode.update({"exp": datetime.utcnow() + expires_delta, "type": token_type})
+    kid, key = signing_keyring.signing_key()
+    return jwt.encode(to_encode, key, algorithm=settings.ALGORITHM, headers={"kid": kid})
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    return _encode_token(data, "access", expires_delta or timedelta(minutes=15))
+
+def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    return _encode_token(data, "refresh", expires_delta or timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS))
+
+def decode_token(token: str, token_type: str = "access") -> dict:
+    """
+    Проверяет подпись и срок действия токена ключом из заголовка kid
+
+    Args:
+        token: JWT токен
+        token_type: Ожидаемый тип токена: access или refresh
+
+    Returns:
+        Claims токена
+
+    Raises:
+        jwt.InvalidTokenError: при неверной подписи, неизвестном ключе, истекшем сроке или другом типе токена
+    """
+    key = signing_keyring.verification_key(jwt.get_unverified_header(token).get("kid"))
+    if key is None:
+        raise jwt.InvalidTokenError("Unknown signing key")
+    payload = jwt.decode(token, key, algorithms=[settings.ALGORITHM])
+    # Токены без type выданы до появления refresh токенов и считаются access
+    if payload.get("type", "access") != token_type:
+        raise jwt.InvalidTokenError(f"Expected {token_type} token")
+    return payload
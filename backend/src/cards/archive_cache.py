@@ -0,0 +1,184 @@
+from typing import Any, AsyncIterator, BinaryIO, Iterable, NamedTuple, Optional
+import glob
+import hashlib
+import os
+import tempfile
+import time
+from starlette.concurrency import run_in_threadpool
+from src.core.config import settings
+
+
+class PhotoArchive(NamedTuple):
+    """
+    Результат запроса архива фотографий.
+
+    stream — содержимое архива: чтение готового архива из кэша или
+    генератор, формирующий архив (и одновременно кэширующий его);
+    size — размер архива, известный только для архива из кэша.
+    """
+    stream: AsyncIterator[bytes]
+    size: Optional[int] = None
+
+
+async def iter_file(file_obj: BinaryIO, chunk_size: int = settings.ZIP_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Читает открытый файл блоками в пуле потоков и закрывает его в конце
+
+    Args:
+        file_obj: Файл, открытый на чтение в бинарном режиме
+        chunk_size: Размер блока чтения
+
+    Yields:
+        Блоки содержимого файла
+    """
+    try:
+        while chunk := await run_in_threadpool(file_obj.read, chunk_size):
+            yield chunk
+    finally:
+        file_obj.close()
+
+
+class ArchiveCache:
+    """
+    Дисковый кэш ZIP архивов с фотографиями пользователей.
+
+    Ключ архива — отпечаток набора карточек пользователя (id, photo_path,
+    updated_at), поэтому любое изменение набора само по себе дает промах.
+    Вытеснение — LRU по mtime файла с ограничением суммарного размера.
+    Синхронные методы обращаются к диску и должны вызываться вне event loop.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int):
+        """
+        Инициализация кэша архивов
+
+        Args:
+            cache_dir: Директория для хранения архивов
+            max_bytes: Максимальный суммарный размер архивов в байтах
+        """
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def fingerprint(cards: Iterable[Any]) -> str:
+        """
+        Вычисляет отпечаток набора карточек пользователя.
+
+        Args:
+            cards: Карточки пользователя или строки с полями id, photo_path, updated_at
+
+        Returns:
+            Шестнадцатеричный sha256 от отсортированного набора (id, photo_path, updated_at)
+        """
+        digest = hashlib.sha256()
+        for card in sorted(cards, key=lambda card: card.id):
+            digest.update(f"{card.id}|{card.photo_path}|{card.updated_at.isoformat()}\n".encode())
+        return digest.hexdigest()
+
+    def _entry_path(self, user_id: int, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, f"{user_id}_{fingerprint}.zip")
+
+    def open(self, user_id: int, fingerprint: str) -> Optional[BinaryIO]:
+        """
+        Открывает закэшированный архив и отмечает его как недавно использованный.
+
+        Архив отдается из открытого файла, а не по пути: вытеснение или
+        инвалидация в другом запросе удаляют только запись в директории,
+        и уже открытый файл дочитывается до конца.
+
+        Args:
+            user_id: Идентификатор пользователя
+            fingerprint: Отпечаток набора карточек
+
+        Returns:
+            Файл архива, открытый на чтение, или None при промахе
+        """
+        try:
+            file_obj = open(self._entry_path(user_id, fingerprint), "rb")
+        except FileNotFoundError:
+            return None
+        os.utime(file_obj.fileno())
+        return file_obj
+
+    async def tee(self, user_id: int, fingerprint: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Отдает фрагменты архива и параллельно записывает их в кэш.
+
+        Запись идет во временный файл (в пуле потоков), который атомарно
+        переименовывается только после полной выгрузки. Если клиент оборвал
+        соединение, временный файл удаляется.
+
+        Args:
+            user_id: Идентификатор пользователя
+            fingerprint: Отпечаток набора карточек
+            chunks: Фрагменты формируемого архива
+
+        Yields:
+            Те же фрагменты архива
+        """
+        await run_in_threadpool(os.makedirs, self.cache_dir, exist_ok=True)
+        fd, tmp_path = await run_in_threadpool(tempfile.mkstemp, dir=self.cache_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                async for chunk in chunks:
+                    await run_in_threadpool(tmp_file.write, chunk)
+                    yield chunk
+            await run_in_threadpool(os.replace, tmp_path, self._entry_path(user_id, fingerprint))
+        except BaseException:
+            # В том числе GeneratorExit при обрыве соединения
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        await run_in_threadpool(self.evict)
+
+    def invalidate(self, user_id: int) -> None:
+        """
+        Удаляет все закэшированные архивы пользователя.
+
+        Args:
+            user_id: Идентификатор пользователя
+        """
+        for path in glob.glob(os.path.join(self.cache_dir, f"{user_id}_*.zip")):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def evict(self) -> None:
+        """
+        Удаляет давно не использованные архивы, пока суммарный размер превышает лимит.
+
+        Заодно удаляются брошенные временные файлы (.part), в которые дольше
+        ARCHIVE_CACHE_PART_TTL_SECONDS ничего не записывалось: tee удаляет
+        их сам, но не при аварийном завершении воркера.
+        """
+        stale_before = time.time() - settings.ARCHIVE_CACHE_PART_TTL_SECONDS
+        for path in glob.glob(os.path.join(self.cache_dir, "*.part")):
+            try:
+                if os.stat(path).st_mtime < stale_before:
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+        entries = []
+        total = 0
+        for path in glob.glob(os.path.join(self.cache_dir, "*.zip")):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+archive_cache = ArchiveCache(settings.ARCHIVE_CACHE_DIR, settings.ARCHIVE_CACHE_MAX_BYTES)
@@ -0,0 +1,92 @@
+"""
+Заполнение метаданных фото (размеры, формат, размер файла, время съемки,
+основной цвет) у карточек, созданных до появления этих столбцов.
+
+Фото читаются из хранилища и обрабатываются параллельно в пуле процессов
+порциями по --batch-size карточек; каждая порция сохраняется одной
+транзакцией. Обрабатываются
+только карточки с пустым width, поэтому прерванный запуск можно
+просто повторить.
+
+Запуск из каталога backend:
+    python -m src.cards.backfill_metadata --workers 4 --batch-size 500
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+from src.core.db_session import AsyncSessionLocal
+from src.core.storage import photo_storage
+from .metadata import read_photo_metadata
+from .repository import CardRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill_metadata(workers: int, batch_size: int) -> tuple[int, int]:
+    """
+    Заполняет метаданные фото у всех карточек, где они отсутствуют
+
+    Args:
+        workers: Число процессов обработки изображений
+        batch_size: Число карточек в одной порции
+
+    Returns:
+        (число обновленных карточек, число карточек, фото которых прочитать не удалось)
+    """
+    loop = asyncio.get_running_loop()
+    updated = failed = 0
+    last_id = 0
+    # В памяти одновременно не больше двух прочитанных фото на процесс
+    semaphore = asyncio.Semaphore(workers * 2)
+
+    async def read_metadata(pool: ProcessPoolExecutor, photo_path: str) -> dict:
+        async with semaphore:
+            data = await photo_storage.read(photo_path)
+            return await loop.run_in_executor(pool, read_photo_metadata, data)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        async with AsyncSessionLocal() as db:
+            repository = CardRepository(db)
+            while True:
+                cards = await repository.get_cards_without_metadata(after_id=last_id, limit=batch_size)
+                if not cards:
+                    break
+                # Курсор по id: карточки с нечитаемым фото не выбираются повторно
+                last_id = cards[-1].id
+
+                results = await asyncio.gather(
+                    *(read_metadata(pool, card.photo_path) for card in cards),
+                    return_exceptions=True
+                )
+                rows = []
+                for card, result in zip(cards, results):
+                    if isinstance(result, BaseException):
+                        logger.warning("Cannot read photo of card %s (%s): %s", card.id, card.photo_path, result)
+                        failed += 1
+                        continue
+                    rows.append({"id": card.id, **result})
+
+                await repository.update_cards(rows)
+                updated += len(rows)
+                logger.info("Backfilled photo metadata for %s cards (last id %s)", updated, last_id)
+
+    await photo_storage.close()
+    return updated, failed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    updated, failed = asyncio.run(backfill_metadata(args.workers, args.batch_size))
+    logger.info("Done: %s cards updated, %s photos could not be read", updated, failed)
+
+
+if __name__ == "__main__":
+    main()
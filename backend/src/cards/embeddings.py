@@ -0,0 +1,282 @@
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple, Optional, Sequence
+import fcntl
+import os
+import numpy as np
+from PIL import Image
+from src.core.config import settings
+
+# Размер, до которого уменьшается изображение перед извлечением признаков
+_FEATURE_SIZE = 64
+# Квантование цветовой гистограммы: тон x насыщенность x яркость
+_HSV_BINS = (8, 4, 2)
+# Корзины направлений градиента и сетка ячеек (2x2) для гистограммы границ
+_ORIENTATION_BINS = 8
+_ORIENTATION_GRID = 2
+# Доля цвета в косинусной близости; остальное приходится на границы
+_COLOR_WEIGHT = 0.6
+
+EMBEDDING_DIM = int(np.prod(_HSV_BINS)) + _ORIENTATION_BINS * _ORIENTATION_GRID ** 2
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def compute_embedding(image: Image.Image) -> np.ndarray:
+    """
+    Вычисляет вектор признаков изображения для поиска визуально похожих фото.
+
+    Вектор состоит из квантованной HSV гистограммы (общая палитра) и
+    гистограммы направлений градиента по ячейкам 2x2 (форма и текстура).
+    Из гистограмм берется квадратный корень, поэтому косинусная близость
+    частей равна коэффициенту Бхаттачарии и не определяется одним
+    преобладающим цветом фона. Итоговый вектор имеет единичную норму.
+
+    Args:
+        image: Изображение Pillow
+
+    Returns:
+        Вектор float32 длины EMBEDDING_DIM
+    """
+    small = image.convert("RGB").resize((_FEATURE_SIZE, _FEATURE_SIZE), Image.Resampling.BILINEAR)
+
+    hsv = np.asarray(small.convert("HSV"), dtype=np.int64)
+    hue_bins, sat_bins, val_bins = _HSV_BINS
+    codes = ((hsv[..., 0] * hue_bins >> 8) * sat_bins + (hsv[..., 1] * sat_bins >> 8)) * val_bins \
+        + (hsv[..., 2] * val_bins >> 8)
+    color = np.bincount(codes.ravel(), minlength=hue_bins * sat_bins * val_bins).astype(np.float32)
+
+    gray = np.asarray(small.convert("L"), dtype=np.float32)
+    gx = np.zeros_like(gray)
+    gy = np.zeros_like(gray)
+    gx[:, 1:-1] = gray[:, 2:] - gray[:, :-2]
+    gy[1:-1, :] = gray[2:, :] - gray[:-2, :]
+    magnitude = np.hypot(gx, gy)
+    # Направление без знака: светлое-темное и темное-светлое дают одну корзину
+    angle = np.mod(np.arctan2(gy, gx), np.pi)
+    orientation = np.minimum((angle * (_ORIENTATION_BINS / np.pi)).astype(np.int64), _ORIENTATION_BINS - 1)
+    cells = np.arange(_FEATURE_SIZE) * _ORIENTATION_GRID // _FEATURE_SIZE
+    cell = cells[:, None] * _ORIENTATION_GRID + cells[None, :]
+    edges = np.bincount(
+        (cell * _ORIENTATION_BINS + orientation).ravel(),
+        weights=magnitude.ravel(),
+        minlength=_ORIENTATION_BINS * _ORIENTATION_GRID ** 2
+    ).astype(np.float32)
+
+    embedding = np.concatenate([
+        np.sqrt(_COLOR_WEIGHT) * _normalize(np.sqrt(color)),
+        np.sqrt(1 - _COLOR_WEIGHT) * _normalize(np.sqrt(edges)),
+    ])
+    return _normalize(embedding).astype(np.float32)
+
+
+class _IndexView(NamedTuple):
+    rows: int
+    vectors: Optional[np.ndarray]
+    ids: Optional[np.ndarray]
+
+
+class EmbeddingIndex:
+    """
+    Дисковый индекс векторов признаков фото карточек.
+
+    Векторы хранятся в файле vectors.f32 (матрица float32 по строкам),
+    идентификаторы карточек — в параллельном файле ids.i64. Оба файла
+    только дописываются и читаются через np.memmap, поэтому индекс
+    разделяется всеми воркерами через page cache и не загружается
+    в память процесса целиком. Строка считается записанной, когда записан
+    ее идентификатор: вектор дописывается первым.
+
+    Удаление записывает -1 вместо идентификатора (tombstone); такие строки
+    пропускаются при поиске. Запись выполняется под fcntl блокировкой,
+    чтение блокировки не требует. Все методы обращаются к диску и должны
+    вызываться вне event loop.
+    """
+    def __init__(self, directory: str, dim: int = EMBEDDING_DIM, block_rows: int = 65536):
+        """
+        Args:
+            directory: Директория файлов индекса
+            dim: Размерность векторов
+            block_rows: Число строк матрицы, обрабатываемых за один шаг поиска
+        """
+        self.directory = os.path.expanduser(directory)
+        self.dim = dim
+        self.block_rows = block_rows
+        self._vectors_path = os.path.join(self.directory, "vectors.f32")
+        self._ids_path = os.path.join(self.directory, "ids.i64")
+        self._lock_path = os.path.join(self.directory, ".lock")
+        self._view = _IndexView(0, None, None)
+
+    @property
+    def _row_bytes(self) -> int:
+        return self.dim * np.dtype(np.float32).itemsize
+
+    def _stored_rows(self) -> int:
+        """Число полностью записанных строк по размерам файлов"""
+        try:
+            ids_size = os.path.getsize(self._ids_path)
+            vectors_size = os.path.getsize(self._vectors_path)
+        except FileNotFoundError:
+            return 0
+        return min(ids_size // np.dtype(np.int64).itemsize, vectors_size // self._row_bytes)
+
+    def _refresh(self) -> _IndexView:
+        """Переотображает файлы, если другой воркер дописал строки"""
+        rows = self._stored_rows()
+        view = self._view
+        if rows != view.rows:
+            if rows == 0:
+                view = _IndexView(0, None, None)
+            else:
+                view = _IndexView(
+                    rows,
+                    np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim)),
+                    np.memmap(self._ids_path, dtype=np.int64, mode="r", shape=(rows,)),
+                )
+            self._view = view
+        return view
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _tombstone(self, card_ids: np.ndarray) -> None:
+        """Помечает строки карточек удаленными; вызывается под блокировкой"""
+        rows = self._stored_rows()
+        if rows == 0:
+            return
+        ids = np.memmap(self._ids_path, dtype=np.int64, mode="r+", shape=(rows,))
+        stale = np.flatnonzero(np.isin(ids, card_ids))
+        if stale.size:
+            ids[stale] = -1
+            ids.flush()
+        del ids
+
+    def __len__(self) -> int:
+        view = self._refresh()
+        return 0 if view.ids is None else int(np.count_nonzero(view.ids >= 0))
+
+    def add_many(self, card_ids: Sequence[int], vectors: np.ndarray) -> None:
+        """
+        Добавляет (или заменяет) векторы карточек
+
+        Args:
+            card_ids: Идентификаторы карточек
+            vectors: Матрица векторов (len(card_ids), dim)
+        """
+        ids = np.asarray(card_ids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        if not len(ids):
+            return
+
+        with self._locked():
+            # Отбрасываем хвост, оставшийся от прерванной записи, чтобы файлы не разошлись
+            rows = self._stored_rows()
+            if os.path.exists(self._vectors_path):
+                os.truncate(self._vectors_path, rows * self._row_bytes)
+            if os.path.exists(self._ids_path):
+                os.truncate(self._ids_path, rows * ids.itemsize)
+
+            self._tombstone(ids)
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._ids_path, "ab") as f:
+                f.write(ids.tobytes())
+
+    def add(self, card_id: int, vector: np.ndarray) -> None:
+        self.add_many([card_id], vector[None, :])
+
+    def remove(self, card_id: int) -> None:
+        self.remove_many([card_id])
+
+    def remove_many(self, card_ids: Sequence[int]) -> None:
+        if not len(card_ids):
+            return
+        with self._locked():
+            self._tombstone(np.asarray(card_ids, dtype=np.int64))
+
+    def card_ids(self) -> np.ndarray:
+        """Идентификаторы карточек, векторы которых есть в индексе"""
+        view = self._refresh()
+        if view.ids is None:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(view.ids[view.ids >= 0])
+
+    def get(self, card_id: int) -> Optional[np.ndarray]:
+        """Возвращает вектор карточки, если он есть в индексе"""
+        view = self._refresh()
+        if view.ids is None or view.vectors is None:
+            return None
+        rows = np.flatnonzero(view.ids == card_id)
+        return np.array(view.vectors[rows[-1]]) if rows.size else None
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        card_ids: Optional[np.ndarray] = None
+    ) -> list[list[tuple[int, float]]]:
+        """
+        Находит k ближайших по косинусной близости векторов для каждого запроса
+
+        Матрица обходится блоками по block_rows строк: для блока считается
+        произведение с матрицей запросов, а лучшие кандидаты сливаются
+        с текущим top-k через argpartition, так что память не зависит от
+        размера индекса.
+
+        Args:
+            queries: Матрица запросов (m, dim) или один вектор (dim,)
+            k: Число результатов на запрос
+            card_ids: Искать только среди этих карточек (по умолчанию среди всех)
+
+        Returns:
+            Для каждого запроса список пар (card_id, близость) по убыванию близости
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms > 0, norms, 1)
+        view = self._refresh()
+        if view.ids is None or view.vectors is None or k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        best_scores: np.ndarray = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows: np.ndarray = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, view.rows, self.block_rows):
+            stop = min(start + self.block_rows, view.rows)
+            scores = queries @ view.vectors[start:stop].T
+            scores[:, view.ids[start:stop] < 0] = -np.inf
+            if card_ids is not None:
+                scores[:, ~np.isin(view.ids[start:stop], card_ids)] = -np.inf
+
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate(
+                [best_rows, np.broadcast_to(np.arange(start, stop), (len(queries), stop - start))], axis=1
+            )
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_scores, best_rows = scores, rows
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores, kind="stable")
+            results.append([
+                (int(view.ids[row]), float(score))
+                for score, row in zip(scores[order], rows[order])
+                if np.isfinite(score) and view.ids[row] >= 0
+            ])
+        return results
+
+
+embedding_index = EmbeddingIndex(settings.EMBEDDING_INDEX_DIR, block_rows=settings.EMBEDDING_SEARCH_BLOCK_ROWS)
@@ -1,45 +1,164 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from datetime import datetime
+from typing import List, Literal, Optional
+import json
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request, Query
 from src.core.service_factory import ServiceFactory
 from .service import CardService
-from .schemas import CardBase, CardInDB
-from src.user.schemas import UserInDB
+from .schemas import CardBase, CardCreated, CardPage, BatchCardResponse, SimilarCard, VisuallySimilarCard
+from src.user.schemas import CurrentUser
 from src.auth.dependencies import get_current_user
 from fastapi import Form
-import os
+from src.core.responses import ModelResponse, storage_response
+from src.core.storage import photo_storage
+from src.core.config import settings
 
 router = APIRouter(prefix="/cards", tags=["cards"])
 
 # Создаем dependency для CardService
 
-@router.post("/", response_model=CardInDB)
+@router.post("/", response_model=CardCreated)
 async def create_card(
     title: str = Form(...),
     description: str = Form(...),
     price: float = Form(...),
     file: UploadFile = File(...),
-    user: UserInDB = Depends(get_current_user),
+    user: CurrentUser = Depends(get_current_user),
     service: CardService = Depends(ServiceFactory.get_dependency(CardService))
 ):
     """Создание новой карточки с использованием multipart/form-data"""
     card_data = CardBase(title=title, description=description, price=price)
-    return await service.create_with_photo(card_data, file, user)
+    return ModelResponse(await service.create_with_photo(card_data, file, user))
 
-@router.get("/")
-async def get_user_photo_files_zip(
-    user: UserInDB = Depends(get_current_user),
+@router.post("/batch", response_model=BatchCardResponse)
+async def create_cards_batch(
+    items: str = Form(..., description="JSON массив объектов {title, description, price}"),
+    files: List[UploadFile] = File(..., description="Фотографии в том же порядке, что и items"),
+    user: CurrentUser = Depends(get_current_user),
     service: CardService = Depends(ServiceFactory.get_dependency(CardService))
+):
+    """Пакетное создание карточек: items[i] описывает карточку для files[i]"""
+    try:
+        parsed_items = json.loads(items)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="items must be a JSON array")
+    if not isinstance(parsed_items, list):
+        raise HTTPException(status_code=422, detail="items must be a JSON array")
+    if len(parsed_items) != len(files):
+        raise HTTPException(status_code=422, detail="items and files must have the same length")
+    if len(parsed_items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"Too many items. Maximum: {settings.BATCH_MAX_ITEMS}")
+
+    return ModelResponse(await service.create_many_with_photos(parsed_items, files, user))
+
+@router.get("/list", response_model=CardPage)
+async def list_cards(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    title_prefix: Optional[str] = Query(None, max_length=100),
+    orientation: Optional[Literal["landscape", "portrait", "square"]] = None,
+    min_width: Optional[int] = Query(None, ge=1),
+    min_height: Optional[int] = Query(None, ge=1),
+    image_format: Optional[Literal["JPEG", "PNG"]] = None,
+    captured_after: Optional[datetime] = None,
+    captured_before: Optional[datetime] = None,
+    user: CurrentUser = Depends(get_current_user),
+    service: CardService = Depends(ServiceFactory.get_read_dependency(CardService))
+):
+    """Постраничный список карточек текущего пользователя, от новых к старым"""
+    page = await service.list_user_cards(
+        user.id,
+        limit,
+        cursor=cursor,
+        min_price=min_price,
+        max_price=max_price,
+        title_prefix=title_prefix,
+        orientation=orientation,
+        min_width=min_width,
+        min_height=min_height,
+        image_format=image_format,
+        captured_after=captured_after,
+        captured_before=captured_before
+    )
+    return ModelResponse(page)
+
+@router.get("/user/photos/zip")
+# Прежний адрес выгрузки архива, оставлен для существующих клиентов
+@router.get("/", include_in_schema=False)
+async def get_user_photo_files_zip(
+    user: CurrentUser = Depends(get_current_user),
+    service: CardService = Depends(ServiceFactory.get_read_dependency(CardService))
 ):
     """Получение ZIP архива со всеми фотографиями текущего пользователя"""
-    zip_buffer = await service.get_photo_files_zip(user.id)
-    
-    if not zip_buffer:
-        raise HTTPException(status_code=404, detail="No photos found")
+    archive = await service.get_photo_files_zip(user.id)
     
-    # Возвращаем ZIP архив как файл
     from fastapi.responses import StreamingResponse
-    return StreamingResponse(
-        zip_buffer,
-        media_type="application/zip",
-        headers={"Content-Disposition": "attachment; filename=user_photos.zip"}
-    )
+    if archive is None:
+        raise HTTPException(status_code=404, detail="No photos found")
 
+    headers = {"Content-Disposition": "attachment; filename=user_photos.zip"}
+    if archive.size is not None:
+        # Готовый архив из кэша отдается без повторного чтения фотографий и сжатия
+        headers["Content-Length"] = str(archive.size)
+    # Отдаем архив по мере чтения или формирования, не собирая его целиком в памяти
+    return StreamingResponse(archive.stream, media_type="application/zip", headers=headers)
+
+
+@router.get("/{card_id}/photo")
+async def get_card_photo(
+    card_id: int,
+    request: Request,
+    variant: Optional[str] = None,
+    user: CurrentUser = Depends(get_current_user),
+    service: CardService = Depends(ServiceFactory.get_read_dependency(CardService))
+):
+    """
+    Получение фотографии карточки или ее уменьшенного варианта.
+
+    Поддерживает Range, If-None-Match и If-Range. ETag строится из хэша
+    содержимого, поэтому неизменившееся фото не скачивается повторно.
+    """
+    card = await service.get(card_id)
+    if card is None or card.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Card not found")
+
+    photo_path = card.photo_path
+    etag = card.content_hash
+    if variant:
+        variant_path = (card.variants or {}).get(variant)
+        if variant_path is None:
+            raise HTTPException(status_code=404, detail="Photo variant not found")
+        photo_path = variant_path
+        etag = f"{card.content_hash}-{variant}" if card.content_hash else None
+
+    return await storage_response(request, photo_storage, photo_path, etag=etag)
+
+
+@router.get("/{card_id}/similar", response_model=List[SimilarCard])
+async def get_similar_cards(
+    card_id: int,
+    max_distance: int = Query(settings.SIMILARITY_MAX_DISTANCE, ge=0, le=64),
+    limit: int = Query(20, ge=1, le=100),
+    user: CurrentUser = Depends(get_current_user),
+    service: CardService = Depends(ServiceFactory.get_read_dependency(CardService))
+):
+    """Поиск среди своих карточек карточек с визуально почти одинаковыми фото (дубликаты объявлений)"""
+    similar = await service.find_similar(card_id, user.id, max_distance, limit)
+    if similar is None:
+        raise HTTPException(status_code=404, detail="Card not found")
+    return ModelResponse(similar)
+
+
+@router.get("/{card_id}/visually-similar", response_model=List[VisuallySimilarCard])
+async def get_visually_similar_cards(
+    card_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    user: CurrentUser = Depends(get_current_user),
+    service: CardService = Depends(ServiceFactory.get_read_dependency(CardService))
+):
+    """Поиск среди своих карточек карточек с похожими по цвету и форме фото"""
+    similar = await service.find_visually_similar(card_id, user.id, limit)
+    if similar is None:
+        raise HTTPException(status_code=404, detail="Card not found")
+    return ModelResponse(similar)
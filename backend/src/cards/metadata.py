@@ -0,0 +1,64 @@
+import io
+from PIL import Image
+from src.core.image_probe import image_orientation, read_image_metadata
+
+# Размер, до которого уменьшается изображение при поиске основного цвета
+_COLOR_SAMPLE_SIZE = 64
+# Число цветов палитры при квантовании
+_PALETTE_COLORS = 8
+
+
+def dominant_color(image: Image.Image) -> str:
+    """
+    Определяет основной цвет изображения.
+
+    Уменьшенное изображение квантуется до небольшой палитры методом
+    медианного сечения, и берется самый частый цвет палитры.
+
+    Args:
+        image: Изображение Pillow
+
+    Returns:
+        Цвет в виде "#rrggbb"
+    """
+    sample = image.convert("RGB")
+    sample.thumbnail((_COLOR_SAMPLE_SIZE, _COLOR_SAMPLE_SIZE))
+    palette_image = sample.quantize(colors=_PALETTE_COLORS, method=Image.Quantize.MEDIANCUT)
+    # Пиксели в режиме P — номера цветов палитры, гистограмма считает их по номерам;
+    # при равном числе пикселей берется больший номер
+    histogram = palette_image.histogram()
+    index = max(range(len(histogram)), key=lambda number: (histogram[number], number))
+    red, green, blue = (palette_image.getpalette() or [])[index * 3:index * 3 + 3]
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+
+def read_photo_metadata(data: bytes) -> dict:
+    """
+    Читает метаданные сохраненной фотографии.
+
+    Выполняется в пуле процессов при заполнении метаданных существующих
+    карточек. JPEG декодируется в уменьшенном масштабе, достаточном для
+    определения основного цвета.
+
+    Args:
+        data: Содержимое файла фотографии
+
+    Returns:
+        Значения столбцов карточки: width, height, orientation, byte_size,
+        image_format, captured_at, dominant_color
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        width, height, captured_at = read_image_metadata(image)
+        image_format = image.format
+        image.draft("RGB", (_COLOR_SAMPLE_SIZE, _COLOR_SAMPLE_SIZE))
+        color = dominant_color(image)
+
+    return {
+        "width": width,
+        "height": height,
+        "orientation": image_orientation(width, height),
+        "byte_size": len(data),
+        "image_format": image_format,
+        "captured_at": captured_at,
+        "dominant_color": color,
+    }
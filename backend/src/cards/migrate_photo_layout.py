@@ -0,0 +1,164 @@
+"""
+Перенос фотографий из плоской директории в разбиение по хэшу (ab/cd/<файл>)
+и замена абсолютных путей в cards.photo_path, cards.variants и
+photo_blobs.photo_path на ключи хранилища.
+
+Карточки обрабатываются порциями по --batch-size. Для каждой порции файлы
+(оригинал и его варианты) сначала получают жесткую ссылку на новом месте,
+затем пути в БД переписываются одной транзакцией, и только после этого
+старые файлы удаляются. Поэтому работающее приложение в любой момент
+находит файл по пути из БД, а прерванный запуск можно просто повторить:
+обрабатываются только карточки, у которых путь еще абсолютный.
+
+Работает только с локальным хранилищем (PHOTO_STORAGE_BACKEND=local):
+перенос нужно выполнить до перехода на S3.
+
+Запуск из каталога backend:
+    python -m src.cards.migrate_photo_layout --workers 8 --batch-size 1000
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import glob
+import logging
+import os
+import shutil
+from src.core.db_session import AsyncSessionLocal
+from src.core.storage import LocalPhotoStorage, photo_storage
+from src.core.utils import photo_key
+from .repository import CardRepository
+
+logger = logging.getLogger(__name__)
+
+
+def _target_path(path: str) -> str:
+    """Путь файла в новом разбиении по его имени"""
+    target = photo_storage.local_path(photo_key(os.path.basename(path)))
+    if target is None:
+        # migrate_photo_layout проверяет хранилище до переноса
+        raise RuntimeError("Photo layout migration requires PHOTO_STORAGE_BACKEND=local")
+    return target
+
+
+def _legacy_files(old_path: str) -> list[str]:
+    """Оригинал и его варианты (<хэш>.<вариант>.<расширение>) в старой директории"""
+    base, _ = os.path.splitext(old_path)
+    return [old_path, *glob.glob(f"{glob.escape(base)}.*.*")]
+
+
+def _link_files(old_path: str) -> bool:
+    """
+    Создает ссылки на оригинал и его варианты по новым ключам
+
+    Если старая и новая директории на разных файловых системах, файл
+    копируется через временный файл и атомарно переименовывается.
+
+    Returns:
+        True, если оригинал есть на новом месте
+    """
+    new_path = _target_path(old_path)
+    for source in _legacy_files(old_path):
+        target = _target_path(source)
+        if os.path.exists(target):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(source, target)
+        except FileNotFoundError:
+            continue
+        except FileExistsError:
+            pass
+        except OSError:
+            tmp_path = f"{target}.part"
+            shutil.copy2(source, tmp_path)
+            os.replace(tmp_path, target)
+    return os.path.exists(new_path)
+
+
+def _unlink_files(old_path: str) -> None:
+    for path in _legacy_files(old_path):
+        # Абсолютный путь мог уже указывать внутрь нового разбиения
+        if os.path.abspath(path) == _target_path(path):
+            continue
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+async def migrate_photo_layout(workers: int, batch_size: int) -> tuple[int, int]:
+    """
+    Переносит фото всех карточек со старыми абсолютными путями
+
+    Args:
+        workers: Число потоков для файловых операций
+        batch_size: Число карточек в одной порции
+
+    Returns:
+        (число перенесенных карточек, число карточек без файла на диске)
+
+    Raises:
+        RuntimeError: если выбрано не локальное хранилище
+    """
+    if not isinstance(photo_storage, LocalPhotoStorage):
+        raise RuntimeError("Photo layout migration requires PHOTO_STORAGE_BACKEND=local")
+
+    loop = asyncio.get_running_loop()
+    migrated = missing = 0
+    last_id = 0
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="photo-layout") as pool:
+        async with AsyncSessionLocal() as db:
+            repository = CardRepository(db)
+            while True:
+                cards = await repository.get_cards_with_legacy_paths(after_id=last_id, limit=batch_size)
+                if not cards:
+                    break
+                last_id = cards[-1].id
+
+                # Карточки с одинаковым фото ссылаются на один файл: переносим его один раз
+                old_paths = list(dict.fromkeys(card.photo_path for card in cards))
+                linked = await asyncio.gather(
+                    *(loop.run_in_executor(pool, _link_files, old_path) for old_path in old_paths)
+                )
+                found = {old_path for old_path, ok in zip(old_paths, linked) if ok}
+                for card in cards:
+                    if card.photo_path not in found:
+                        logger.warning("Photo of card %s not found: %s", card.id, card.photo_path)
+                        missing += 1
+
+                # Путь переписывается и для отсутствующих файлов: иначе порция выбиралась бы заново
+                paths = {old_path: photo_key(os.path.basename(old_path)) for old_path in old_paths}
+                rows = [
+                    {
+                        "id": card.id,
+                        "photo_path": paths[card.photo_path],
+                        "variants": {
+                            name: photo_key(os.path.basename(path)) if os.path.isabs(path) else path
+                            for name, path in card.variants.items()
+                        } if card.variants else card.variants,
+                    }
+                    for card in cards
+                ]
+                await repository.relocate_photos(rows, paths)
+
+                await asyncio.gather(*(loop.run_in_executor(pool, _unlink_files, old_path) for old_path in found))
+                migrated += len(cards)
+                logger.info("Moved photos of %s cards (last id %s)", migrated, last_id)
+
+    return migrated, missing
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    migrated, missing = asyncio.run(migrate_photo_layout(args.workers, args.batch_size))
+    logger.info("Done: %s cards migrated, %s photos were missing on disk", migrated, missing)
+
+
+if __name__ == "__main__":
+    main()
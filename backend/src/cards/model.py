@@ -1,21 +1,62 @@
 from __future__ import annotations
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import String, ForeignKey, Float
+from sqlalchemy import String, ForeignKey, Float, BigInteger, Integer, JSON, Index, DateTime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from src.core.base_model import BaseModel
 
 
 class Card(BaseModel):
     __tablename__ = "cards"
+    __table_args__ = (
+        # Индексы под постраничный вывод карточек пользователя (keyset по created_at, id) и его фильтры
+        Index("ix_cards_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_cards_user_id_price", "user_id", "price"),
+        Index("ix_cards_user_id_title", "user_id", "title", postgresql_ops={"title": "varchar_pattern_ops"}),
+        # Инкрементальное обновление индекса похожих фото в памяти
+        Index("ix_cards_updated_at", "updated_at"),
+        # Фильтры списка по параметрам фото (например, landscape и width >= 1000)
+        Index("ix_cards_user_id_orientation_width", "user_id", "orientation", "width"),
+        Index("ix_cards_user_id_height", "user_id", "height"),
+        Index("ix_cards_user_id_captured_at", "user_id", "captured_at"),
+    )
 
     title: Mapped[str] = mapped_column(String(100))
     description: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     photo_path: Mapped[str] = mapped_column(String(255))
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)
+    variants: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    phash: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    # Метаданные фото: размеры с учетом поворота по EXIF, размер файла, формат, время съемки, основной цвет
+    width: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    height: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    orientation: Mapped[Optional[str]] = mapped_column(String(10), nullable=True)
+    byte_size: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    image_format: Mapped[Optional[str]] = mapped_column(String(10), nullable=True)
+    captured_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    dominant_color: Mapped[Optional[str]] = mapped_column(String(7), nullable=True)
     price: Mapped[float] = mapped_column(Float)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     
     user: Mapped["User"] = relationship("User", back_populates="cards") # typing: ignore
 
     def __repr__(self) -> str:
-        return f"<Card(id={self.id}, title={self.title})>"
\ No newline at end of file
+        return f"<Card(id={self.id}, title={self.title})>"
+
+
+class PhotoBlob(BaseModel):
+    """
+    Файл фотографии в контентно-адресуемом хранилище.
+
+    Один блоб может разделяться несколькими карточками; ref_count — число
+    карточек, ссылающихся на него. Файл удаляется вместе с последней ссылкой.
+    """
+    __tablename__ = "photo_blobs"
+
+    content_hash: Mapped[str] = mapped_column(String(64), unique=True, index=True)
+    photo_path: Mapped[str] = mapped_column(String(255))
+    size: Mapped[int] = mapped_column(BigInteger)
+    ref_count: Mapped[int] = mapped_column(Integer, default=1)
+
+    def __repr__(self) -> str:
+        return f"<PhotoBlob(hash={self.content_hash}, ref_count={self.ref_count})>"
@@ -0,0 +1,70 @@
+import io
+from typing import Collection, Optional
+import numpy as np
+from PIL import Image, ImageOps
+from .embeddings import compute_embedding
+from .metadata import dominant_color
+from .similarity import dhash
+from .variants import render_variants
+
+# Минимальный масштаб декодирования, достаточный для перцептивного хэша
+_HASH_DRAFT_SIZE = 64
+
+
+def _draft_size(specs: dict[str, dict]) -> int:
+    return max([_HASH_DRAFT_SIZE, *(spec["max_size"] for spec in specs.values())])
+
+
+def process_photo(data: bytes, specs: dict[str, dict], pending: Optional[Collection[str]] = None) -> dict:
+    """
+    Анализирует фотографию и создает ее производные варианты.
+
+    Выполняется в пуле процессов: файл декодируется один раз, а затем
+    используется для вариантов, перцептивного хэша, вектора признаков
+    и основного цвета. Функция не обращается к хранилищу: содержимое
+    оригинала передается, а варианты возвращаются байтами, поэтому пул
+    работает одинаково с локальным и удаленным хранилищем.
+
+    Args:
+        data: Содержимое оригинала
+        specs: Параметры всех вариантов по имени (PhotoVariantSpec.model_dump())
+        pending: Имена недостающих вариантов, которые нужно создать; None — все варианты
+
+    Returns:
+        Словарь с ключами variants (закодированные варианты по имени), phash (беззнаковый dHash),
+        embedding (вектор признаков float32) и dominant_color ("#rrggbb")
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        # JPEG декодируется сразу в уменьшенном масштабе, достаточном для самого крупного варианта.
+        # Масштаб зависит от всех вариантов, а не только недостающих, иначе вектор признаков
+        # и основной цвет повторно загруженного фото отличались бы от первой обработки
+        draft_size = _draft_size(specs)
+        source.draft("RGB", (draft_size, draft_size))
+        image = ImageOps.exif_transpose(source)
+
+        variants = render_variants(image, specs if pending is None else {name: specs[name] for name in pending})
+        phash = dhash(image)
+        embedding = compute_embedding(image)
+        color = dominant_color(image)
+
+    return {"variants": variants, "phash": phash, "embedding": embedding, "dominant_color": color}
+
+
+def compute_photo_embedding(data: bytes, specs: dict[str, dict]) -> np.ndarray:
+    """
+    Вычисляет только вектор признаков фотографии (для перестроения индекса).
+
+    Изображение декодируется в том же масштабе, что и в process_photo при
+    первой обработке, чтобы векторы совпадали с записанными при загрузке.
+
+    Args:
+        data: Содержимое оригинала
+        specs: Параметры всех вариантов по имени (PhotoVariantSpec.model_dump())
+
+    Returns:
+        Вектор признаков float32
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        draft_size = _draft_size(specs)
+        source.draft("RGB", (draft_size, draft_size))
+        return compute_embedding(ImageOps.exif_transpose(source))
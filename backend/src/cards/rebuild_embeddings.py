@@ -0,0 +1,112 @@
+"""
+Перестроение индекса векторов признаков фото по таблице cards.
+
+Индекс хранится на локальном диске узла (EMBEDDING_INDEX_DIR), а векторы
+в БД не записываются, поэтому новый узел или контейнер без общего тома
+начинается с пустого индекса. Команда сверяет индекс с карточками:
+векторы карточек, которых в индексе нет, вычисляются из фото в хранилище
+(параллельно в пуле процессов, порциями по --batch-size карточек), а
+строки удаленных карточек помечаются удаленными. Карточки, уже
+записанные в индекс, пропускаются, поэтому прерванный запуск можно
+просто повторить, в том числе на работающем узле.
+
+Запуск из каталога backend:
+    python -m src.cards.rebuild_embeddings --workers 4 --batch-size 500
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from src.core.config import settings
+from src.core.db_session import AsyncSessionLocal
+from src.core.storage import photo_storage
+from .embeddings import EmbeddingIndex, embedding_index
+from .processing import compute_photo_embedding
+from .repository import CardRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def rebuild_embeddings(index: EmbeddingIndex, workers: int, batch_size: int) -> tuple[int, int, int]:
+    """
+    Дополняет индекс векторами всех карточек и убирает из него удаленные карточки
+
+    Args:
+        index: Индекс векторов признаков
+        workers: Число процессов обработки изображений
+        batch_size: Число карточек в одной порции
+
+    Returns:
+        (число добавленных векторов, число карточек, фото которых прочитать не удалось,
+        число убранных из индекса удаленных карточек)
+    """
+    loop = asyncio.get_running_loop()
+    specs = {name: spec.model_dump() for name, spec in settings.PHOTO_VARIANTS.items()}
+    indexed = set((await run_in_threadpool(index.card_ids)).tolist())
+    seen: set[int] = set()
+    added = failed = 0
+    last_id = 0
+    # В памяти одновременно не больше двух прочитанных фото на процесс
+    semaphore = asyncio.Semaphore(workers * 2)
+
+    async def embed(pool: ProcessPoolExecutor, photo_path: str) -> np.ndarray:
+        async with semaphore:
+            data = await photo_storage.read(photo_path)
+            return await loop.run_in_executor(pool, compute_photo_embedding, data, specs)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        async with AsyncSessionLocal() as db:
+            repository = CardRepository(db)
+            while True:
+                cards = await repository.get_card_photo_paths(after_id=last_id, limit=batch_size)
+                if not cards:
+                    break
+                last_id = cards[-1].id
+                seen.update(card.id for card in cards)
+
+                missing = [card for card in cards if card.id not in indexed]
+                results = await asyncio.gather(
+                    *(embed(pool, card.photo_path) for card in missing),
+                    return_exceptions=True
+                )
+                card_ids = []
+                vectors = []
+                for card, result in zip(missing, results):
+                    if isinstance(result, BaseException):
+                        logger.warning("Cannot read photo of card %s (%s): %s", card.id, card.photo_path, result)
+                        failed += 1
+                        continue
+                    card_ids.append(card.id)
+                    vectors.append(result)
+
+                if vectors:
+                    await run_in_threadpool(index.add_many, card_ids, np.stack(vectors))
+                added += len(card_ids)
+                logger.info("Indexed photo embeddings of %s cards (last id %s)", added, last_id)
+
+    # indexed — снимок на начало прохода, поэтому карточки, добавленные в индекс позже, не убираются
+    removed = sorted(indexed - seen)
+    await run_in_threadpool(index.remove_many, removed)
+    await photo_storage.close()
+    return added, failed, len(removed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    added, failed, removed = asyncio.run(rebuild_embeddings(embedding_index, args.workers, args.batch_size))
+    logger.info(
+        "Done: %s embeddings added, %s photos could not be read, %s deleted cards removed", added, failed, removed
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Сверка хранилища фотографий с БД и очистка потерянных файлов.
+
+Ключи хранилища и ключи фото из cards.photo_path и photo_blobs.photo_path
+перебираются потоково в одном (побайтовом) порядке и сливаются за один
+проход, поэтому расход памяти не зависит от числа файлов. Расхождения
+ищутся в обе стороны:
+
+- потерянные файлы — оригиналы и их варианты, на которые не ссылается
+  ни одна карточка (например, фото сохранено, а вставка карточки не удалась);
+- отсутствующие файлы — ключи из БД, для которых в хранилище нет файла.
+
+По умолчанию выполняется пробный прогон, который только печатает отчет.
+С --apply потерянные файлы удаляются, с --quarantine переносятся под
+префикс quarantine/, откуда их можно вернуть. Файлы моложе --min-age-hours
+не трогаются: карточка такого фото может быть еще не записана. Перед
+удалением каждая порция повторно сверяется с БД, а скорость удаления
+ограничена --rate файлами в секунду. Отсутствующие файлы только
+попадают в отчет.
+
+Метрики последнего запуска можно записать в файл для textfile collector
+node_exporter (--metrics-file).
+
+Запуск из каталога backend:
+    python -m src.cards.reconcile_storage
+    python -m src.cards.reconcile_storage --apply --rate 50
+"""
+from typing import List, Optional
+import argparse
+import asyncio
+import logging
+import os
+import time
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.core.db_session import AsyncSessionLocal
+from src.core.metrics import registry
+from src.core.storage import PhotoStorage, photo_storage
+from src.core.utils import PHOTO_EXTENSIONS
+from .repository import CardRepository
+
+logger = logging.getLogger(__name__)
+
+# Префикс, под который переносятся потерянные файлы при --quarantine
+QUARANTINE_PREFIX = "quarantine/"
+# Сколько отсутствующих файлов перечислять в отчете
+_MISSING_SAMPLE_SIZE = 100
+
+STORAGE_GC_OBJECTS = registry.counter(
+    "storage_gc_objects_total",
+    "Orphan photo storage objects handled by reconciliation (deleted, quarantined, skipped_recent, failed)",
+    ("action",)
+)
+STORAGE_GC_SCANNED = registry.gauge(
+    "storage_gc_scanned_objects", "Photo storage objects scanned by the last reconciliation run"
+)
+STORAGE_GC_ORPHANS = registry.gauge(
+    "storage_gc_orphan_objects", "Orphan photo storage objects found by the last reconciliation run"
+)
+STORAGE_GC_ORPHAN_BYTES = registry.gauge(
+    "storage_gc_orphan_bytes", "Size of orphan photo storage objects found by the last reconciliation run"
+)
+STORAGE_GC_MISSING = registry.gauge(
+    "storage_gc_missing_photos", "Photo keys referenced in the database but missing from storage"
+)
+STORAGE_GC_DURATION = registry.gauge(
+    "storage_gc_last_run_seconds", "Duration of the last reconciliation run"
+)
+_GC_METRICS = (
+    STORAGE_GC_OBJECTS, STORAGE_GC_SCANNED, STORAGE_GC_ORPHANS,
+    STORAGE_GC_ORPHAN_BYTES, STORAGE_GC_MISSING, STORAGE_GC_DURATION
+)
+
+
+class ReconcileReport(BaseModel):
+    """Результат сверки хранилища с БД"""
+    action: str
+    scanned_objects: int = 0
+    referenced_photos: int = 0
+    orphan_objects: int = 0
+    orphan_bytes: int = 0
+    recent_skipped: int = 0
+    reclaimed: int = 0
+    failed: int = 0
+    missing_photos: int = 0
+    missing_sample: List[str] = []
+    seconds: float = 0.0
+
+
+class _RateLimiter:
+    """Равномерно распределяет операции: не больше rate в секунду (0 — без ограничения)"""
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        if self._next > now:
+            await asyncio.sleep(self._next - now)
+        self._next = max(self._next, now) + self.interval
+
+
+def _photo_base(key: str) -> str:
+    """
+    Ключ без расширения и имени варианта: ab/cd/<хэш>.
+
+    Имена файлов — хэши одинаковой длины, поэтому порядок базовых ключей
+    совпадает с порядком самих ключей, а оригинал и его варианты идут подряд.
+    """
+    head, separator, name = key.rpartition("/")
+    return f"{head}{separator}{name.split('.', 1)[0]}"
+
+
+async def _reclaim(
+    storage: PhotoStorage,
+    orphans: List[str],
+    report: ReconcileReport,
+    min_age_seconds: float,
+    limiter: _RateLimiter
+) -> None:
+    """
+    Обрабатывает порцию потерянных файлов: учитывает их в отчете и,
+    если это не пробный прогон, удаляет или переносит в карантин
+    """
+    stats = await asyncio.gather(*(storage.stat(key) for key in orphans))
+    cutoff = time.time() - min_age_seconds
+    candidates = []
+    for key, stored in zip(orphans, stats):
+        if stored is None:
+            # Удален параллельно, например при удалении карточки
+            continue
+        if stored.modified.timestamp() > cutoff:
+            report.recent_skipped += 1
+            STORAGE_GC_OBJECTS.inc(action="skipped_recent")
+            continue
+        report.orphan_objects += 1
+        report.orphan_bytes += stored.size
+        candidates.append(key)
+
+    if report.action == "report" or not candidates:
+        return
+
+    # После прохода по БД то же содержимое могли загрузить заново: publish_photo
+    # не перезаписывает существующий блоб, поэтому такой файл удалять нельзя
+    originals = [
+        f"{_photo_base(key)}.{extension}"
+        for key in candidates
+        for extension in PHOTO_EXTENSIONS.values()
+    ]
+    async with AsyncSessionLocal() as db:
+        referenced = await CardRepository(db).get_referenced_photo_paths(originals)
+    referenced_bases = {_photo_base(photo_path) for photo_path in referenced}
+
+    for key in candidates:
+        if _photo_base(key) in referenced_bases:
+            continue
+        await limiter.wait()
+        try:
+            if report.action == "quarantine":
+                await storage.move(key, f"{QUARANTINE_PREFIX}{key}")
+            else:
+                await storage.delete(key)
+        except FileNotFoundError:
+            continue
+        except Exception:
+            logger.exception("Failed to %s orphan photo %s", report.action, key)
+            report.failed += 1
+            STORAGE_GC_OBJECTS.inc(action="failed")
+            continue
+        report.reclaimed += 1
+        STORAGE_GC_OBJECTS.inc(action="quarantined" if report.action == "quarantine" else "deleted")
+
+
+async def reconcile_storage(
+    db: AsyncSession,
+    storage: PhotoStorage,
+    action: str = "report",
+    min_age_seconds: float = 24 * 3600,
+    rate: float = 100.0,
+    batch_size: int = 1000
+) -> ReconcileReport:
+    """
+    Сверяет хранилище фотографий с БД
+
+    Args:
+        db: Сессия БД для потокового чтения ключей фото
+        storage: Хранилище фотографий
+        action: report (пробный прогон), delete или quarantine
+        min_age_seconds: Минимальный возраст потерянного файла, который можно удалить
+        rate: Максимальное число удалений в секунду (0 — без ограничения)
+        batch_size: Размер порции чтения из БД и обработки потерянных файлов
+
+    Returns:
+        Отчет о сверке
+
+    Raises:
+        RuntimeError: если в БД остались абсолютные пути (перенос фото не завершен)
+    """
+    repository = CardRepository(db)
+    if await repository.get_cards_with_legacy_paths(after_id=0, limit=1):
+        # Файлы со старыми путями выглядели бы потерянными
+        raise RuntimeError("Cards with absolute photo paths found: run python -m src.cards.migrate_photo_layout first")
+
+    start = time.perf_counter()
+    report = ReconcileReport(action=action)
+    limiter = _RateLimiter(rate)
+    orphans: List[str] = []
+
+    def missing(photo_path: str) -> None:
+        report.missing_photos += 1
+        if len(report.missing_sample) < _MISSING_SAMPLE_SIZE:
+            report.missing_sample.append(photo_path)
+
+    references = repository.iter_referenced_photo_paths(batch_size)
+    reference: Optional[str] = await anext(references, None)
+    # Найден ли в хранилище файл с ключом reference
+    reference_found = False
+
+    async for key in storage.iter_keys():
+        if key.startswith(QUARANTINE_PREFIX):
+            continue
+        report.scanned_objects += 1
+        base = _photo_base(key)
+
+        while reference is not None and _photo_base(reference) < base:
+            report.referenced_photos += 1
+            if not reference_found:
+                missing(reference)
+            reference, reference_found = await anext(references, None), False
+
+        if reference is not None and _photo_base(reference) == base:
+            # Оригинал или вариант фото, на которое ссылается карточка
+            reference_found = reference_found or key == reference
+            continue
+
+        orphans.append(key)
+        if len(orphans) >= batch_size:
+            await _reclaim(storage, orphans, report, min_age_seconds, limiter)
+            orphans = []
+
+    while reference is not None:
+        report.referenced_photos += 1
+        if not reference_found:
+            missing(reference)
+        reference, reference_found = await anext(references, None), False
+
+    if orphans:
+        await _reclaim(storage, orphans, report, min_age_seconds, limiter)
+
+    report.seconds = round(time.perf_counter() - start, 3)
+    STORAGE_GC_SCANNED.set(report.scanned_objects)
+    STORAGE_GC_ORPHANS.set(report.orphan_objects)
+    STORAGE_GC_ORPHAN_BYTES.set(report.orphan_bytes)
+    STORAGE_GC_MISSING.set(report.missing_photos)
+    STORAGE_GC_DURATION.set(report.seconds)
+    return report
+
+
+def write_metrics(path: str) -> None:
+    """Атомарно записывает метрики сверки в формате Prometheus (textfile collector)"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as metrics_file:
+        metrics_file.write("\n".join(metric.render() for metric in _GC_METRICS) + "\n")
+    os.replace(tmp_path, path)
+
+
+async def _main(args: argparse.Namespace) -> ReconcileReport:
+    action = "quarantine" if args.quarantine else "delete" if args.apply else "report"
+    try:
+        async with AsyncSessionLocal() as db:
+            return await reconcile_storage(
+                db,
+                photo_storage,
+                action=action,
+                min_age_seconds=args.min_age_hours * 3600,
+                rate=args.rate,
+                batch_size=args.batch_size
+            )
+    finally:
+        await photo_storage.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--apply", action="store_true", help="delete orphan files")
+    mode.add_argument("--quarantine", action="store_true", help=f"move orphan files under {QUARANTINE_PREFIX}")
+    parser.add_argument("--min-age-hours", type=float, default=24)
+    parser.add_argument("--rate", type=float, default=100, help="max deletions per second, 0 for unlimited")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--metrics-file", help="write run metrics in Prometheus text format to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    report = asyncio.run(_main(args))
+    if args.metrics_file:
+        write_metrics(args.metrics_file)
+    print(report.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    main()
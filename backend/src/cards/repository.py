@@ -1,8 +1,22 @@
-from typing import Optional, List
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Optional, List, Sequence, cast
+import asyncio
+import logging
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
-from .model import Card
-from .schemas import CardCreate
+from sqlalchemy import Table, select, update, delete, insert, tuple_, literal, bindparam, union, union_all, Row
+from sqlalchemy.dialects import postgresql, sqlite
+from src.core.utils import SavedPhoto, delete_photo, publish_photo
+from .model import Card, PhotoBlob
+from .schemas import CardCreate, CardInDB
+
+logger = logging.getLogger(__name__)
+
+# INSERT ... ON CONFLICT по диалекту: PostgreSQL в работе, SQLite для бенчмарков
+_UPSERT_INSERTS: dict[str, Callable[..., Any]] = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+# Столбцы карточки, возвращаемые в API: списки выбираются строками, без загрузки ORM объектов
+CARD_OUT_COLUMNS = tuple(getattr(Card, name) for name in CardInDB.model_fields)
 
 
 class CardRepository:
@@ -16,22 +30,165 @@ class CardRepository:
         """
         self.db = db
 
-    async def create_card(self, card_data: CardCreate) -> Card:
+    async def create_card(
+        self,
+        card_data: CardCreate,
+        photo_size: int = 0,
+        photo: Optional[SavedPhoto] = None,
+        commit: bool = True
+    ) -> Card:
         """
         Создает новую карточку в базе данных
         
+        Если у фото есть хэш содержимого, в той же транзакции увеличивается
+        счетчик ссылок на соответствующий блоб, и принятое фото публикуется
+        в хранилище, пока строка блоба заблокирована.
+
         Args:
             card_data: Данные для создания карточки
+            photo_size: Размер файла фотографии в байтах
+            photo: Принятое, но еще не опубликованное фото карточки
+            commit: Закоммитить транзакцию; при False карточка только отправляется
+                в БД, а коммит остается за вызывающим кодом
             
         Returns:
             Созданный объект карточки
         """
         db_card = Card(**card_data.model_dump())
         self.db.add(db_card)
+        if card_data.content_hash:
+            await self._acquire_blobs([(card_data, photo_size)], [photo] if photo else [])
+        if not commit:
+            await self.db.flush()
+            return db_card
         await self.db.commit()
         await self.db.refresh(db_card)
         return db_card
 
+    async def create_cards(
+        self,
+        cards_data: List[tuple[CardCreate, int]],
+        photos: Sequence[SavedPhoto] = (),
+        commit: bool = True
+    ) -> List[Card]:
+        """
+        Создает несколько карточек одной транзакцией
+        
+        Все строки вставляются многострочным INSERT ... RETURNING, а счетчики
+        ссылок на блобы обновляются одним upsert, поэтому число обращений
+        к БД не зависит от количества карточек.
+
+        Args:
+            cards_data: Пары (данные карточки, размер файла фотографии)
+            photos: Принятые, но еще не опубликованные фото карточек
+            commit: Закоммитить транзакцию; при False коммит остается за вызывающим кодом
+            
+        Returns:
+            Созданные объекты карточек в порядке входных данных
+        """
+        result = await self.db.scalars(
+            insert(Card).returning(Card, sort_by_parameter_order=True),
+            [card_data.model_dump() for card_data, _ in cards_data]
+        )
+        cards = list(result.all())
+        await self._acquire_blobs([item for item in cards_data if item[0].content_hash], photos)
+        if commit:
+            await self.db.commit()
+        return cards
+
+    async def _acquire_blobs(
+        self,
+        cards_data: List[tuple[CardCreate, int]],
+        photos: Sequence[SavedPhoto] = ()
+    ) -> None:
+        """
+        Регистрирует новые ссылки на блобы, создавая записи при первой ссылке,
+        и публикует файлы блобов
+
+        Ссылки на один и тот же блоб суммируются заранее: upsert не может
+        изменить одну строку дважды в одном выражении. Файлы публикуются
+        после upsert: строки блобов заблокированы до коммита, поэтому
+        _purge_blob не удалит файл блоба, на который только что взята ссылка,
+        а если последняя ссылка была снята и файл удален до upsert, он
+        публикуется заново.
+
+        Args:
+            cards_data: Пары (данные карточки, размер файла фотографии); карточки без content_hash пропускаются
+            photos: Принятые фото для публикации
+        """
+        blobs: dict[str, dict] = {}
+        for card_data, photo_size in cards_data:
+            content_hash = card_data.content_hash
+            if content_hash is None:
+                continue
+            blob = blobs.setdefault(content_hash, {
+                "content_hash": content_hash,
+                "photo_path": card_data.photo_path,
+                "size": photo_size,
+                "ref_count": 0,
+            })
+            blob["ref_count"] += 1
+        if not blobs:
+            return
+
+        upsert = _UPSERT_INSERTS[self.db.get_bind().dialect.name]
+        stmt = upsert(PhotoBlob).values(list(blobs.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PhotoBlob.content_hash],
+            set_={"ref_count": PhotoBlob.ref_count + stmt.excluded.ref_count, "updated_at": datetime.utcnow()}
+        )
+        await self.db.execute(stmt)
+        unique_photos = {photo.path: photo for photo in photos}
+        await asyncio.gather(*(publish_photo(photo) for photo in unique_photos.values()))
+
+    async def _release_blob(self, content_hash: str) -> bool:
+        """
+        Снимает ссылку на блоб в текущей транзакции
+
+        Запись блоба с нулевым счетчиком и его файл остаются на месте: если
+        транзакция откатится, ссылка вернется вместе с карточкой, и файл
+        должен существовать. Удаляет их _purge_blob после коммита.
+
+        Args:
+            content_hash: Хэш содержимого фото
+
+        Returns:
+            True, если это была последняя ссылка на блоб
+        """
+        result = await self.db.execute(
+            update(PhotoBlob)
+            .where(PhotoBlob.content_hash == content_hash)
+            .values(ref_count=PhotoBlob.ref_count - 1)
+            .returning(PhotoBlob.ref_count)
+        )
+        ref_count = result.scalar_one_or_none()
+        return ref_count is not None and ref_count <= 0
+
+    async def _purge_blob(self, content_hash: str) -> None:
+        """
+        Удаляет запись блоба без ссылок и его файлы
+
+        Вызывается после коммита, снявшего последнюю ссылку. DELETE ... RETURNING
+        блокирует строку блоба, поэтому файл удаляется под этой блокировкой:
+        параллельная загрузка того же содержимого ждет ее в upsert _acquire_blobs
+        и после коммита публикует файл заново, а если ссылку успели взять
+        раньше, строка не удаляется и файл остается. Если удаление прервется,
+        запись с нулевым счетчиком не мешает: следующая загрузка снова
+        опубликует файл, а сверка хранилища не считает такие файлы используемыми.
+
+        Args:
+            content_hash: Хэш содержимого фото
+        """
+        result = await self.db.execute(
+            delete(PhotoBlob)
+            .where(PhotoBlob.content_hash == content_hash, PhotoBlob.ref_count <= 0)
+            .returning(PhotoBlob.photo_path)
+        )
+        photo_path = result.scalar_one_or_none()
+        if photo_path is not None:
+            await delete_photo(photo_path)
+        await self.db.commit()
+
     async def get_card(self, card_id: int) -> Optional[Card]:
         """
         Получает карточку по идентификатору
@@ -49,6 +206,9 @@ class CardRepository:
         """
         Удаляет карточку по идентификатору
         
+        Файл фотографии удаляется только вместе с последней карточкой,
+        ссылающейся на тот же блоб, и только после коммита удаления карточки.
+
         Args:
             card_id: Идентификатор карточки
             
@@ -59,8 +219,19 @@ class CardRepository:
         if not db_card:
             return False
             
+        content_hash = db_card.content_hash
         await self.db.execute(delete(Card).where(Card.id == card_id))
+        last_reference = False
+        if content_hash:
+            last_reference = await self._release_blob(content_hash)
         await self.db.commit()
+        if content_hash and last_reference:
+            try:
+                await self._purge_blob(content_hash)
+            except Exception:
+                # Карточка уже удалена; файл без ссылок уберет сверка хранилища
+                await self.db.rollback()
+                logger.exception("Failed to purge photo blob %s", content_hash)
         return True
 
     async def update_card_photo(self, card_id: int, photo_path: str) -> Optional[Card]:
@@ -87,17 +258,192 @@ class CardRepository:
         await self.db.refresh(db_card)
         return db_card
 
-    async def _get_all_cards(self) -> List[Card]:
+    async def update_cards(self, rows: List[dict]) -> None:
         """
-        Получает все карточки без фильтрации по пользователю
+        Обновляет несколько карточек по первичному ключу одной транзакцией
+        
+        Используется для сохранения результатов обработки фото (варианты,
+        хэш, метаданные).
+
+        Args:
+            rows: Словари с ключом id и новыми значениями столбцов
+        """
+        if not rows:
+            return
+        await self.db.execute(update(Card), rows)
+        await self.db.commit()
+
+    async def get_cards_with_legacy_paths(self, after_id: int, limit: int) -> List[Row]:
+        """
+        Получает карточки, фото которых хранятся по абсолютным путям, а не по ключам
+        
+        Args:
+            after_id: Вернуть карточки с id больше этого значения
+            limit: Максимальное число карточек
+            
+        Returns:
+            Строки (id, photo_path, variants) по возрастанию id
+        """
+        result = await self.db.execute(
+            select(Card.id, Card.photo_path, Card.variants)
+            .where(Card.photo_path.startswith("/"), Card.id > after_id)
+            .order_by(Card.id)
+            .limit(limit)
+        )
+        return list(result.all())
+
+    async def relocate_photos(self, cards: List[dict], paths: dict[str, str]) -> None:
+        """
+        Переписывает пути к фото карточек и блобов одной транзакцией
+        
+        Args:
+            cards: Словари {id, photo_path, variants} с новыми ключами
+            paths: Новые ключи блобов по старым путям
+        """
+        if paths:
+            # Таблица, а не модель: UPDATE ORM со списком параметров обновлял бы строки по первичному ключу
+            blobs = cast(Table, PhotoBlob.__table__)
+            await self.db.execute(
+                update(blobs)
+                .where(blobs.c.photo_path == bindparam("old_path"))
+                .values(photo_path=bindparam("new_path")),
+                [{"old_path": old, "new_path": new} for old, new in paths.items()]
+            )
+        if cards:
+            await self.db.execute(update(Card), cards)
+        await self.db.commit()
+
+    async def get_cards_without_metadata(self, after_id: int, limit: int) -> List[Row]:
+        """
+        Получает карточки, для фото которых еще не заполнены метаданные
+        
+        Args:
+            after_id: Вернуть карточки с id больше этого значения
+            limit: Максимальное число карточек
+            
+        Returns:
+            Строки (id, photo_path) по возрастанию id
+        """
+        result = await self.db.execute(
+            select(Card.id, Card.photo_path)
+            .where(Card.width.is_(None), Card.id > after_id)
+            .order_by(Card.id)
+            .limit(limit)
+        )
+        return list(result.all())
+
+    async def get_card_photo_paths(self, after_id: int, limit: int) -> List[Row]:
+        """
+        Получает ключи фото карточек порцией по возрастанию id
         
+        Args:
+            after_id: Вернуть карточки с id больше этого значения
+            limit: Максимальное число карточек
+            
         Returns:
-            Список всех карточек
+            Строки (id, photo_path) по возрастанию id
         """
-        result = await self.db.execute(select(Card))
+        result = await self.db.execute(
+            select(Card.id, Card.photo_path)
+            .where(Card.id > after_id)
+            .order_by(Card.id)
+            .limit(limit)
+        )
+        return list(result.all())
+
+    async def get_cards_by_ids(self, card_ids: List[int], user_id: Optional[int] = None) -> List[Card]:
+        """
+        Получает карточки по списку идентификаторов
+        
+        Args:
+            card_ids: Идентификаторы карточек
+            user_id: Вернуть только карточки этого пользователя
+            
+        Returns:
+            Найденные карточки (отсутствующие и чужие идентификаторы пропускаются)
+        """
+        if not card_ids:
+            return []
+        query = select(Card).where(Card.id.in_(card_ids))
+        if user_id is not None:
+            query = query.where(Card.user_id == user_id)
+        result = await self.db.execute(query)
         return list(result.scalars().all())
 
-    async def get_user_cards(self, user_id: int) -> List[Card]:
+    async def iter_photo_hashes(self, updated_since: Optional[datetime] = None) -> AsyncIterator[Row]:
+        """
+        Потоково перебирает перцептивные хэши карточек
+        
+        Строки читаются серверным курсором порциями, поэтому индекс можно
+        перестроить без загрузки всей таблицы в память.
+
+        Args:
+            updated_since: Вернуть только карточки, обновленные не раньше этого момента
+            
+        Yields:
+            Строки (id, phash, updated_at)
+        """
+        query = select(Card.id, Card.phash, Card.updated_at).where(Card.phash.is_not(None))
+        if updated_since is not None:
+            query = query.where(Card.updated_at >= updated_since)
+        result = await self.db.stream(query.execution_options(yield_per=5000))
+        async for row in result:
+            yield row
+
+    async def iter_referenced_photo_paths(self, batch_size: int) -> AsyncIterator[str]:
+        """
+        Потоково перебирает ключи фото, на которые ссылаются карточки и блобы
+        
+        Ключи упорядочены побайтово (COLLATE "C"), как и ключи хранилища,
+        поэтому оба списка сливаются за один проход. Сортирует PostgreSQL
+        (с выгрузкой на диск при нехватке work_mem), а строки читаются
+        серверным курсором порциями по batch_size. Блобы без ссылок (их
+        удаление после delete_card не завершилось) не учитываются, и сверка
+        хранилища убирает их файлы.
+
+        Yields:
+            Ключ фото без повторов
+        """
+        paths = union_all(
+            select(Card.photo_path.collate("C").label("photo_path")),
+            select(PhotoBlob.photo_path.collate("C").label("photo_path")).where(PhotoBlob.ref_count > 0)
+        ).subquery()
+        result = await self.db.stream(
+            select(paths.c.photo_path).order_by(paths.c.photo_path).execution_options(yield_per=batch_size)
+        )
+        previous = None
+        async for photo_path in result.scalars():
+            if photo_path != previous:
+                yield photo_path
+            previous = photo_path
+
+    async def get_referenced_photo_paths(self, photo_paths: List[str]) -> set[str]:
+        """
+        Возвращает те из ключей, на которые сейчас ссылаются карточки или блобы
+        
+        Args:
+            photo_paths: Проверяемые ключи фото
+            
+        Returns:
+            Множество ключей, которые используются
+        """
+        result = await self.db.execute(union(
+            select(Card.photo_path).where(Card.photo_path.in_(photo_paths)),
+            select(PhotoBlob.photo_path).where(PhotoBlob.photo_path.in_(photo_paths), PhotoBlob.ref_count > 0)
+        ))
+        return set(result.scalars().all())
+
+    async def _get_all_cards(self) -> List[Row]:
+        """
+        Получает все карточки без фильтрации по пользователю
+        
+        Returns:
+            Строки со столбцами CARD_OUT_COLUMNS
+        """
+        result = await self.db.execute(select(*CARD_OUT_COLUMNS))
+        return list(result.all())
+
+    async def get_user_cards(self, user_id: int) -> List[Row]:
         """
         Получает карточки, принадлежащие определенному пользователю
         
@@ -105,7 +451,100 @@ class CardRepository:
             user_id: Идентификатор пользователя
             
         Returns:
-            Список карточек пользователя
+            Строки со столбцами CARD_OUT_COLUMNS
         """
-        result = await self.db.execute(select(Card).where(Card.user_id == user_id))
-        return list(result.scalars().all())
\ No newline at end of file
+        result = await self.db.execute(select(*CARD_OUT_COLUMNS).where(Card.user_id == user_id))
+        return list(result.all())
+
+    async def get_user_card_ids(self, user_id: int) -> List[int]:
+        """
+        Получает идентификаторы карточек пользователя
+        
+        Args:
+            user_id: Идентификатор пользователя
+            
+        Returns:
+            Идентификаторы карточек
+        """
+        result = await self.db.execute(select(Card.id).where(Card.user_id == user_id))
+        return list(result.scalars().all())
+
+    async def get_user_cards_page(
+        self,
+        user_id: int,
+        limit: int,
+        after: Optional[tuple[datetime, int]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        title_prefix: Optional[str] = None,
+        orientation: Optional[str] = None,
+        min_width: Optional[int] = None,
+        min_height: Optional[int] = None,
+        image_format: Optional[str] = None,
+        captured_after: Optional[datetime] = None,
+        captured_before: Optional[datetime] = None
+    ) -> List[Row]:
+        """
+        Получает страницу карточек пользователя от новых к старым (keyset пагинация)
+        
+        Страница начинается сразу после карточки-курсора, поэтому стоимость
+        запроса не зависит ни от номера страницы, ни от общего числа карточек.
+
+        Args:
+            user_id: Идентификатор пользователя
+            limit: Максимальное число карточек на странице
+            after: (created_at, id) последней карточки предыдущей страницы
+            min_price: Минимальная цена включительно
+            max_price: Максимальная цена включительно
+            title_prefix: Префикс названия
+            orientation: Ориентация фото (landscape, portrait, square)
+            min_width: Минимальная ширина фото в пикселях
+            min_height: Минимальная высота фото в пикселях
+            image_format: Формат фото (JPEG, PNG)
+            captured_after: Снято не раньше этого момента
+            captured_before: Снято раньше этого момента
+            
+        Returns:
+            Строки страницы со столбцами CARD_OUT_COLUMNS
+        """
+        query = select(*CARD_OUT_COLUMNS).where(Card.user_id == user_id)
+        if min_price is not None:
+            query = query.where(Card.price >= min_price)
+        if max_price is not None:
+            query = query.where(Card.price <= max_price)
+        if title_prefix:
+            query = query.where(Card.title.startswith(title_prefix, autoescape=True))
+        if orientation:
+            query = query.where(Card.orientation == orientation)
+        if min_width is not None:
+            query = query.where(Card.width >= min_width)
+        if min_height is not None:
+            query = query.where(Card.height >= min_height)
+        if image_format:
+            query = query.where(Card.image_format == image_format)
+        if captured_after is not None:
+            query = query.where(Card.captured_at >= captured_after)
+        if captured_before is not None:
+            query = query.where(Card.captured_at < captured_before)
+        if after is not None:
+            created_at, card_id = after
+            query = query.where(tuple_(Card.created_at, Card.id) < tuple_(literal(created_at), literal(card_id)))
+
+        query = query.order_by(Card.created_at.desc(), Card.id.desc()).limit(limit)
+        result = await self.db.execute(query)
+        return list(result.all())
+
+    async def get_user_photo_refs(self, user_id: int) -> List[Row]:
+        """
+        Получает только поля карточек пользователя, нужные для выгрузки архива
+        
+        Args:
+            user_id: Идентификатор пользователя
+            
+        Returns:
+            Строки (id, photo_path, updated_at)
+        """
+        result = await self.db.execute(
+            select(Card.id, Card.photo_path, Card.updated_at).where(Card.user_id == user_id)
+        )
+        return list(result.all())
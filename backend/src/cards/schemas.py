@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, Field
+from typing import Optional, List
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 class CardBase(BaseModel):
@@ -12,12 +12,65 @@ class CardBase(BaseModel):
 class CardCreate(CardBase):
     user_id: int
     photo_path: str
+    content_hash: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    orientation: Optional[str] = None
+    byte_size: Optional[int] = None
+    image_format: Optional[str] = None
+    captured_at: Optional[datetime] = None
 
 class CardInDB(CardBase):
     id: int
     created_at: datetime
+    updated_at: datetime
     photo_path: str
+    content_hash: Optional[str] = None
+    variants: Optional[dict[str, str]] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    orientation: Optional[str] = None
+    byte_size: Optional[int] = None
+    image_format: Optional[str] = None
+    captured_at: Optional[datetime] = None
+    dominant_color: Optional[str] = None
     user_id: int
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# Пакетное построение списков карточек из строк БД одним вызовом pydantic-core
+card_list_adapter = TypeAdapter(List[CardInDB])
+
+
+class CardCreated(CardInDB):
+    processing_job_id: Optional[int] = None
+
+
+class CardPage(BaseModel):
+    items: List[CardInDB]
+    next_cursor: Optional[str] = None
+
+
+class BatchCardResult(BaseModel):
+    index: int
+    card: Optional[CardInDB] = None
+    error: Optional[str] = None
+
+
+class BatchCardResponse(BaseModel):
+    created: int
+    failed: int
+    items: List[BatchCardResult]
+    processing_job_id: Optional[int] = None
+
+
+class SimilarCard(BaseModel):
+    card: CardInDB
+    distance: int
+
+
+class VisuallySimilarCard(BaseModel):
+    card: CardInDB
+    score: float
@@ -1,71 +1,457 @@
-from typing import Optional, List
-import io
+from datetime import datetime, timedelta
+from typing import Any, Optional, List
+import asyncio
+import base64
+import binascii
+import logging
+import os
+import numpy as np
+from fastapi import HTTPException
+from pydantic import ValidationError
 from fastapi import UploadFile
-from src.core.utils import photo_hashed_name
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.core.base_service import BaseService
-from src.user.schemas import UserInDB
+from src.user.schemas import CurrentUser
 from .repository import CardRepository
-from .schemas import CardCreate, CardInDB, CardBase
+from .schemas import CardCreate, CardInDB, CardCreated, CardBase, CardPage, BatchCardResult, BatchCardResponse, \
+    SimilarCard, VisuallySimilarCard, card_list_adapter
 from .model import Card
-from src.core.utils import save_photo, get_photo_file, create_zip_archive
+from .archive_cache import PhotoArchive, archive_cache, iter_file
+from src.core.config import settings
+from src.core.executors import run_in_process
+from src.core.storage import photo_storage
+from src.jobs.model import Job
+from src.jobs.queue import job_queue
+from .embeddings import embedding_index
+from .processing import process_photo
+from .similarity import similarity_index, to_signed, to_unsigned
+from .variants import variant_path
+from src.core.utils import SavedPhoto, discard_photo, save_photo, iter_zip_archive
 
+logger = logging.getLogger(__name__)
+
+# Тип фоновой задачи обработки загруженных фото
+PROCESS_PHOTOS_JOB = "process_card_photos"
+
+
+def _encode_cursor(card: CardInDB) -> str:
+    """Кодирует позицию карточки (created_at, id) в непрозрачный курсор"""
+    raw = f"{card.created_at.isoformat()}|{card.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Декодирует курсор страницы в (created_at, id).
+
+    Raises:
+        HTTPException: 400 при некорректном курсоре
+    """
+    try:
+        created_at, _, card_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")
+        return datetime.fromisoformat(created_at), int(card_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _card_create(card_data: CardBase, user: CurrentUser, photo: SavedPhoto) -> CardCreate:
+    """Данные новой карточки с метаданными, прочитанными из заголовка фото при загрузке"""
+    return CardCreate(
+        **card_data.model_dump(),
+        user_id=user.id,
+        photo_path=photo.path,
+        content_hash=photo.content_hash,
+        width=photo.image.width,
+        height=photo.image.height,
+        orientation=photo.image.orientation,
+        byte_size=photo.size,
+        image_format=photo.image.format,
+        captured_at=photo.image.captured_at
+    )
+
+
+async def _process_card_photo(photo_path: str, specs: dict[str, dict], semaphore: asyncio.Semaphore) -> dict:
+    """
+    Обрабатывает одно фото: читает оригинал из хранилища, анализирует его
+    в пуле процессов и сохраняет недостающие варианты.
+
+    Уже существующие варианты не пересоздаются: блобы контентно-адресуемы,
+    и повторная загрузка того же фото получает готовые файлы.
+
+    Returns:
+        Результат process_photo, где variants — ключи всех вариантов в хранилище по имени
+    """
+    variants = {name: variant_path(photo_path, name, spec["format"]) for name, spec in specs.items()}
+    async with semaphore:
+        found = await asyncio.gather(*(photo_storage.exists(key) for key in variants.values()))
+        pending = [name for name, exists in zip(variants, found) if not exists]
+        data = await photo_storage.read(photo_path)
+        outcome = await run_in_process(process_photo, data, specs, pending)
+        await asyncio.gather(*(
+            photo_storage.put(variants[name], rendered) for name, rendered in outcome["variants"].items()
+        ))
+    return {**outcome, "variants": variants}
 
 
 class CardService(BaseService[CardInDB, CardCreate]):
     def __init__(self, db: AsyncSession):
+        super().__init__(db)
         self.repository = CardRepository(db)
 
-    async def create(self, data: CardCreate) -> CardInDB:
+    async def create(self, data: CardCreate, photo_size: int = 0, photo: Optional[SavedPhoto] = None) -> CardInDB:
         """Создание карточки (реализация абстрактного метода)"""
-        card = await self.repository.create_card(data)
+        card = await self.repository.create_card(data, photo_size=photo_size, photo=photo)
         return CardInDB.model_validate(card)
 
-    async def create_with_photo(self, card_data: CardBase, file: UploadFile, user:UserInDB) -> CardInDB:
-        """Создание карточки с фото"""
-        hashed_name = photo_hashed_name(email=user.email)
-        photo_path = save_photo(file, hashed_name)
-        card_data_in_db = CardCreate(
-            **card_data.model_dump(),
-            user_id=user.id,
-            photo_path=photo_path
+    async def create_with_photo(self, card_data: CardBase, file: UploadFile, user:CurrentUser) -> CardCreated:
+        """
+        Создание карточки с фото.
+
+        Возвращает карточку сразу после сохранения оригинала на диск и записи
+        в БД; варианты, хэш и вектор признаков заполняет фоновая задача,
+        идентификатор которой возвращается в processing_job_id.
+        """
+        photo = await save_photo(file)
+        try:
+            card = await self.repository.create_card(
+                _card_create(card_data, user, photo), photo_size=photo.size, photo=photo, commit=False
+            )
+            job = await self._enqueue_processing([card.id], user.id)
+            await self.db.commit()
+        finally:
+            discard_photo(photo)
+        job_queue.notify()
+        await self._invalidate_archive(user.id)
+        return CardCreated(**CardInDB.model_validate(card).model_dump(), processing_job_id=job.id)
+
+    async def create_many_with_photos(
+        self,
+        items: List[Any],
+        files: List[UploadFile],
+        user: CurrentUser
+    ) -> BatchCardResponse:
+        """
+        Пакетное создание карточек с фото.
+
+        Фото сохраняются параллельно (не более BATCH_UPLOAD_CONCURRENCY
+        одновременно), затем все прошедшие проверку карточки вставляются
+        одной транзакцией. Ошибка отдельного элемента не отменяет остальные
+        и возвращается в результате под его индексом. Фото всех созданных
+        карточек обрабатываются одной фоновой задачей, поставленной в той же
+        транзакции.
+        """
+        results = [BatchCardResult(index=index) for index in range(len(items))]
+        job_id = None
+        semaphore = asyncio.Semaphore(settings.BATCH_UPLOAD_CONCURRENCY)
+        photos: List[SavedPhoto] = []
+
+        async def prepare(index: int) -> Optional[tuple[CardCreate, int]]:
+            try:
+                card_data = CardBase.model_validate(items[index])
+            except ValidationError as e:
+                results[index].error = f"Invalid card data: {e.errors(include_url=False)}"
+                return None
+
+            try:
+                async with semaphore:
+                    photo = await save_photo(files[index])
+            except HTTPException as e:
+                results[index].error = str(e.detail)
+                return None
+
+            photos.append(photo)
+            return _card_create(card_data, user, photo), photo.size
+
+        try:
+            prepared = await asyncio.gather(*(prepare(index) for index in range(len(items))))
+            pending = [(index, item) for index, item in enumerate(prepared) if item is not None]
+
+            if pending:
+                try:
+                    cards = await self.repository.create_cards([item for _, item in pending], photos, commit=False)
+                    job = await self._enqueue_processing([card.id for card in cards], user.id)
+                    await self.db.commit()
+                except Exception:
+                    logger.exception("Batch insert of %s cards failed", len(pending))
+                    await self.db.rollback()
+                    for index, _ in pending:
+                        results[index].error = "Database error"
+                else:
+                    for (index, _), card in zip(pending, cards):
+                        results[index].card = CardInDB.model_validate(card)
+                    job_queue.notify()
+                    await self._invalidate_archive(user.id)
+                    job_id = job.id
+        finally:
+            for photo in photos:
+                discard_photo(photo)
+
+        created_count = sum(1 for result in results if result.card is not None)
+        return BatchCardResponse(
+            created=created_count,
+            failed=len(results) - created_count,
+            items=results,
+            processing_job_id=job_id
+        )
+
+    async def _enqueue_processing(self, card_ids: List[int], user_id: int) -> Job:
+        """
+        Ставит фоновую задачу обработки фото карточек в текущую транзакцию.
+
+        Задача коммитится (или откатывается) вместе с карточками, поэтому
+        сохраненная карточка не может остаться без задачи обработки.
+        """
+        return await job_queue.enqueue(
+            self.db, PROCESS_PHOTOS_JOB, {"card_ids": card_ids}, user_id=user_id, commit=False
+        )
+
+    async def process_photos(self, card_ids: List[int]) -> None:
+        """
+        Обрабатывает фото карточек в пуле процессов: варианты, перцептивный хэш
+        и вектор признаков. Выполняется фоновой задачей.
+
+        Фото обрабатываются параллельно (в памяти не больше двух оригиналов
+        на процесс пула), а результаты записываются в БД одним пакетом.
+        Уже обработанные и удаленные карточки пропускаются, поэтому повтор
+        задачи обрабатывает только то, что не удалось в прошлый раз.
+
+        Raises:
+            RuntimeError: если обработать удалось не все фото
+        """
+        cards = [
+            card for card in await self.repository.get_cards_by_ids(card_ids)
+            if card.phash is None
+        ]
+        specs = {name: spec.model_dump() for name, spec in settings.PHOTO_VARIANTS.items()}
+        semaphore = asyncio.Semaphore(settings.PHOTO_PROCESS_WORKERS * 2)
+        outcomes = await asyncio.gather(
+            *(_process_card_photo(card.photo_path, specs, semaphore) for card in cards),
+            return_exceptions=True
         )
-        return await self.create(card_data_in_db)
+
+        failed = []
+        analyses = []
+        embeddings = []
+        for card, outcome in zip(cards, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error("Failed to process photo for card %s", card.id, exc_info=outcome)
+                failed.append(card.id)
+                continue
+            analyses.append({
+                "id": card.id,
+                "variants": outcome["variants"],
+                "phash": to_signed(outcome["phash"]),
+                "dominant_color": outcome["dominant_color"],
+            })
+            embeddings.append(outcome["embedding"])
+
+        await self.repository.update_cards(analyses)
+        for analysis in analyses:
+            similarity_index.add(analysis["id"], to_unsigned(analysis["phash"]))
+        if embeddings:
+            try:
+                await run_in_threadpool(
+                    embedding_index.add_many, [analysis["id"] for analysis in analyses], np.stack(embeddings)
+                )
+            except OSError:
+                logger.exception("Failed to append photo embeddings to the index")
+
+        if failed:
+            raise RuntimeError(f"Failed to process photos of cards {failed}")
 
     async def get(self, id: int) -> Optional[CardInDB]:
         """Получение записи карточек по ID"""
         card = await self.repository.get_card(id)
-        return CardInDB.model_validate(card)
+        return CardInDB.model_validate(card) if card else None
     
-    async def get_photo_files_zip(self, user_id: int) -> Optional[io.BytesIO]:
-        """Получение ZIP архива с фотографиями для карточек пользователя"""
-        cards = await self.get_user_cards(user_id)
+    async def get_photo_files_zip(self, user_id: int) -> Optional[PhotoArchive]:
+        """
+        Получение ZIP архива с фотографиями для карточек пользователя.
+
+        Если архив для текущего набора карточек уже есть в кэше, возвращается
+        чтение открытого файла архива, иначе — потоковый генератор, который
+        попутно заполняет кэш.
+        """
+        cards = await self.repository.get_user_photo_refs(user_id)
         if not cards:
             return None
-        
-        photo_files = []
-        for card in cards:
-            file_obj = get_photo_file(card.photo_path)
-            if file_obj:
-                photo_files.append(file_obj)
-        
-        if not photo_files:
-            return None
-        
-        # Создаем ZIP архив
-        zip_buffer = create_zip_archive(photo_files)
-        return zip_buffer
+
+        fingerprint = archive_cache.fingerprint(cards)
+        if settings.ARCHIVE_CACHE_ENABLED:
+            cached = await run_in_threadpool(archive_cache.open, user_id, fingerprint)
+            if cached is not None:
+                return PhotoArchive(stream=iter_file(cached), size=os.fstat(cached.fileno()).st_size)
+
+        # Карточки с одинаковым фото ссылаются на один блоб, в архив он попадает один раз;
+        # отсутствующие в хранилище файлы пропускаются при формировании архива
+        stream = iter_zip_archive(dict.fromkeys(card.photo_path for card in cards))
+        if settings.ARCHIVE_CACHE_ENABLED:
+            stream = archive_cache.tee(user_id, fingerprint, stream)
+        return PhotoArchive(stream=stream)
 
     async def delete(self, id: int) -> bool:
         """Удаление карточки"""
-        return await self.repository.delete_card(id)
+        card = await self.repository.get_card(id)
+        if card is None:
+            return False
+        deleted = await self.repository.delete_card(id)
+        similarity_index.remove(id)
+        await run_in_threadpool(embedding_index.remove, id)
+        await self._invalidate_archive(card.user_id)
+        return deleted
+
+    async def _invalidate_archive(self, user_id: int) -> None:
+        """Сброс закэшированных архивов пользователя после изменения его карточек"""
+        if settings.ARCHIVE_CACHE_ENABLED:
+            await run_in_threadpool(archive_cache.invalidate, user_id)
 
     async def _get_all(self) -> List[CardInDB]:
         """Получение всех карточек"""
-        cards = await self.repository._get_all_cards()
-        return [CardInDB.model_validate(card) for card in cards]
+        return card_list_adapter.validate_python(await self.repository._get_all_cards(), from_attributes=True)
 
     async def get_user_cards(self, user_id: int) -> List[CardInDB]:
         """Получение карточек конкретного пользователя"""
-        cards = await self.repository.get_user_cards(user_id)
-        return [CardInDB.model_validate(card) for card in cards]
\ No newline at end of file
+        return card_list_adapter.validate_python(await self.repository.get_user_cards(user_id), from_attributes=True)
+
+    async def list_user_cards(
+        self,
+        user_id: int,
+        limit: int,
+        cursor: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        title_prefix: Optional[str] = None,
+        orientation: Optional[str] = None,
+        min_width: Optional[int] = None,
+        min_height: Optional[int] = None,
+        image_format: Optional[str] = None,
+        captured_after: Optional[datetime] = None,
+        captured_before: Optional[datetime] = None
+    ) -> CardPage:
+        """Постраничное получение карточек пользователя с фильтрами"""
+        after = _decode_cursor(cursor) if cursor else None
+        # Время съемки из EXIF хранится без часового пояса (местное время камеры)
+        captured_after = captured_after.replace(tzinfo=None) if captured_after else None
+        captured_before = captured_before.replace(tzinfo=None) if captured_before else None
+        # Одна лишняя строка показывает, есть ли следующая страница
+        cards = await self.repository.get_user_cards_page(
+            user_id,
+            limit + 1,
+            after=after,
+            min_price=min_price,
+            max_price=max_price,
+            title_prefix=title_prefix,
+            orientation=orientation,
+            min_width=min_width,
+            min_height=min_height,
+            image_format=image_format,
+            captured_after=captured_after,
+            captured_before=captured_before
+        )
+        items = card_list_adapter.validate_python(cards[:limit], from_attributes=True)
+        next_cursor = _encode_cursor(items[-1]) if len(cards) > limit else None
+        return CardPage(items=items, next_cursor=next_cursor)
+
+    async def refresh_similarity_index(self) -> None:
+        """
+        Дополняет индекс похожих фото изменениями из БД.
+
+        При первом вызове (на старте приложения) индекс строится целиком,
+        далее подгружаются только карточки, обновленные после предыдущего
+        обновления: так воркер видит фото, обработанные другими воркерами.
+        Запрос захватывает еще SIMILARITY_REFRESH_SECONDS до последнего
+        увиденного updated_at, чтобы не пропустить строки, закоммиченные
+        позже строк с большим updated_at; повторное добавление хэша ничего не меняет.
+        """
+        watermark = similarity_index.watermark
+        updated_since = None
+        if watermark is not None:
+            updated_since = watermark - timedelta(seconds=settings.SIMILARITY_REFRESH_SECONDS)
+        async for row in self.repository.iter_photo_hashes(updated_since=updated_since):
+            similarity_index.add(row.id, to_unsigned(row.phash))
+            if watermark is None or row.updated_at > watermark:
+                watermark = row.updated_at
+        similarity_index.mark_refreshed(watermark)
+
+    async def find_similar(
+        self,
+        card_id: int,
+        user_id: int,
+        max_distance: int,
+        limit: int
+    ) -> Optional[List[SimilarCard]]:
+        """
+        Поиск среди карточек пользователя карточек с похожими фото
+        (расстояние Хэмминга dHash не больше max_distance)
+
+        Returns:
+            Список похожих карточек от самых похожих, или None если карточка
+            не найдена или принадлежит другому пользователю
+        """
+        card = await self.repository.get_card(card_id)
+        if card is None or card.user_id != user_id:
+            return None
+        if card.phash is None:
+            raise HTTPException(status_code=409, detail="Photo of this card has not been processed yet")
+
+        if similarity_index.is_stale(settings.SIMILARITY_REFRESH_SECONDS):
+            await self.refresh_similarity_index()
+
+        # Индекс общий для всех пользователей: чужие и удаленные карточки отсеиваются запросом
+        # к БД, поэтому кандидаты проверяются порциями с запасом, пока не наберется limit своих
+        candidates = [
+            match for match in similarity_index.search(to_unsigned(card.phash), max_distance) if match[0] != card_id
+        ]
+        batch_size = limit * 2
+        similar: List[SimilarCard] = []
+        for start in range(0, len(candidates), batch_size):
+            batch = candidates[start:start + batch_size]
+            found = {
+                found.id: found
+                for found in await self.repository.get_cards_by_ids([match[0] for match in batch], user_id=user_id)
+            }
+            for match_id, distance in batch:
+                if match_id in found:
+                    similar.append(SimilarCard(card=CardInDB.model_validate(found[match_id]), distance=distance))
+                    if len(similar) == limit:
+                        return similar
+        return similar
+
+    async def find_visually_similar(
+        self,
+        card_id: int,
+        user_id: int,
+        limit: int
+    ) -> Optional[List[VisuallySimilarCard]]:
+        """
+        Поиск среди карточек пользователя карточек с визуально похожими фото
+        по косинусной близости векторов признаков
+
+        Returns:
+            Список похожих карточек от самых похожих, или None если карточка
+            не найдена или принадлежит другому пользователю
+        """
+        card = await self.repository.get_card(card_id)
+        if card is None or card.user_id != user_id:
+            return None
+        embedding = await run_in_threadpool(embedding_index.get, card_id)
+        if embedding is None:
+            raise HTTPException(status_code=409, detail="Photo of this card has not been processed yet")
+
+        own_ids = np.asarray(await self.repository.get_user_card_ids(user_id), dtype=np.int64)
+        # Сама карточка всегда ближайшая к себе, поэтому запрашиваем на одну больше
+        results = await run_in_threadpool(embedding_index.search, embedding, limit + 1, own_ids)
+        matches = [match for match in results[0] if match[0] != card_id][:limit]
+        found = {found.id: found for found in await self.repository.get_cards_by_ids([match[0] for match in matches])}
+
+        return [
+            VisuallySimilarCard(card=CardInDB.model_validate(found[match_id]), score=score)
+            for match_id, score in matches
+            if match_id in found
+        ]
+
+
+@job_queue.handler(PROCESS_PHOTOS_JOB)
+async def _process_card_photos(db: AsyncSession, payload: dict) -> None:
+    await CardService(db).process_photos(payload["card_ids"])
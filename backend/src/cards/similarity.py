@@ -0,0 +1,159 @@
+from datetime import datetime
+from typing import Iterable, Optional
+import time
+import numpy as np
+from PIL import Image
+
+# Маска для перевода хэша между знаковым BIGINT в БД и беззнаковым 64-битным значением
+_UINT64_MASK = (1 << 64) - 1
+
+
+def dhash(image: Image.Image) -> int:
+    """
+    Вычисляет 64-битный разностный хэш (dHash) изображения.
+
+    Изображение сжимается до 9x8 в оттенках серого, и каждый бит
+    показывает, ярче ли пиксель своего правого соседа. Хэш устойчив
+    к масштабированию, перекодированию и небольшим правкам цвета.
+
+    Args:
+        image: Изображение Pillow
+
+    Returns:
+        Хэш как беззнаковое 64-битное целое
+    """
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.Resampling.LANCZOS), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def to_signed(value: int) -> int:
+    """Переводит беззнаковый 64-битный хэш в значение для столбца BIGINT"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value: int) -> int:
+    """Переводит значение столбца BIGINT обратно в беззнаковый хэш"""
+    return value & _UINT64_MASK
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class _BKNode:
+    __slots__ = ("hash", "card_ids", "children")
+
+    def __init__(self, value: int):
+        self.hash = value
+        self.card_ids: set[int] = set()
+        self.children: dict[int, "_BKNode"] = {}
+
+
+class PhotoHashIndex:
+    """
+    Индекс перцептивных хэшей карточек на основе BK-дерева.
+
+    BK-дерево по метрике Хэмминга позволяет найти все хэши в радиусе k,
+    обходя только поддеревья, которые по неравенству треугольника могут
+    содержать совпадения, а не все карточки подряд. Карточки с одинаковым
+    хэшем хранятся в одном узле. Удаление помечает карточку как удаленную
+    (узел остается в дереве), поэтому структура дерева не перестраивается.
+    """
+    def __init__(self) -> None:
+        self._root: Optional[_BKNode] = None
+        self._nodes_by_card: dict[int, _BKNode] = {}
+        self.refreshed_at: Optional[float] = None
+        # Наибольший updated_at карточек, загруженных в индекс
+        self.watermark: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self._nodes_by_card)
+
+    def clear(self) -> None:
+        self._root = None
+        self._nodes_by_card.clear()
+        self.refreshed_at = None
+        self.watermark = None
+
+    def get(self, card_id: int) -> Optional[int]:
+        """Возвращает хэш карточки, если она есть в индексе"""
+        node = self._nodes_by_card.get(card_id)
+        return node.hash if node else None
+
+    def add(self, card_id: int, value: int) -> None:
+        """
+        Добавляет (или обновляет) хэш карточки
+
+        Args:
+            card_id: Идентификатор карточки
+            value: Беззнаковый 64-битный хэш
+        """
+        if self.get(card_id) == value:
+            return
+        self.remove(card_id)
+
+        if self._root is None:
+            self._root = _BKNode(value)
+            node = self._root
+        else:
+            node = self._root
+            while True:
+                distance = hamming_distance(value, node.hash)
+                if distance == 0:
+                    break
+                child = node.children.get(distance)
+                if child is None:
+                    child = node.children[distance] = _BKNode(value)
+                    node = child
+                    break
+                node = child
+
+        node.card_ids.add(card_id)
+        self._nodes_by_card[card_id] = node
+
+    def add_many(self, items: Iterable[tuple[int, int]]) -> None:
+        for card_id, value in items:
+            self.add(card_id, value)
+
+    def remove(self, card_id: int) -> None:
+        node = self._nodes_by_card.pop(card_id, None)
+        if node is not None:
+            node.card_ids.discard(card_id)
+
+    def search(self, value: int, max_distance: int) -> list[tuple[int, int]]:
+        """
+        Находит карточки, хэш которых отличается не более чем на max_distance бит
+
+        Args:
+            value: Беззнаковый 64-битный хэш
+            max_distance: Максимальное расстояние Хэмминга
+
+        Returns:
+            Пары (card_id, расстояние), отсортированные по расстоянию
+        """
+        if self._root is None:
+            return []
+
+        matches: list[tuple[int, int]] = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node.hash)
+            if distance <= max_distance:
+                matches.extend((card_id, distance) for card_id in node.card_ids)
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(child for edge, child in node.children.items() if low <= edge <= high)
+
+        matches.sort(key=lambda match: (match[1], match[0]))
+        return matches
+
+    def is_stale(self, max_age: float) -> bool:
+        return self.refreshed_at is None or time.monotonic() - self.refreshed_at > max_age
+
+    def mark_refreshed(self, watermark: Optional[datetime]) -> None:
+        self.refreshed_at = time.monotonic()
+        self.watermark = watermark
+
+
+similarity_index = PhotoHashIndex()
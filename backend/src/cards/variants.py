@@ -0,0 +1,45 @@
+import io
+import os
+from PIL import Image
+
+# Расширения файлов по формату Pillow
+VARIANT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+
+
+def variant_path(photo_path: str, name: str, image_format: str) -> str:
+    """
+    Формирует ключ варианта фотографии рядом с оригиналом.
+
+    Args:
+        photo_path: Ключ оригинала в хранилище
+        name: Имя варианта (thumb, medium, ...)
+        image_format: Формат Pillow (JPEG, WEBP, ...)
+
+    Returns:
+        Ключ вида ab/cd/<хэш>.<вариант>.<расширение>
+    """
+    base, _ = os.path.splitext(photo_path)
+    return f"{base}.{name}.{VARIANT_EXTENSIONS[image_format.upper()]}"
+
+
+def render_variants(image: Image.Image, specs: dict[str, dict]) -> dict[str, bytes]:
+    """
+    Создает уменьшенные варианты фотографии.
+
+    Args:
+        image: Декодированное и повернутое по EXIF изображение
+        specs: Параметры недостающих вариантов по имени (PhotoVariantSpec.model_dump())
+
+    Returns:
+        Закодированные варианты по имени
+    """
+    rendered = {}
+    for name, spec in specs.items():
+        variant = image.copy()
+        variant.thumbnail((spec["max_size"], spec["max_size"]), Image.Resampling.LANCZOS)
+        if spec["format"].upper() == "JPEG" and variant.mode not in ("RGB", "L"):
+            variant = variant.convert("RGB")
+        buffer = io.BytesIO()
+        variant.save(buffer, format=spec["format"].upper(), quality=spec["quality"], optimize=True)
+        rendered[name] = buffer.getvalue()
+    return rendered
@@ -1,20 +1,140 @@
-from typing import AsyncGenerator
+from contextvars import ContextVar
+import asyncio
+import itertools
+import logging
+import time
+from typing import AsyncGenerator, List, Optional, cast
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker
 )
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.dml import UpdateBase
 from fastapi import Depends
 from .config import settings
+from .metrics import current_request_stats, registry
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_CHECKOUT_SECONDS = registry.histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a pooled DB connection", ("engine",)
+)
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_seconds", "DB statement execution time", ("engine",)
+)
+DB_POOL_CHECKED_OUT = registry.gauge(
+    "db_pool_checked_out", "DB connections currently checked out of the pool", ("engine",)
+)
+DB_POOL_SIZE = registry.gauge(
+    "db_pool_size", "Configured DB pool size", ("engine",)
+)
+DB_POOL_OVERFLOW = registry.gauge(
+    "db_pool_overflow", "DB connections opened above the pool size", ("engine",)
+)
+DB_REPLICA_HEALTHY = registry.gauge(
+    "db_replica_healthy", "Whether the read replica passed its last health check", ("engine",)
+)
+DB_READ_SESSIONS = registry.counter(
+    "db_read_sessions_total", "Read-only DB sessions by the engine their reads were routed to", ("engine",)
+)
+
+
+class ReadRouting:
+    """
+    Состояние маршрутизации чтений в рамках HTTP запроса.
+
+    pinned — клиент недавно записывал (см. PrimaryPinMiddleware), wrote —
+    текущий запрос уже выполнил запись. В обоих случаях чтения идут в
+    основную БД, чтобы клиент видел собственные изменения.
+    """
+    __slots__ = ("pinned", "wrote")
+
+    def __init__(self, pinned: bool = False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+current_read_routing: ContextVar[Optional[ReadRouting]] = ContextVar("current_read_routing", default=None)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, замеряющий время ожидания свободного соединения"""
+    metrics_label = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start, engine=self.metrics_label)
+
+
+def _pool(engine: AsyncEngine) -> InstrumentedQueuePool:
+    """Пул соединений движка, созданного create_engine"""
+    return cast(InstrumentedQueuePool, engine.sync_engine.pool)
+
+
+def create_engine(database_url: str, label: str) -> AsyncEngine:
+    """
+    Создает асинхронный движок с настройками пула из Settings и метриками.
+
+    Args:
+        database_url: URL подключения к БД
+        label: Значение метки engine в метриках
+
+    Returns:
+        Асинхронный движок SQLAlchemy
+    """
+    engine_kwargs = {}
+    if make_url(database_url).drivername == "postgresql+asyncpg":
+        engine_kwargs["connect_args"] = {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+
+    engine = create_async_engine(
+        database_url,
+        poolclass=InstrumentedQueuePool,
+        pool_pre_ping=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        echo=settings.DEBUG,
+        **engine_kwargs
+    )
+    pool = _pool(engine)
+    pool.metrics_label = label
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started_at = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started_at
+        DB_QUERY_SECONDS.observe(elapsed, engine=label)
+        # Вне HTTP запроса (фоновые задачи, команды) счетчиков запроса нет
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_seconds += elapsed
+        if context.isinsert or context.isupdate or context.isdelete:
+            routing = current_read_routing.get()
+            if routing is not None:
+                routing.wrote = True
+
+    DB_POOL_CHECKED_OUT.set_function(lambda: {(label,): pool.checkedout()})
+    DB_POOL_SIZE.set_function(lambda: {(label,): pool.size()})
+    DB_POOL_OVERFLOW.set_function(lambda: {(label,): max(pool.overflow(), 0)})
+    return engine
 
 
 # Асинхронный движок подключения к БД
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
-async_engine = create_async_engine(
-    SQLALCHEMY_DATABASE_URL,
-    pool_pre_ping=True,
-    echo=True
-)
+async_engine = create_engine(SQLALCHEMY_DATABASE_URL, label="primary")
 
 # Асинхронная фабрика сессий
 AsyncSessionLocal = async_sessionmaker(
@@ -25,6 +145,191 @@ AsyncSessionLocal = async_sessionmaker(
 )
 
 
+class Replica:
+    """Реплика для чтения и результат ее последней проверки"""
+    __slots__ = ("label", "engine", "healthy")
+
+    def __init__(self, label: str, engine: AsyncEngine):
+        self.label = label
+        self.engine = engine
+        self.healthy = True
+
+
+class ReplicaSet:
+    """
+    Реплики для чтения с выбором по стратегии и учетом их здоровья.
+
+    round_robin выбирает реплики по очереди, least_connections — реплику с
+    наименьшим числом выданных из пула соединений. Фоновая задача проверяет
+    реплики (SELECT 1 с таймаутом) каждые check_seconds; реплика, не
+    прошедшая проверку или оборвавшая соединение во время запроса,
+    исключается из выбора до следующей успешной проверки. Обрыв
+    отслеживается по ошибкам драйвера на движке самой реплики, поэтому
+    ошибки обработчика (хранилища, клиента) на выбор не влияют. Если
+    здоровых реплик нет, чтения идут в основную БД.
+    """
+    def __init__(
+        self,
+        urls: List[str],
+        strategy: str = "round_robin",
+        check_seconds: float = 5,
+        check_timeout: float = 2
+    ):
+        """
+        Инициализация набора реплик
+
+        Args:
+            urls: URL подключения к репликам
+            strategy: Стратегия выбора: round_robin или least_connections
+            check_seconds: Интервал между проверками здоровья
+            check_timeout: Таймаут одной проверки
+        """
+        self.replicas = [
+            Replica(f"replica{number}", create_engine(url, label=f"replica{number}"))
+            for number, url in enumerate(urls, start=1)
+        ]
+        self.strategy = strategy
+        self.check_seconds = check_seconds
+        self.check_timeout = check_timeout
+        self._turn = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        for replica in self.replicas:
+            self._watch_errors(replica)
+        DB_REPLICA_HEALTHY.set_function(lambda: {(replica.label,): int(replica.healthy) for replica in self.replicas})
+
+    def _watch_errors(self, replica: Replica) -> None:
+        """Исключает реплику при обрыве соединения или ошибке подключения к ней"""
+        @event.listens_for(replica.engine.sync_engine, "handle_error")
+        def _handle_error(context):
+            # Пул сам заменяет соединение, не прошедшее pre-ping;
+            # connection is None — ошибка возникла при подключении
+            if context.is_pre_ping:
+                return
+            if context.is_disconnect or context.connection is None:
+                self.mark_unhealthy(replica)
+
+    def choose(self) -> Optional[Replica]:
+        """
+        Выбор реплики для новой сессии
+
+        Returns:
+            Здоровая реплика или None, если таких нет
+        """
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        offset = next(self._turn) % len(healthy)
+        if self.strategy == "least_connections":
+            # Сдвиг очереди распределяет нагрузку между репликами с одинаковым числом соединений
+            candidates = healthy[offset:] + healthy[:offset]
+            return min(candidates, key=lambda replica: _pool(replica.engine).checkedout())
+        return healthy[offset]
+
+    def mark_unhealthy(self, replica: Replica) -> None:
+        """Исключает реплику из выбора до следующей успешной проверки"""
+        if replica.healthy:
+            logger.warning("Read replica %s is unavailable, routing its reads elsewhere", replica.label)
+        replica.healthy = False
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            async with asyncio.timeout(self.check_timeout):
+                async with replica.engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+        except Exception:
+            self.mark_unhealthy(replica)
+            return
+        if not replica.healthy:
+            logger.info("Read replica %s is available again", replica.label)
+        replica.healthy = True
+
+    async def check(self) -> None:
+        """Проверяет все реплики одновременно"""
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_seconds)
+
+    def start(self) -> None:
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="db-replica-health")
+
+    async def stop(self) -> None:
+        """Останавливает проверки и закрывает соединения с репликами"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+replica_set = ReplicaSet(
+    settings.DATABASE_REPLICA_URLS,
+    strategy=settings.DB_REPLICA_STRATEGY,
+    check_seconds=settings.DB_REPLICA_HEALTH_CHECK_SECONDS,
+    check_timeout=settings.DB_REPLICA_HEALTH_CHECK_TIMEOUT
+)
+
+
+class RoutingSession(Session):
+    """
+    Сессия, направляющая чтения в реплику.
+
+    Запись (flush, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE) всегда идет
+    в основную БД. После записи в этой сессии или в текущем HTTP запросе, а
+    также для закрепленного клиента в основную БД идут и чтения. Реплика
+    выбирается один раз на сессию, чтобы ее чтения видели одно состояние.
+    """
+    def get_bind(self, mapper=None, *, clause=None, **kw):
+        primary = async_engine.sync_engine
+        if self._flushing or isinstance(clause, UpdateBase) or getattr(clause, "_for_update_arg", None) is not None:
+            self.info["wrote"] = True
+            return primary
+        routing = current_read_routing.get()
+        if self.info.get("wrote") or (routing is not None and routing.wrote):
+            return primary
+
+        if "replica" not in self.info:
+            pinned = routing is not None and routing.pinned
+            self.info["replica"] = None if pinned else replica_set.choose()
+            DB_READ_SESSIONS.inc(engine=self.info["replica"].label if self.info["replica"] else "primary")
+        replica = self.info["replica"]
+        return replica.engine.sync_engine if replica else primary
+
+
+# Фабрика сессий для зависимостей, которые только читают
+ReadSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    sync_session_class=RoutingSession,
+    expire_on_commit=False,
+    autoflush=False,
+    autocommit=False
+)
+
+
+async def _get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Асинхронный генератор сессий для зависимостей, которые только читают.
+
+    Чтения идут в реплику, запись — в основную БД. Если реплика оборвала
+    соединение, она исключается из выбора (см. ReplicaSet), и следующие
+    запросы читают из других реплик или основной БД; текущий запрос
+    завершается ошибкой.
+    """
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Асинхронный генератор сессий для FastAPI Depends
@@ -48,9 +353,14 @@ async def create_db_and_tables():
     from src.core.base_model import Base
     from src.user.model import User
     from src.cards.model import Card
+    from src.jobs.model import Job
     
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
+# Без реплик зависимость совпадает с get_db: FastAPI кэширует зависимости
+# по функции, и чтение с записью в одном запросе используют одну сессию
+get_read_db = _get_read_db if replica_set.replicas else get_db
+
 # Алиас для удобства
 GetDBDependency = Depends(get_db)
\ No newline at end of file
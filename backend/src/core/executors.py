@@ -0,0 +1,112 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+from fastapi import HTTPException
+from src.core.config import settings
+
+R = TypeVar('R')
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+class BoundedThreadPool:
+    """
+    Пул потоков с ограниченной очередью ожидания.
+
+    Если все потоки заняты и очередь заполнена, новая задача сразу
+    отклоняется с 503, а не накапливается в памяти: при всплеске нагрузки
+    клиенты получают быстрый отказ вместо растущих задержек.
+    """
+    def __init__(self, max_workers: int, max_pending: int, name: str):
+        """
+        Инициализация пула
+
+        Args:
+            max_workers: Число рабочих потоков
+            max_pending: Число задач, которые могут ждать свободного потока
+            name: Префикс имен потоков
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Число выполняемых и ожидающих задач"""
+        return self._in_flight
+
+    async def run(self, func: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        """
+        Выполняет функцию в пуле потоков.
+
+        Raises:
+            HTTPException: 503, если пул перегружен
+        """
+        if self._in_flight >= self.max_workers + self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, try again later",
+                headers={"Retry-After": "1"}
+            )
+
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+        finally:
+            self._in_flight -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+# argon2-cffi отпускает GIL на время хэширования, поэтому потоков достаточно
+password_hash_pool = BoundedThreadPool(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    name="password-hash"
+)
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Возвращает общий пул процессов для CPU-нагруженной обработки.
+
+    Пул создается лениво при первом обращении. Процессы запускаются через
+    spawn: fork процесса с работающим event loop и пулом потоков небезопасен.
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.PHOTO_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+async def run_in_process(func: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+    """
+    Выполняет функцию в пуле процессов, не блокируя event loop и GIL.
+
+    Args:
+        func: Функция уровня модуля (должна сериализоваться pickle)
+        *args: Позиционные аргументы функции
+        **kwargs: Именованные аргументы функции
+
+    Returns:
+        Результат функции
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), partial(func, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    """Останавливает пулы исполнителей при завершении приложения"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True, cancel_futures=True)
+        _process_pool = None
+    password_hash_pool.shutdown()
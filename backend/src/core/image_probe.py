@@ -0,0 +1,145 @@
+from datetime import datetime
+from typing import NamedTuple, Optional
+import io
+import warnings
+from fastapi import HTTPException
+from PIL import Image, UnidentifiedImageError
+
+# Сигнатуры (magic bytes) поддерживаемых форматов и соответствующие MIME-типы
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+)
+
+# Формат Pillow, ожидаемый для каждого MIME-типа
+_PIL_FORMATS = {"image/jpeg": "JPEG", "image/png": "PNG"}
+
+# Теги EXIF: ориентация, дата изменения, вложенный Exif IFD и дата съемки в нем
+_EXIF_ORIENTATION = 0x0112
+_EXIF_DATETIME = 0x0132
+_EXIF_IFD = 0x8769
+_EXIF_DATETIME_ORIGINAL = 0x9003
+# Значения ориентации, при которых изображение повернуто на 90 градусов
+_EXIF_ROTATED = (5, 6, 7, 8)
+
+
+class ImageInfo(NamedTuple):
+    """Параметры изображения, прочитанные из заголовка файла"""
+    content_type: str
+    format: str
+    width: int
+    height: int
+    captured_at: Optional[datetime] = None
+
+    @property
+    def orientation(self) -> str:
+        return image_orientation(self.width, self.height)
+
+
+def image_orientation(width: int, height: int) -> str:
+    """Ориентация изображения: landscape, portrait или square"""
+    if width > height:
+        return "landscape"
+    if width < height:
+        return "portrait"
+    return "square"
+
+
+def read_image_metadata(image: Image.Image) -> tuple[int, int, Optional[datetime]]:
+    """
+    Читает из открытого (не декодированного) изображения размеры и время съемки.
+
+    Размеры возвращаются с учетом поворота по EXIF, то есть такими, какими
+    изображение показывается. Время съемки берется из DateTimeOriginal,
+    а при его отсутствии — из DateTime.
+
+    Returns:
+        (ширина, высота, время съемки или None)
+    """
+    width, height = image.size
+    try:
+        exif = image.getexif()
+        if exif.get(_EXIF_ORIENTATION) in _EXIF_ROTATED:
+            width, height = height, width
+        raw = exif.get_ifd(_EXIF_IFD).get(_EXIF_DATETIME_ORIGINAL) or exif.get(_EXIF_DATETIME)
+        captured_at = datetime.strptime(str(raw).strip("\x00 "), "%Y:%m:%d %H:%M:%S") if raw else None
+    except Exception:
+        # Поврежденный или нестандартный EXIF не должен мешать загрузке фото
+        captured_at = None
+    return width, height, captured_at
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """
+    Определяет MIME-тип изображения по первым байтам файла.
+
+    Returns:
+        MIME-тип или None, если сигнатура не поддерживается
+    """
+    for signature, content_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return content_type
+    return None
+
+
+def probe_image(header: bytes, complete: bool, max_pixels: int, max_dimension: int) -> Optional[ImageInfo]:
+    """
+    Проверяет изображение по заголовку, не декодируя пиксели.
+
+    Pillow при открытии читает только заголовок (Image.open ленивый), поэтому
+    размеры и формат известны после первых килобайт файла. Если заголовок
+    еще не прочитан целиком (например, перед кадром JPEG большой блок EXIF),
+    возвращается None, и вызывающий код должен передать больше данных.
+
+    Args:
+        header: Начало файла
+        complete: True, если header — весь файл или больше данных ждать нельзя
+        max_pixels: Максимальное число пикселей (защита от decompression bomb)
+        max_dimension: Максимальная ширина и высота
+
+    Returns:
+        ImageInfo или None, если для решения нужно больше данных
+
+    Raises:
+        HTTPException: 415 если это не поддерживаемое изображение,
+            413 если размеры изображения превышают лимиты
+    """
+    content_type = sniff_image_type(header)
+    if content_type is None:
+        # Сигнатуры короче 8 байт: если прочитано меньше, решение откладываем
+        if not complete and len(header) < 8:
+            return None
+        raise HTTPException(
+            status_code=415,
+            detail="Unsupported media type. Allowed: image/jpeg, image/png"
+        )
+
+    try:
+        with warnings.catch_warnings():
+            # Лимит проверяется ниже по своим настройкам, предупреждение Pillow не нужно
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(header), formats=[_PIL_FORMATS[content_type]]) as image:
+                width, height, captured_at = read_image_metadata(image)
+                image_format = image.format
+    except Image.DecompressionBombError:
+        raise HTTPException(status_code=413, detail="Image dimensions too large")
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+        if not complete:
+            return None
+        raise HTTPException(status_code=415, detail="Corrupt or truncated image")
+
+    if width <= 0 or height <= 0:
+        raise HTTPException(status_code=415, detail="Corrupt or truncated image")
+    if width > max_dimension or height > max_dimension or width * height > max_pixels:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image dimensions too large: {width}x{height}. "
+                   f"Maximum: {max_dimension}px per side, {max_pixels} pixels"
+        )
+    return ImageInfo(
+        content_type=content_type,
+        format=image_format or _PIL_FORMATS[content_type],
+        width=width,
+        height=height,
+        captured_at=captured_at
+    )
@@ -1,28 +1,68 @@
 import uvicorn
 from fastapi import FastAPI
-from src.core.db_session import create_db_and_tables
+from src.core.db_session import create_db_and_tables, AsyncSessionLocal, async_engine, replica_set
+from src.core.executors import shutdown_executors
+from src.core.storage import photo_storage
 from src.auth.router import router as auth_router
 from src.user.handlers import router as user_router
 from src.cards.handlers import router as cards_router
+from src.cards.service import CardService
+from src.jobs.handlers import router as jobs_router
+from src.jobs.queue import job_queue
 from src.core.config import settings
+from src.core.middleware import PrimaryPinMiddleware, RequestBodyLimitMiddleware, RequestTimingMiddleware
+from src.core.metrics import multiprocess_metrics, router as metrics_router
+from src.core.responses import ModelResponse
 
 app = FastAPI(
     title="CV Project API",
     description="API для работы с карточками пользователей",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=ModelResponse
 )
 
+# Ограничение размера тела запроса проверяется до буферизации загрузок
+app.add_middleware(
+    RequestBodyLimitMiddleware,
+    path_limits={"/api/cards/batch": settings.BATCH_MAX_REQUEST_BODY_SIZE}
+)
+# Закрепление чтений за основной БД нужно только при наличии реплик
+if settings.DATABASE_REPLICA_URLS:
+    app.add_middleware(PrimaryPinMiddleware)
+# Добавлен последним, поэтому внешний: замеряет и отклоненные по размеру запросы
+app.add_middleware(RequestTimingMiddleware)
+
 # Подключаем роутеры с префиксом /api
 app.include_router(auth_router, prefix="/api")
 app.include_router(user_router, prefix="/api")
 app.include_router(cards_router, prefix="/api")
+app.include_router(jobs_router, prefix="/api")
+app.include_router(metrics_router)
 
 @app.on_event("startup")
 async def on_startup():
     """Инициализация при старте приложения"""
     await create_db_and_tables()
+    async with AsyncSessionLocal() as session:
+        await CardService(session).refresh_similarity_index()
+    job_queue.start()
+    replica_set.start()
+    multiprocess_metrics.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Освобождение ресурсов при остановке приложения"""
+    await job_queue.stop()
+    await replica_set.stop()
+    await multiprocess_metrics.stop()
+    # Соединения aiosqlite держат потоки, без dispose процесс не завершается
+    await async_engine.dispose()
+    await photo_storage.close()
+    shutdown_executors()
 
 if __name__ == "__main__":
+    # Снимки метрик прошлого запуска удаляются до старта воркеров
+    multiprocess_metrics.clear()
     uvicorn.run(
         "src.core.main:app",
         host=settings.APP_HOST,
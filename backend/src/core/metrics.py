@@ -0,0 +1,378 @@
+from contextvars import ContextVar
+import asyncio
+import glob
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Iterable, Optional
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек в секундах
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = tuple[str, ...]
+
+
+def _format_labels(labelnames: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    """Форматирует набор меток в синтаксисе Prometheus"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """Базовый класс метрики с именованными метками"""
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: dict) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def collect(self) -> dict[LabelValues, Any]:
+        """Текущие значения по наборам меток; значения должны сериализоваться в JSON"""
+        raise NotImplementedError
+
+    def combine(self, value: Any, other: Any) -> Any:
+        """Объединяет значения одного набора меток из разных воркеров"""
+        raise NotImplementedError
+
+    def samples(self, values: dict[LabelValues, Any], labelnames: tuple[str, ...]) -> list[str]:
+        raise NotImplementedError
+
+    def render(
+        self,
+        values: Optional[dict[LabelValues, Any]] = None,
+        labelnames: Optional[tuple[str, ...]] = None
+    ) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.samples(
+            self.collect() if values is None else values,
+            self.labelnames if labelnames is None else labelnames
+        ))
+        return "\n".join(lines)
+
+
+class _ValueMetric(Metric):
+    """
+    Метрика с одним значением на набор меток.
+
+    Помимо явно накопленных значений, значения можно вычислять в момент
+    сбора через функцию, переданную в set_function(): она возвращает
+    словарь {кортеж значений меток: значение}.
+    """
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+        self._functions: list[Callable[[], dict[LabelValues, float]]] = []
+
+    def set_function(self, func: Callable[[], dict[LabelValues, float]]) -> None:
+        self._functions.append(func)
+
+    def collect(self) -> dict[LabelValues, float]:
+        with self._lock:
+            values = dict(self._values)
+        for func in self._functions:
+            values.update(func())
+        return values
+
+    def combine(self, value: float, other: float) -> float:
+        return value + other
+
+    def samples(self, values: dict[LabelValues, float], labelnames: tuple[str, ...]) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(labelnames, key)} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class Counter(_ValueMetric):
+    """Монотонно растущий счетчик"""
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_ValueMetric):
+    """Текущее значение величины"""
+    type_name = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._label_values(labels)] = value
+
+
+class Histogram(Metric):
+    """Распределение наблюдаемых величин по корзинам"""
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: dict[LabelValues, list[int]] = {}
+        self._sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * len(self.buckets)
+                self._sums[key] = 0.0
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._sums[key] += value
+
+    def collect(self) -> dict[LabelValues, tuple[list[int], float]]:
+        with self._lock:
+            return {key: (list(counts), self._sums[key]) for key, counts in self._counts.items()}
+
+    def combine(self, value: tuple[list[int], float], other: tuple[list[int], float]) -> tuple[list[int], float]:
+        return [a + b for a, b in zip(value[0], other[0])], value[1] + other[1]
+
+    def samples(self, values: dict[LabelValues, tuple[list[int], float]], labelnames: tuple[str, ...]) -> list[str]:
+        lines = []
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class RequestStats:
+    """
+    Счетчики текущего HTTP запроса: число SQL запросов и их суммарное время.
+
+    Хранится в contextvar current_request_stats; задачи, запущенные
+    обработчиком (asyncio.gather), и greenlet SQLAlchemy наследуют контекст
+    и пополняют тот же объект.
+    """
+    __slots__ = ("db_queries", "db_seconds")
+
+    def __init__(self) -> None:
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса с выводом в текстовом формате Prometheus"""
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Optional[Iterable[float]] = None
+    ) -> Histogram:
+        histogram = Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS)
+        return self.register(histogram)  # type: ignore[return-value]
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+    def snapshot(self) -> dict[str, list]:
+        """Значения всех метрик процесса в виде, пригодном для JSON: {имя: [[метки, значение], ...]}"""
+        return {
+            name: [[list(key), value] for key, value in metric.collect().items()]
+            for name, metric in self._metrics.items()
+        }
+
+    def render_merged(self, snapshots: Iterable[tuple[str, dict[str, list], bool]]) -> str:
+        """
+        Выводит метрики, объединенные из снимков нескольких процессов
+
+        Счетчики и гистограммы суммируются, а значения Gauge (занятость пула,
+        состояние реплик) не складываются: у каждого работающего процесса
+        свой ряд с меткой pid.
+
+        Args:
+            snapshots: Тройки (pid, снимок registry.snapshot(), процесс работает)
+
+        Returns:
+            Метрики в текстовом формате Prometheus
+        """
+        snapshots = list(snapshots)
+        blocks = []
+        for name, metric in self._metrics.items():
+            per_process = isinstance(metric, Gauge)
+            values: dict[LabelValues, Any] = {}
+            for pid, snapshot, live in snapshots:
+                if per_process and not live:
+                    continue
+                for labels, value in snapshot.get(name, []):
+                    key = tuple(labels) + ((pid,) if per_process else ())
+                    values[key] = metric.combine(values[key], value) if key in values else value
+            labelnames = metric.labelnames + (("pid",) if per_process else ())
+            blocks.append(metric.render(values, labelnames))
+        return "\n".join(blocks) + "\n"
+
+
+class MultiprocessMetrics:
+    """
+    Объединение метрик нескольких воркеров через общую директорию.
+
+    Каждый воркер раз в flush_seconds и при каждом запросе /metrics
+    атомарно записывает снимок своего реестра в файл <pid>-<id>.json,
+    а /metrics читает снимки всех воркеров и объединяет их, поэтому
+    значения других воркеров отстают не больше чем на flush_seconds.
+    Файлы завершившихся воркеров остаются, чтобы счетчики не уменьшались;
+    их Gauge перестают выводиться, когда снимок старше трех интервалов.
+    Директорию очищает основной процесс перед запуском воркеров (clear).
+    """
+    def __init__(self, registry: MetricsRegistry, directory: Optional[str], flush_seconds: float):
+        """
+        Args:
+            registry: Реестр метрик процесса
+            directory: Общая директория снимков; None — объединение выключено
+            flush_seconds: Интервал записи снимка
+        """
+        self.registry = registry
+        self.directory = os.path.expanduser(directory) if directory else None
+        self.flush_seconds = flush_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._file_name: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def clear(self) -> None:
+        """Удаляет снимки предыдущего запуска; вызывается до запуска воркеров"""
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for pattern in ("*.json", "*.tmp"):
+            for path in glob.glob(os.path.join(self.directory, pattern)):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+    def write(self) -> None:
+        """Атомарно записывает снимок реестра текущего процесса"""
+        if self.directory is None:
+            return
+        if self._file_name is None:
+            # pid может достаться новому воркеру, поэтому имя файла уникально для процесса
+            self._file_name = f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as tmp_file:
+                json.dump(self.registry.snapshot(), tmp_file)
+            os.replace(tmp_path, os.path.join(self.directory, self._file_name))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def render(self) -> str:
+        """Записывает свежий снимок и выводит метрики, объединенные по всем воркерам"""
+        if self.directory is None:
+            return self.registry.render()
+        self.write()
+        live_since = time.time() - 3 * self.flush_seconds
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                modified = os.stat(path).st_mtime
+                with open(path) as snapshot_file:
+                    snapshot = json.load(snapshot_file)
+            except (FileNotFoundError, ValueError):
+                continue
+            pid = os.path.basename(path).split("-", 1)[0]
+            snapshots.append((pid, snapshot, modified >= live_since))
+        return self.registry.render_merged(snapshots)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await run_in_threadpool(self.write)
+            except OSError:
+                logger.exception("Failed to write metrics snapshot")
+
+    def start(self) -> None:
+        if self.directory is not None and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="metrics-flush")
+
+    async def stop(self) -> None:
+        """Останавливает периодическую запись и сохраняет итоговый снимок"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            await run_in_threadpool(self.write)
+
+
+registry = MetricsRegistry()
+multiprocess_metrics = MultiprocessMetrics(registry, settings.METRICS_MULTIPROC_DIR, settings.METRICS_FLUSH_SECONDS)
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Метрики в текстовом формате Prometheus: всех воркеров при METRICS_MULTIPROC_DIR, иначе процесса"""
+    if multiprocess_metrics.enabled:
+        content = await run_in_threadpool(multiprocess_metrics.render)
+    else:
+        content = registry.render()
+    return PlainTextResponse(content, media_type="text/plain; version=0.0.4; charset=utf-8")
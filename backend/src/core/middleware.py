@@ -0,0 +1,237 @@
+from typing import Optional
+import time
+from starlette.datastructures import MutableHeaders
+from starlette.exceptions import HTTPException
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from src.core.config import settings
+from src.core.db_session import ReadRouting, current_read_routing
+from src.core.metrics import RequestStats, current_request_stats, registry
+
+# Корзины длительности запросов: выгрузка ZIP и пакетная загрузка идут десятки секунд
+_REQUEST_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+_DB_QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_seconds", "HTTP request duration by route template", ("method", "route", "status"),
+    buckets=_REQUEST_SECONDS_BUCKETS
+)
+HTTP_REQUEST_DB_QUERIES = registry.histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request", ("method", "route"),
+    buckets=_DB_QUERIES_BUCKETS
+)
+HTTP_REQUEST_DB_SECONDS = registry.histogram(
+    "http_request_db_seconds", "Total SQL execution time per HTTP request", ("method", "route")
+)
+HTTP_REQUEST_BYTES = registry.counter(
+    "http_request_bytes_total", "HTTP request body bytes received", ("method", "route")
+)
+HTTP_RESPONSE_BYTES = registry.counter(
+    "http_response_bytes_total", "HTTP response body bytes sent", ("method", "route")
+)
+
+
+class _RequestBodyTooLarge(HTTPException):
+    """
+    Тело запроса превысило допустимый размер.
+
+    Наследуется от HTTPException: FastAPI пробрасывает такие исключения из
+    разбора тела как есть (а не превращает в 400), и клиент получает 413.
+    """
+    def __init__(self) -> None:
+        super().__init__(status_code=413, detail="Request body too large")
+
+
+class RequestBodyLimitMiddleware:
+    """
+    Ограничивает размер тела запроса во время его получения.
+
+    Starlette полностью буферизует multipart тело до вызова обработчика,
+    поэтому проверка в обработчике срабатывает слишком поздно. Middleware
+    отклоняет запрос сразу по заголовку Content-Length, а для тел без него
+    считает байты по мере чтения и прерывает прием при превышении лимита.
+    Для отдельных путей (например, пакетной загрузки) лимит можно увеличить.
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_body_size: int = settings.MAX_REQUEST_BODY_SIZE,
+        path_limits: Optional[dict[str, int]] = None
+    ):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_body_size = self.path_limits.get(scope["path"].rstrip("/"), self.max_body_size)
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > max_body_size:
+                await self._reject(send)
+                return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_size:
+                    raise _RequestBodyTooLarge()
+            return message
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _RequestBodyTooLarge:
+            if response_started:
+                raise
+            await self._reject(send)
+
+    async def _reject(self, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json")],
+        })
+        await send({
+            "type": "http.response.body",
+            "body": b'{"detail":"Request body too large"}',
+        })
+
+
+class RequestTimingMiddleware:
+    """
+    Замеряет каждый HTTP запрос: длительность, число и время SQL запросов,
+    байты тела запроса и ответа.
+
+    Метрики пишутся в реестр (GET /metrics) с меткой route — шаблоном пути
+    маршрута (/api/cards/{card_id}), а не самим путем, чтобы число рядов
+    не зависело от идентификаторов. Клиенту те же данные возвращаются в
+    заголовке Server-Timing; для потоковых ответов он отражает время до
+    начала ответа, а полная длительность попадает в гистограмму.
+    """
+    def __init__(self, app: ASGIApp, server_timing: bool = settings.SERVER_TIMING_ENABLED):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        start = time.perf_counter()
+        status = 500
+        bytes_in = bytes_out = 0
+
+        async def counting_receive() -> Message:
+            nonlocal bytes_in
+            message = await receive()
+            if message["type"] == "http.request":
+                bytes_in += len(message.get("body", b""))
+            return message
+
+        async def timing_send(message: Message) -> None:
+            nonlocal status, bytes_out
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    db_ms = stats.db_seconds * 1000
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing",
+                        f'app;dur={elapsed_ms:.1f}, db;dur={db_ms:.1f};desc="{stats.db_queries} queries"'
+                    )
+            elif message["type"] == "http.response.body":
+                bytes_out += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, timing_send)
+        finally:
+            current_request_stats.reset(token)
+            method = scope["method"]
+            # Маршрут записывается в scope роутером FastAPI при сопоставлении
+            route = getattr(scope.get("route"), "path_format", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=method, route=route, status=str(status))
+            HTTP_REQUEST_DB_QUERIES.observe(stats.db_queries, method=method, route=route)
+            HTTP_REQUEST_DB_SECONDS.observe(stats.db_seconds, method=method, route=route)
+            HTTP_REQUEST_BYTES.inc(bytes_in, method=method, route=route)
+            HTTP_RESPONSE_BYTES.inc(bytes_out, method=method, route=route)
+
+
+class PrimaryPinMiddleware:
+    """
+    Закрепляет чтения клиента за основной БД на время после его записи.
+
+    Реплики отстают от основной БД, и сразу после записи клиент мог бы не
+    увидеть собственных изменений. Если запрос что-то записал в БД, в ответ
+    добавляются cookie и заголовок со временем окончания закрепления; пока
+    оно не истекло, сессии get_read_db этого клиента читают из основной БД.
+    Клиенты, которые не хранят cookie (API клиенты с Bearer токеном),
+    передают полученное значение обратно в том же заголовке запроса. В
+    отличие от состояния в памяти, cookie и заголовок действуют во всех
+    воркерах.
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        pin_seconds: int = settings.DB_PRIMARY_PIN_SECONDS,
+        cookie_name: str = "db_primary_until",
+        header_name: str = "X-DB-Primary-Until"
+    ):
+        self.app = app
+        self.pin_seconds = pin_seconds
+        self.cookie_name = cookie_name
+        self.header_name = header_name
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        routing = ReadRouting(pinned=self._is_pinned(scope))
+        token = current_read_routing.set(routing)
+
+        async def pinning_send(message: Message) -> None:
+            if message["type"] == "http.response.start" and routing.wrote:
+                pinned_until = int(time.time()) + self.pin_seconds
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Set-Cookie",
+                    f"{self.cookie_name}={pinned_until}; Max-Age={self.pin_seconds}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                headers[self.header_name] = str(pinned_until)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, pinning_send)
+        finally:
+            current_read_routing.reset(token)
+
+    def _is_pinned(self, scope: Scope) -> bool:
+        now = time.time()
+        header_name = self.header_name.lower().encode("latin-1")
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                pinned_until = cookie_parser(value.decode("latin-1")).get(self.cookie_name, "")
+            elif name == header_name:
+                pinned_until = value.decode("latin-1").strip()
+            else:
+                continue
+            # Слишком далекое время игнорируется: клиент не может закрепиться навсегда
+            if pinned_until.isdigit() and now < int(pinned_until) <= now + self.pin_seconds:
+                return True
+        return False
@@ -0,0 +1,239 @@
+import mimetypes
+import os
+from typing import Any, Optional
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
+from starlette.types import Receive, Scope, Send
+from src.core.config import settings
+from src.core.storage import PhotoStorage
+
+
+# Сериализатор pydantic-core для произвольных значений: модели, списки моделей, dict, datetime
+_JSON_ADAPTER = TypeAdapter(Any)
+
+
+class ModelResponse(JSONResponse):
+    """
+    JSON ответ, сериализуемый pydantic-core напрямую в байты.
+
+    Если обработчик возвращает ModelResponse(модель), FastAPI не
+    валидирует модель повторно по response_model и не проходит ее через
+    jsonable_encoder: response_model остается только для документации
+    OpenAPI. Как класс ответа по умолчанию ускоряет и ответы из dict.
+    """
+    def render(self, content: Any) -> bytes:
+        return _JSON_ADAPTER.dump_json(content)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Проверяет, совпадает ли ETag со списком из If-None-Match / If-Range"""
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _is_digits(text: str) -> bool:
+    return text.isascii() and text.isdigit()
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """
+    Разбирает заголовок Range с одним диапазоном байтов.
+
+    Args:
+        header: Значение заголовка Range
+        size: Размер файла в байтах
+
+    Returns:
+        Кортеж (start, end) включительно, или None если заголовок нужно игнорировать
+        (несколько диапазонов, неизвестные единицы или синтаксически неверный
+        диапазон, например bytes=5-3 — тогда отдается весь файл)
+
+    Raises:
+        HTTPException: 416 (RFC 9110), если синтаксически верный диапазон не
+            пересекается с файлом: начинается за его концом или пуст (bytes=-0)
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    start_text, _, end_text = ranges.strip().partition("-")
+    if not (start_text or end_text) or not all(_is_digits(text) for text in (start_text, end_text) if text):
+        return None
+
+    if start_text:
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+        if end_text and end < start:
+            return None
+        satisfiable = start < size
+    else:
+        # Суффиксный диапазон: последние N байт
+        suffix = int(end_text)
+        start = max(size - suffix, 0)
+        end = size - 1
+        satisfiable = suffix > 0 and size > 0
+
+    if not satisfiable:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+
+class _FileRangeResponse(FileResponse):
+    """
+    FileResponse с диапазоном, уже разобранным в file_response.
+
+    Собственный разбор Range в FileResponse расходится с RFC 9110: на
+    синтаксически неверный заголовок он отвечает 400 вместо полного файла,
+    на суффикс длиннее файла — 416, а в Content-Range ответа 416 пропускает
+    единицы. Поэтому заголовки Range и If-Range запроса заменяются
+    результатом разбора: без диапазона FileResponse отдает весь файл (через
+    pathsend, если сервер его поддерживает), с диапазоном — один заведомо
+    корректный диапазон.
+    """
+    def __init__(self, *args: Any, byte_range: Optional[tuple[int, int]] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.byte_range = byte_range
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        headers = [(name, value) for name, value in scope["headers"] if name not in (b"range", b"if-range")]
+        if self.byte_range is not None:
+            start, end = self.byte_range
+            headers.append((b"range", f"bytes={start}-{end}".encode("latin-1")))
+        await super().__call__({**scope, "headers": headers}, receive, send)
+
+
+def _conditional_response(
+    request: Request,
+    quoted_etag: str,
+    size: int,
+    cache_control: str
+) -> tuple[dict, Optional[Response], Optional[tuple[int, int]]]:
+    """
+    Общая часть обработки условных запросов и диапазонов.
+
+    Returns:
+        Заголовки ответа, готовый ответ 304 (или None) и запрошенный диапазон (или None)
+    """
+    headers = {
+        "ETag": quoted_etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, quoted_etag):
+        return headers, Response(status_code=304, headers=headers), None
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    byte_range = None
+    if range_header and (not if_range or if_range.strip() == quoted_etag):
+        byte_range = _parse_range(range_header, size)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+    return headers, None, byte_range
+
+
+async def file_response(
+    request: Request,
+    path: str,
+    etag: Optional[str] = None,
+    cache_control: str = settings.PHOTO_CACHE_CONTROL
+) -> Response:
+    """
+    Отдает файл с поддержкой условных запросов и диапазонов байтов.
+
+    Поддерживаются If-None-Match (304), Range с одним диапазоном (206/416)
+    и If-Range. Файл и диапазон отдает FileResponse: полный файл — через
+    расширение ASGI pathsend, если сервер его поддерживает.
+
+    Args:
+        request: Входящий запрос
+        path: Путь к файлу на диске
+        etag: Значение сильного ETag без кавычек; по умолчанию строится из размера и mtime
+        cache_control: Значение заголовка Cache-Control
+
+    Returns:
+        Ответ 200, 206 или 304
+
+    Raises:
+        HTTPException: 404, если файла нет; 416, если диапазон не пересекается с файлом
+    """
+    try:
+        stat = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Photo file not found")
+
+    quoted_etag = f'"{etag or f"{stat.st_size:x}-{stat.st_mtime_ns:x}"}"'
+    headers, not_modified, byte_range = _conditional_response(request, quoted_etag, stat.st_size, cache_control)
+    if not_modified:
+        return not_modified
+
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return _FileRangeResponse(path, media_type=media_type, headers=headers, stat_result=stat, byte_range=byte_range)
+
+
+async def storage_response(
+    request: Request,
+    storage: PhotoStorage,
+    key: str,
+    etag: Optional[str] = None,
+    cache_control: str = settings.PHOTO_CACHE_CONTROL
+) -> Response:
+    """
+    Отдает файл из хранилища фотографий с поддержкой условных запросов и диапазонов байтов.
+
+    Если хранилище локальное, файл отдается через file_response (sendfile),
+    иначе содержимое потоково проксируется из хранилища, а Range передается
+    хранилищу, чтобы не читать лишние байты.
+
+    Args:
+        request: Входящий запрос
+        storage: Хранилище фотографий
+        key: Ключ файла в хранилище
+        etag: Значение сильного ETag без кавычек; по умолчанию строится из размера и времени изменения
+        cache_control: Значение заголовка Cache-Control
+
+    Returns:
+        Ответ 200, 206 или 304
+
+    Raises:
+        HTTPException: 404, если файла нет; 416, если диапазон не пересекается с файлом
+    """
+    path = storage.local_path(key)
+    if path is not None:
+        return await file_response(request, path, etag=etag, cache_control=cache_control)
+
+    stored = await storage.stat(key)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Photo file not found")
+
+    quoted_etag = f'"{etag or f"{stored.size:x}-{int(stored.modified.timestamp()):x}"}"'
+    headers, not_modified, byte_range = _conditional_response(request, quoted_etag, stored.size, cache_control)
+    if not_modified:
+        return not_modified
+
+    media_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+    if byte_range is not None:
+        start, end = byte_range
+        return StreamingResponse(
+            storage.get_stream(key, start, end, settings.ZIP_CHUNK_SIZE),
+            status_code=206,
+            media_type=media_type,
+            headers=headers
+        )
+
+    headers["Content-Length"] = str(stored.size)
+    return StreamingResponse(
+        storage.get_stream(key, chunk_size=settings.ZIP_CHUNK_SIZE),
+        media_type=media_type,
+        headers=headers
+    )
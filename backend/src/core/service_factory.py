@@ -1,7 +1,7 @@
 from typing import Type, TypeVar, Callable, Awaitable, Protocol
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.core.db_session import get_db
+from src.core.db_session import get_db, get_read_db
 from src.user.service import UserService
 from src.auth.service import AuthService
 
@@ -27,3 +27,10 @@ class ServiceFactory:
         async def _get_service(db: AsyncSession = Depends(get_db)) -> T:
             return cls.create(service_class, db)
         return _get_service
+
+    @classmethod
+    def get_read_dependency(cls, service_class: Type[T]) -> Callable[..., Awaitable[T]]:
+        """Создает dependency для FastAPI с сессией, читающей из реплики"""
+        async def _get_read_service(db: AsyncSession = Depends(get_read_db)) -> T:
+            return cls.create(service_class, db)
+        return _get_read_service
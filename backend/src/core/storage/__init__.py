@@ -0,0 +1,28 @@
+from src.core.config import settings
+from .base import PhotoStorage, StoredObject
+from .local import LocalPhotoStorage
+
+
+def create_photo_storage() -> PhotoStorage:
+    """Создает хранилище фотографий, выбранное настройкой PHOTO_STORAGE_BACKEND"""
+    if settings.PHOTO_STORAGE_BACKEND == "s3":
+        # Импорт только при выборе S3: aiobotocore — необязательная зависимость
+        from .s3 import S3PhotoStorage
+        return S3PhotoStorage(
+            bucket=settings.S3_BUCKET,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            prefix=settings.S3_PREFIX,
+            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+            multipart_chunk_size=settings.S3_MULTIPART_CHUNK_SIZE,
+            multipart_concurrency=settings.S3_MULTIPART_CONCURRENCY
+        )
+    return LocalPhotoStorage(settings.PHOTO_FOLDER_FULL_NAME)
+
+
+photo_storage = create_photo_storage()
+
+__all__ = ["PhotoStorage", "StoredObject", "LocalPhotoStorage", "create_photo_storage", "photo_storage"]
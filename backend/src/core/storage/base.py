@@ -0,0 +1,137 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncGenerator, AsyncIterator, NamedTuple, Optional
+
+
+class StoredObject(NamedTuple):
+    """Сведения о файле в хранилище"""
+    size: int
+    modified: datetime
+
+
+class PhotoStorage(ABC):
+    """
+    Хранилище файлов фотографий по ключам вида ab/cd/<хэш>.<расширение>.
+
+    Все методы асинхронные, поэтому сервисы не зависят от того, лежат ли
+    файлы на локальном диске или в объектном хранилище, и воркеры API
+    могут работать на разных узлах. Отсутствующий файл при чтении
+    сообщается исключением FileNotFoundError.
+    """
+
+    @property
+    @abstractmethod
+    def temp_dir(self) -> str:
+        """
+        Локальная директория для временных файлов загрузки.
+
+        Для локального хранилища она на той же файловой системе, что и
+        фото, поэтому put_file публикует файл переименованием без копирования.
+        """
+
+    @abstractmethod
+    async def put(self, key: str, data: bytes) -> None:
+        """
+        Сохраняет данные под ключом, заменяя существующий файл.
+
+        Args:
+            key: Ключ файла в хранилище
+            data: Содержимое файла
+        """
+
+    @abstractmethod
+    async def put_file(self, key: str, path: str) -> None:
+        """
+        Сохраняет локальный файл под ключом, заменяя существующий файл.
+
+        Локальное хранилище перемещает файл, а не копирует его: вызывающий
+        код должен удалить исходный файл, только если он еще существует.
+
+        Args:
+            key: Ключ файла в хранилище
+            path: Путь к локальному файлу в temp_dir
+        """
+
+    @abstractmethod
+    def get_stream(
+        self,
+        key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = 64 * 1024
+    ) -> AsyncGenerator[bytes, None]:
+        """
+        Читает файл (или диапазон байтов) блоками.
+
+        Генератор можно закрыть (aclose) до конца файла: открытый файл или
+        ответ S3 освобождается сразу, а не при сборке мусора.
+
+        Args:
+            key: Ключ файла в хранилище
+            start: Первый байт диапазона
+            end: Последний байт диапазона включительно; None — до конца файла
+            chunk_size: Размер блока в байтах
+
+        Yields:
+            Очередной блок данных
+
+        Raises:
+            FileNotFoundError: если файла нет
+        """
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        """
+        Возвращает размер и время изменения файла.
+
+        Returns:
+            StoredObject или None, если файла нет
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Удаляет файл; отсутствие файла ошибкой не считается"""
+
+    @abstractmethod
+    def iter_keys(self, prefix: str = "") -> AsyncIterator[str]:
+        """
+        Перебирает ключи, начинающиеся с prefix, в лексикографическом порядке.
+
+        Yields:
+            Ключ файла в хранилище
+        """
+
+    async def move(self, key: str, new_key: str) -> None:
+        """
+        Переносит файл под новый ключ.
+
+        Raises:
+            FileNotFoundError: если файла нет
+        """
+        await self.put(new_key, await self.read(key))
+        await self.delete(key)
+
+    async def exists(self, key: str) -> bool:
+        """Проверяет, есть ли файл с указанным ключом"""
+        return await self.stat(key) is not None
+
+    async def read(self, key: str) -> bytes:
+        """
+        Читает файл целиком.
+
+        Raises:
+            FileNotFoundError: если файла нет
+        """
+        return b"".join([chunk async for chunk in self.get_stream(key, chunk_size=1024 * 1024)])
+
+    def local_path(self, key: str) -> Optional[str]:
+        """
+        Путь к файлу на локальном диске, если хранилище его предоставляет.
+
+        Позволяет отдавать файлы через sendfile (FileResponse), минуя чтение
+        в приложение. Для удаленных хранилищ возвращает None.
+        """
+        return None
+
+    async def close(self) -> None:
+        """Освобождает соединения хранилища при остановке приложения"""
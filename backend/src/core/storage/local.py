@@ -0,0 +1,147 @@
+from datetime import datetime
+from typing import AsyncGenerator, AsyncIterator, Iterator, Optional
+import os
+import tempfile
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from .base import PhotoStorage, StoredObject
+
+
+def _read_range(path: str, start: int, end: Optional[int], chunk_size: int) -> Iterator[bytes]:
+    """Читает диапазон файла блоками; выполняется в пуле потоков"""
+    with open(path, "rb") as file_obj:
+        file_obj.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            chunk = file_obj.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def _write_file(path: str, data: bytes) -> None:
+    """
+    Записывает файл через временный файл с атомарным переименованием.
+
+    Имя временного файла случайное: одновременные загрузки одного ключа
+    (в том числе из потоков одного процесса) пишут каждая в свой файл.
+    """
+    directory, name = os.path.split(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{name}.", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as file_obj:
+            # mkstemp создает файл с правами 0600, а фото читают и другие процессы (веб-сервер)
+            os.fchmod(file_obj.fileno(), 0o644)
+            file_obj.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _move_file(source: str, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(source, path)
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _stat(path: str) -> Optional[StoredObject]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return StoredObject(size=stat.st_size, modified=datetime.fromtimestamp(stat.st_mtime))
+
+
+def _walk_keys(directory: str, key_prefix: str, name_prefix: str) -> Iterator[str]:
+    """
+    Обходит директорию в порядке ключей.
+
+    Директории сортируются по имени с "/" на конце, как они входят в ключ,
+    поэтому порядок обхода совпадает с лексикографическим порядком ключей.
+    """
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.name.startswith(name_prefix)]
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    entries.sort(key=lambda entry: entry.name + "/" if entry.is_dir() else entry.name)
+    for entry in entries:
+        if entry.is_dir():
+            yield from _walk_keys(entry.path, f"{key_prefix}{entry.name}/", "")
+        elif not entry.name.endswith(".part"):
+            yield f"{key_prefix}{entry.name}"
+
+
+class LocalPhotoStorage(PhotoStorage):
+    """
+    Хранилище фотографий в директории на локальном (или общем сетевом) диске.
+
+    Дисковые операции выполняются в пуле потоков и не блокируют event loop.
+    """
+    def __init__(self, root: str):
+        """
+        Инициализация хранилища
+
+        Args:
+            root: Корневая директория хранилища
+        """
+        self.root = os.path.expanduser(root)
+
+    @property
+    def temp_dir(self) -> str:
+        return self.root
+
+    def local_path(self, key: str) -> str:
+        """
+        Путь к файлу на диске по ключу.
+
+        Абсолютные пути, сохраненные до перехода на ключи, возвращаются как есть,
+        пока их не перенесет python -m src.cards.migrate_photo_layout.
+        """
+        if os.path.isabs(key):
+            return key
+        return os.path.join(self.root, key)
+
+    async def put(self, key: str, data: bytes) -> None:
+        await run_in_threadpool(_write_file, self.local_path(key), data)
+
+    async def put_file(self, key: str, path: str) -> None:
+        await run_in_threadpool(_move_file, path, self.local_path(key))
+
+    async def get_stream(
+        self,
+        key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = 64 * 1024
+    ) -> AsyncGenerator[bytes, None]:
+        async for chunk in iterate_in_threadpool(_read_range(self.local_path(key), start, end, chunk_size)):
+            yield chunk
+
+    async def move(self, key: str, new_key: str) -> None:
+        await run_in_threadpool(_move_file, self.local_path(key), self.local_path(new_key))
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        return await run_in_threadpool(_stat, self.local_path(key))
+
+    async def delete(self, key: str) -> None:
+        await run_in_threadpool(_unlink, self.local_path(key))
+
+    async def iter_keys(self, prefix: str = "") -> AsyncIterator[str]:
+        # Сканируется только директория, целиком заданная префиксом
+        key_dir, _, name_prefix = prefix.rpartition("/")
+        key_prefix = f"{key_dir}/" if key_dir else ""
+        directory = self.local_path(key_dir) if key_dir else self.root
+        async for key in iterate_in_threadpool(_walk_keys(directory, key_prefix, name_prefix)):
+            yield key
@@ -0,0 +1,236 @@
+from contextlib import AsyncExitStack
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, Optional
+import asyncio
+import mimetypes
+import os
+import tempfile
+from starlette.concurrency import run_in_threadpool
+from .base import PhotoStorage, StoredObject
+
+# Коды ошибок S3, означающие отсутствие объекта
+_MISSING_CODES = {"404", "NoSuchKey", "NotFound"}
+
+
+def _is_missing(error: Exception) -> bool:
+    return getattr(error, "response", {}).get("Error", {}).get("Code") in _MISSING_CODES
+
+
+def _read_chunk(path: str, offset: int, size: int) -> bytes:
+    with open(path, "rb") as file_obj:
+        file_obj.seek(offset)
+        return file_obj.read(size)
+
+
+class S3PhotoStorage(PhotoStorage):
+    """
+    Хранилище фотографий в S3-совместимом объектном хранилище (AWS S3, MinIO, Ceph).
+
+    Используется один клиент aiobotocore на процесс с пулом HTTP-соединений
+    на max_pool_connections соединений. Файлы больше multipart_threshold
+    загружаются по частям (multipart upload), до multipart_concurrency
+    частей одновременно; при ошибке незавершенная загрузка отменяется.
+
+    Требует дополнительную зависимость: poetry install --extras s3.
+    """
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        prefix: str = "",
+        max_pool_connections: int = 50,
+        multipart_threshold: int = 8 * 1024 * 1024,
+        multipart_chunk_size: int = 8 * 1024 * 1024,
+        multipart_concurrency: int = 4
+    ):
+        """
+        Инициализация хранилища
+
+        Args:
+            bucket: Имя бакета
+            endpoint_url: Адрес S3-совместимого сервиса (None — AWS S3)
+            region: Регион бакета
+            access_key_id: Ключ доступа (None — из окружения или профиля AWS)
+            secret_access_key: Секретный ключ
+            prefix: Префикс ключей объектов внутри бакета
+            max_pool_connections: Размер пула HTTP-соединений
+            multipart_threshold: Размер файла, начиная с которого используется multipart upload
+            multipart_chunk_size: Размер части multipart upload (не меньше 5 МБ по требованиям S3)
+            multipart_concurrency: Число одновременно загружаемых частей одного файла
+
+        Raises:
+            RuntimeError: если aiobotocore не установлен
+        """
+        try:
+            from aiobotocore.config import AioConfig
+            from aiobotocore.session import get_session
+        except ImportError as e:
+            raise RuntimeError("S3 photo storage requires aiobotocore: poetry install --extras s3") from e
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.multipart_threshold = multipart_threshold
+        self.multipart_chunk_size = multipart_chunk_size
+        self.multipart_concurrency = multipart_concurrency
+        self._session = get_session()
+        self._client_options = {
+            "endpoint_url": endpoint_url,
+            "region_name": region,
+            "aws_access_key_id": access_key_id,
+            "aws_secret_access_key": secret_access_key,
+            "config": AioConfig(
+                max_pool_connections=max_pool_connections,
+                retries={"max_attempts": 3, "mode": "standard"}
+            ),
+        }
+        self._client = None
+        self._client_lock = asyncio.Lock()
+        self._exit_stack = AsyncExitStack()
+
+    @property
+    def temp_dir(self) -> str:
+        return tempfile.gettempdir()
+
+    async def _get_client(self):
+        """Клиент создается при первом обращении, уже внутри event loop приложения"""
+        if self._client is None:
+            async with self._client_lock:
+                if self._client is None:
+                    self._client = await self._exit_stack.enter_async_context(
+                        self._session.create_client("s3", **self._client_options)
+                    )
+        return self._client
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    async def _upload(self, key: str, size: int, read_part: Callable[[int, int], Awaitable[bytes]]) -> None:
+        """
+        Загружает объект одним запросом или по частям.
+
+        Args:
+            key: Ключ файла в хранилище
+            size: Размер файла в байтах
+            read_part: Функция чтения (смещение, размер) -> байты
+        """
+        client = await self._get_client()
+        params = {
+            "Bucket": self.bucket,
+            "Key": self._object_key(key),
+            "ContentType": mimetypes.guess_type(key)[0] or "application/octet-stream",
+        }
+        if size < self.multipart_threshold:
+            await client.put_object(Body=await read_part(0, size), **params)
+            return
+
+        upload_id = (await client.create_multipart_upload(**params))["UploadId"]
+        semaphore = asyncio.Semaphore(self.multipart_concurrency)
+
+        async def upload_part(number: int, offset: int) -> dict:
+            async with semaphore:
+                body = await read_part(offset, min(self.multipart_chunk_size, size - offset))
+                response = await client.upload_part(
+                    Bucket=self.bucket,
+                    Key=params["Key"],
+                    UploadId=upload_id,
+                    PartNumber=number,
+                    Body=body
+                )
+            return {"PartNumber": number, "ETag": response["ETag"]}
+
+        try:
+            parts = await asyncio.gather(*(
+                upload_part(number, offset)
+                for number, offset in enumerate(range(0, size, self.multipart_chunk_size), start=1)
+            ))
+            await client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=params["Key"],
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts}
+            )
+        except BaseException:
+            # Иначе загруженные части остаются в бакете и оплачиваются
+            await asyncio.shield(
+                client.abort_multipart_upload(Bucket=self.bucket, Key=params["Key"], UploadId=upload_id)
+            )
+            raise
+
+    async def put(self, key: str, data: bytes) -> None:
+        view = memoryview(data)
+
+        async def read_part(offset: int, size: int) -> bytes:
+            return bytes(view[offset:offset + size])
+
+        await self._upload(key, len(data), read_part)
+
+    async def put_file(self, key: str, path: str) -> None:
+        async def read_part(offset: int, size: int) -> bytes:
+            return await run_in_threadpool(_read_chunk, path, offset, size)
+
+        await self._upload(key, await run_in_threadpool(os.path.getsize, path), read_part)
+
+    async def get_stream(
+        self,
+        key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = 64 * 1024
+    ) -> AsyncGenerator[bytes, None]:
+        client = await self._get_client()
+        params = {"Bucket": self.bucket, "Key": self._object_key(key)}
+        if start or end is not None:
+            params["Range"] = f"bytes={start}-{'' if end is None else end}"
+        try:
+            response = await client.get_object(**params)
+        except client.exceptions.ClientError as e:
+            if _is_missing(e):
+                raise FileNotFoundError(key) from e
+            raise
+
+        async with response["Body"] as body:
+            while chunk := await body.read(chunk_size):
+                yield chunk
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        client = await self._get_client()
+        try:
+            response = await client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except client.exceptions.ClientError as e:
+            if _is_missing(e):
+                return None
+            raise
+        return StoredObject(size=response["ContentLength"], modified=response["LastModified"])
+
+    async def move(self, key: str, new_key: str) -> None:
+        # Копирование выполняется внутри S3, данные через приложение не проходят
+        client = await self._get_client()
+        try:
+            await client.copy_object(
+                Bucket=self.bucket,
+                Key=self._object_key(new_key),
+                CopySource={"Bucket": self.bucket, "Key": self._object_key(key)}
+            )
+        except client.exceptions.ClientError as e:
+            if _is_missing(e):
+                raise FileNotFoundError(key) from e
+            raise
+        await self.delete(key)
+
+    async def delete(self, key: str) -> None:
+        client = await self._get_client()
+        await client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    async def iter_keys(self, prefix: str = "") -> AsyncIterator[str]:
+        # S3 возвращает ключи в лексикографическом порядке байтов UTF-8
+        client = await self._get_client()
+        paginator = client.get_paginator("list_objects_v2")
+        async for page in paginator.paginate(Bucket=self.bucket, Prefix=self._object_key(prefix)):
+            for item in page.get("Contents", []):
+                yield item["Key"][len(self.prefix):]
+
+    async def close(self) -> None:
+        await self._exit_stack.aclose()
+        self._client = None
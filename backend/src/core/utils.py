@@ -1,10 +1,17 @@
+from contextlib import aclosing
 from datetime import datetime
+import asyncio
 import hashlib
 import os
 import zipfile
 import io
+import tempfile
+from typing import AsyncIterator, Iterable, NamedTuple
 from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
 from src.core.config import settings
+from src.core.image_probe import ImageInfo, probe_image
+from src.core.storage import PhotoStorage, photo_storage
 
 
 def photo_hashed_name(email: str, format: str = "jpg") -> str:
@@ -27,50 +34,220 @@ def photo_hashed_name(email: str, format: str = "jpg") -> str:
     return f"{hash_output.hexdigest()}.{format}"
 
 
-def save_photo(photo_file: UploadFile, photo_name: str) -> str:
+# Расширения сохраняемых файлов по MIME-типу загрузки
+PHOTO_EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png"}
+
+
+def photo_key(filename: str) -> str:
+    """
+    Формирует ключ файла в хранилище с двухуровневым разбиением по директориям.
+
+    Имена файлов — шестнадцатеричные хэши, поэтому первые две пары символов
+    равномерно распределяют файлы по 65536 директориям и ни одна директория
+    не разрастается до миллионов записей.
+
+    Args:
+        filename: Имя файла (<хэш>.<расширение> или <хэш>.<вариант>.<расширение>)
+
+    Returns:
+        Ключ вида ab/cd/abcd....jpg относительно корня хранилища
+    """
+    return f"{filename[:2]}/{filename[2:4]}/{filename}"
+
+
+class SavedPhoto(NamedTuple):
+    """
+    Принятое фото: ключ в контентно-адресуемом хранилище и файл во временной директории.
+
+    Файл публикуется под ключом publish_photo после того, как в БД взята
+    ссылка на блоб, и удаляется discard_photo, если остался.
     """
-    Сохраняет загруженное фото в указанную директорию с валидацией.
+    path: str
+    content_hash: str
+    size: int
+    image: ImageInfo
+    temp_path: str
+
+
+def _fsync_and_close(file_obj) -> None:
+    """Сбрасывает данные файла на диск и закрывает его"""
+    file_obj.flush()
+    os.fsync(file_obj.fileno())
+    file_obj.close()
+
+
+def _discard_temp_file(file_obj, tmp_path: str) -> None:
+    """Закрывает и удаляет временный файл, если он остался"""
+    file_obj.close()
+    try:
+        os.unlink(tmp_path)
+    except FileNotFoundError:
+        pass
+
+
+def discard_photo(photo: SavedPhoto) -> None:
+    """
+    Удаляет временный файл принятого фото, если он остался.
+
+    Вызов синхронный, чтобы сработать и при отмене задачи; локальное
+    хранилище при публикации уже переместило файл под итоговый ключ.
+    """
+    try:
+        os.unlink(photo.temp_path)
+    except FileNotFoundError:
+        pass
+
+
+async def _probe_upload(photo_file: UploadFile) -> tuple[ImageInfo, bytes]:
+    """
+    Читает начало загрузки и проверяет, что это изображение допустимого размера.
+
+    Тип определяется по сигнатуре файла, а не по Content-Type клиента.
+    Блоки читаются, пока Pillow не разберет заголовок (обычно хватает
+    первого блока), но не больше UPLOAD_PROBE_MAX_BYTES.
+
+    Returns:
+        Параметры изображения и уже прочитанные байты, которые нужно записать первыми
+
+    Raises:
+        HTTPException: 415 если это не JPEG/PNG или заголовок поврежден,
+            413 при превышении размеров изображения или файла
+    """
+    header = bytearray()
+    while True:
+        chunk = await photo_file.read(settings.UPLOAD_CHUNK_SIZE)
+        header += chunk
+        if len(header) > settings.MAX_UPLOAD_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum size: {settings.MAX_UPLOAD_SIZE} bytes"
+            )
+        info = probe_image(
+            bytes(header),
+            complete=not chunk or len(header) >= settings.UPLOAD_PROBE_MAX_BYTES,
+            max_pixels=settings.MAX_IMAGE_PIXELS,
+            max_dimension=settings.MAX_IMAGE_DIMENSION
+        )
+        if info is not None:
+            return info, bytes(header)
+
+
+async def save_photo(photo_file: UploadFile) -> SavedPhoto:
+    """
+    Принимает загруженное фото с валидацией во временный файл.
+
+    Сначала по первым килобайтам проверяются сигнатура и заголовок
+    изображения (формат, размеры), и только потом создается файл: поддельные,
+    поврежденные и слишком большие по размерам изображения отклоняются,
+    не записав на диск ни байта. Файл читается блоками по UPLOAD_CHUNK_SIZE
+    байт и пишется во временный файл в пуле потоков, так что event loop не
+    блокируется дисковыми операциями. Размер проверяется, а sha256 считается
+    по ходу чтения. Ключ файла — хэш содержимого, поэтому одинаковые загрузки
+    хранятся одной копией.
+
+    В хранилище файл не публикуется: это делает publish_photo после того,
+    как взята ссылка на блоб, иначе параллельное удаление последней карточки
+    с тем же содержимым могло бы удалить уже существующий файл между
+    проверкой и созданием ссылки. Временный файл удаляет discard_photo.
     
     Args:
         photo_file: Загруженный файл из запроса
-        photo_name: Имя, под которым нужно сохранить файл
         
     Returns:
-        Путь к директории, в которую было сохранено фото
+        SavedPhoto с ключом файла в хранилище, хэшем содержимого, размером, параметрами изображения
+        и путем к временному файлу
         
     Raises:
-        HTTPException: При ошибках валидации или записи файла
+        HTTPException: При ошибках валидации, превышении размера или ошибке записи файла
     """
+    info, header = await _probe_upload(photo_file)
+
     try:
-        # Валидация типа файла
-        if photo_file.content_type not in ["image/jpeg", "image/png"]:
-            raise HTTPException(
-                status_code=415,
-                detail="Unsupported media type. Allowed: image/jpeg, image/png"
-            )
+        temp_dir = photo_storage.temp_dir
+        await run_in_threadpool(os.makedirs, temp_dir, exist_ok=True)
+
+        fd, tmp_path = await run_in_threadpool(tempfile.mkstemp, dir=temp_dir, suffix=".part")
+        tmp_file = os.fdopen(fd, "wb")
+    except OSError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"File save error: {str(e)}"
+        )
+
+    try:
+        digest = hashlib.sha256(header)
+        written = len(header)
+        await run_in_threadpool(tmp_file.write, header)
+        while chunk := await photo_file.read(settings.UPLOAD_CHUNK_SIZE):
+            written += len(chunk)
+            if written > settings.MAX_UPLOAD_SIZE:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File too large. Maximum size: {settings.MAX_UPLOAD_SIZE} bytes"
+                )
+            digest.update(chunk)
+            await run_in_threadpool(tmp_file.write, chunk)
+
+        await run_in_threadpool(_fsync_and_close, tmp_file)
+        content_hash = digest.hexdigest()
+        return SavedPhoto(
+            path=photo_key(f"{content_hash}.{PHOTO_EXTENSIONS[info.content_type]}"),
+            content_hash=content_hash,
+            size=written,
+            image=info,
+            temp_path=tmp_path
+        )
 
-        # Сохранение файла
-        photo_dir = os.path.expanduser(settings.PHOTO_FOLDER_FULL_NAME)
-        os.makedirs(photo_dir, exist_ok=True)
-        
-        file_path = os.path.join(photo_dir, photo_name)
-        
-        with open(file_path, "wb") as buffer:
-            buffer.write(photo_file.file.read())
-        return f"{photo_dir}/{photo_name}"
-        
     except OSError as e:
+        _discard_temp_file(tmp_file, tmp_path)
         raise HTTPException(
             status_code=500,
             detail=f"File save error: {str(e)}"
         )
-    except Exception as e:
+    except BaseException:
+        # В том числе отмена задачи: недописанный файл удаляется сразу
+        _discard_temp_file(tmp_file, tmp_path)
+        raise
+
+
+async def publish_photo(photo: SavedPhoto) -> None:
+    """
+    Публикует принятое фото в хранилище (photo_storage) под итоговым ключом.
+
+    Вызывается после того, как в текущей транзакции взята ссылка на блоб:
+    строка блоба заблокирована до коммита, и параллельное удаление последней
+    ссылки не может удалить файл между проверкой и созданием ссылки. Если
+    блоб с таким содержимым уже есть в хранилище, повторно он не передается.
+    Полностью записанный временный файл публикуется целиком, поэтому
+    частично записанное фото никогда не появится под итоговым именем.
+
+    Raises:
+        HTTPException: При ошибке записи в хранилище
+    """
+    try:
+        if not await photo_storage.exists(photo.path):
+            await photo_storage.put_file(photo.path, photo.temp_path)
+    except OSError as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Unexpected error: {str(e)}"
+            detail=f"File save error: {str(e)}"
         )
 
 
+async def delete_photo(photo_path: str) -> None:
+    """
+    Удаляет файл фотографии вместе с ее производными вариантами.
+
+    Варианты хранятся рядом с оригиналом под ключами <хэш>.<вариант>.<расширение>.
+    
+    Args:
+        photo_path: Ключ файла фотографии в хранилище
+    """
+    base, _ = os.path.splitext(photo_path)
+    keys = {photo_path, *[key async for key in photo_storage.iter_keys(f"{base}.")]}
+    await asyncio.gather(*(photo_storage.delete(key) for key in keys))
+
+
 def get_photo_file(photo_path: str):
     """
     Проверяет существование файла фотографии по указанному пути.
@@ -116,3 +293,107 @@ def create_zip_archive(files: list) -> io.BytesIO:
     
     zip_buffer.seek(0)
     return zip_buffer
+
+
+# Форматы, которые уже сжаты: повторный deflate только тратит CPU
+_PRECOMPRESSED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+# Сколько файлов архива запрашивать у хранилища за раз
+_ZIP_STAT_BATCH = 32
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Неперематываемый приемник для zipfile.
+
+    Накапливает байты, записанные zipfile, до тех пор, пока генератор
+    архива не заберет их методом drain(). Так как seek() не поддерживается,
+    zipfile пишет записи с data descriptor и не возвращается назад.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _zip_compress_type(photo_path: str, store_only: bool) -> int:
+    """Выбирает метод сжатия записи: уже сжатые форматы сохраняются без deflate"""
+    extension = os.path.splitext(photo_path)[1].lower()
+    if store_only or extension in _PRECOMPRESSED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+async def iter_zip_archive(
+    photo_paths: Iterable[str],
+    storage: PhotoStorage = photo_storage,
+    store_only: bool = settings.ZIP_STORE_ONLY,
+    chunk_size: int = settings.ZIP_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """
+    Потоково формирует ZIP архив из файлов хранилища.
+
+    Файлы читаются блоками по chunk_size байт, и каждый блок сразу
+    отдается потребителю, поэтому расход памяти не зависит от размера
+    и количества файлов. Размеры файлов запрашиваются у хранилища
+    порциями параллельно, чтобы при удаленном хранилище не ждать
+    отдельного запроса перед каждой записью архива.
+
+    Args:
+        photo_paths: Ключи файлов фотографий в хранилище
+        storage: Хранилище фотографий
+        store_only: Сохранять все записи без сжатия (JPEG/PNG сохраняются без сжатия всегда)
+        chunk_size: Размер блока чтения в байтах
+
+    Yields:
+        Очередной фрагмент ZIP архива
+    """
+    photo_paths = list(photo_paths)
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w") as zip_file:
+        for offset in range(0, len(photo_paths), _ZIP_STAT_BATCH):
+            batch = photo_paths[offset:offset + _ZIP_STAT_BATCH]
+            stats = await asyncio.gather(*(storage.stat(photo_path) for photo_path in batch))
+            for photo_path, stored in zip(batch, stats):
+                if stored is None:
+                    # Пропускаем недоступные файлы, как и create_zip_archive
+                    continue
+
+                async with aclosing(storage.get_stream(photo_path, chunk_size=chunk_size)) as stream:
+                    try:
+                        first = await anext(stream, b"")
+                    except FileNotFoundError:
+                        # Файл удален после запроса размера
+                        continue
+
+                    # Размер нужен zipfile, чтобы заранее решить, нужен ли ZIP64
+                    zinfo = zipfile.ZipInfo(os.path.basename(photo_path), date_time=stored.modified.timetuple()[:6])
+                    zinfo.external_attr = 0o644 << 16
+                    zinfo.file_size = stored.size
+                    zinfo.compress_type = _zip_compress_type(photo_path, store_only)
+                    with zip_file.open(zinfo, "w") as entry:
+                        entry.write(first)
+                        async for chunk in stream:
+                            entry.write(chunk)
+                            data = sink.drain()
+                            if data:
+                                yield data
+
+                data = sink.drain()
+                if data:
+                    yield data
+
+    # Центральный каталог записывается при закрытии архива
+    data = sink.drain()
+    if data:
+        yield data
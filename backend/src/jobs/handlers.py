@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.core.db_session import get_read_db
+from src.auth.dependencies import get_current_user
+from src.user.schemas import CurrentUser
+from .repository import JobRepository
+from .schemas import JobOut
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job(
+    job_id: int,
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Статус фоновой задачи (например, обработки загруженного фото)"""
+    job = await JobRepository(db).get_job(job_id)
+    if job is None or job.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
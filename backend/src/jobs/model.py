@@ -0,0 +1,50 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, ForeignKey, Integer, JSON, Text, DateTime, Index, text
+from sqlalchemy.orm import Mapped, mapped_column
+from src.core.base_model import BaseModel
+
+# Статусы фоновой задачи
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class Job(BaseModel):
+    """
+    Фоновая задача очереди.
+
+    Задача в статусе pending выполняется, когда наступает run_at. Воркер
+    переводит ее в running и увеличивает attempts; при ошибке задача
+    возвращается в pending с отложенным run_at, пока не исчерпаны попытки.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Выборка готовых к выполнению задач; завершенные задачи в индекс не попадают
+        Index(
+            "ix_jobs_pending_run_at", "run_at",
+            postgresql_where=text("status = 'pending'")
+        ),
+        Index(
+            "ix_jobs_running_locked_at", "locked_at",
+            postgresql_where=text("status = 'running'")
+        ),
+    )
+
+    kind: Mapped[str] = mapped_column(String(50))
+    payload: Mapped[dict] = mapped_column(JSON, default=dict)
+    status: Mapped[str] = mapped_column(String(20), default=JOB_PENDING)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer)
+    run_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    locked_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    user_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True
+    )
+
+    def __repr__(self) -> str:
+        return f"<Job(id={self.id}, kind={self.kind}, status={self.status})>"
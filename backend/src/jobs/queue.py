@@ -0,0 +1,215 @@
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional, List
+import asyncio
+import logging
+import random
+import time
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from src.core.config import settings
+from src.core.db_session import AsyncSessionLocal
+from src.core.metrics import registry
+from .model import Job
+from .repository import JobRepository
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[AsyncSession, dict], Awaitable[None]]
+
+JOBS_FINISHED = registry.counter(
+    "jobs_finished_total",
+    "Background job runs by kind and outcome (succeeded, retry, failed, lost)",
+    ("kind", "outcome")
+)
+JOB_DURATION_SECONDS = registry.histogram(
+    "job_duration_seconds", "Background job run time", ("kind",)
+)
+JOB_QUEUE_DELAY_SECONDS = registry.histogram(
+    "job_queue_delay_seconds", "Delay between a job becoming ready and a worker starting it", ("kind",)
+)
+
+
+class JobQueue:
+    """
+    Очередь фоновых задач с хранением в PostgreSQL.
+
+    Каждый процесс приложения запускает workers корутин, которые захватывают
+    задачи из общей таблицы jobs (SKIP LOCKED) и выполняют зарегистрированные
+    обработчики. Если задача поставлена в этом же процессе, воркеры
+    просыпаются сразу, иначе опрашивают таблицу раз в poll_interval секунд.
+    Ошибка обработчика возвращает задачу в очередь с экспоненциальной
+    задержкой, пока не исчерпаны попытки. Пока обработчик работает, аренда
+    задачи продлевается, так что lease_seconds ограничивает только время
+    обнаружения остановившегося воркера, а не длительность задачи.
+    """
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        workers: int,
+        poll_interval: float,
+        lease_seconds: float,
+        retry_base_seconds: float,
+        retry_max_seconds: float
+    ):
+        self._session_factory = session_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._handlers: dict[str, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    def handler(self, kind: str) -> Callable[[JobHandler], JobHandler]:
+        """
+        Регистрирует обработчик задач указанного типа
+
+        Обработчик получает новую сессию БД и payload задачи; исключение
+        считается неудачной попыткой.
+        """
+        def register(func: JobHandler) -> JobHandler:
+            self._handlers[kind] = func
+            return func
+        return register
+
+    async def enqueue(
+        self,
+        db: AsyncSession,
+        kind: str,
+        payload: dict,
+        user_id: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        commit: bool = True
+    ) -> Job:
+        """
+        Ставит задачу в очередь
+
+        Args:
+            db: Сессия БД вызывающего кода
+            kind: Тип задачи
+            payload: Параметры задачи (JSON)
+            user_id: Владелец задачи
+            max_attempts: Максимальное число попыток (по умолчанию JOB_MAX_ATTEMPTS)
+            commit: Закоммитить задачу сразу. При False задача входит в транзакцию
+                вызывающего кода, который после коммита вызывает notify()
+
+        Returns:
+            Созданная задача
+        """
+        job = await JobRepository(db).create_job(
+            kind, payload, max_attempts or settings.JOB_MAX_ATTEMPTS, user_id, commit=commit
+        )
+        if commit:
+            self.notify()
+        return job
+
+    def notify(self) -> None:
+        """Будит воркеры процесса, чтобы они сразу забрали закоммиченную задачу"""
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work(), name=f"job-worker-{i}") for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        """
+        Останавливает воркеры
+
+        Прерванная задача остается в running и будет захвачена повторно
+        после истечения lease_seconds.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _retry_delay(self, attempts: int) -> float:
+        """Экспоненциальная задержка перед повтором со случайным разбросом"""
+        delay = min(self.retry_base_seconds * 2 ** (attempts - 1), self.retry_max_seconds)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _work(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                async with self._session_factory() as db:
+                    jobs = await JobRepository(db).claim_jobs(1, self.lease_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to claim background jobs")
+                jobs = []
+
+            if not jobs:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(jobs[0])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Результат не записан: задача будет захвачена повторно после истечения аренды
+                logger.exception("Failed to record result of background job %s", jobs[0].id)
+
+    async def _run(self, job: Job) -> None:
+        JOB_QUEUE_DELAY_SECONDS.observe(max((datetime.utcnow() - job.run_at).total_seconds(), 0.0), kind=job.kind)
+        start = time.perf_counter()
+        heartbeat = asyncio.create_task(self._renew_lease(job))
+        try:
+            async with self._session_factory() as db:
+                try:
+                    handler = self._handlers.get(job.kind)
+                    if handler is None:
+                        raise LookupError(f"No handler registered for job kind {job.kind!r}")
+                    await handler(db, job.payload)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    await db.rollback()
+                    retry_at = None
+                    if job.attempts < job.max_attempts:
+                        retry_at = datetime.utcnow() + timedelta(seconds=self._retry_delay(job.attempts))
+                    logger.exception("Background job %s (%s) failed on attempt %s", job.id, job.kind, job.attempts)
+                    recorded = await JobRepository(db).fail_job(
+                        job.id, job.attempts, f"{type(e).__name__}: {e}", retry_at
+                    )
+                    outcome = "retry" if retry_at else "failed"
+                else:
+                    recorded = await JobRepository(db).complete_job(job.id, job.attempts)
+                    outcome = "succeeded"
+        finally:
+            heartbeat.cancel()
+        if not recorded:
+            logger.warning("Background job %s (%s) lost its lease, result discarded", job.id, job.kind)
+            outcome = "lost"
+        JOB_DURATION_SECONDS.observe(time.perf_counter() - start, kind=job.kind)
+        JOBS_FINISHED.inc(kind=job.kind, outcome=outcome)
+
+    async def _renew_lease(self, job: Job) -> None:
+        """Продлевает аренду задачи, пока она выполняется (каждую треть lease_seconds)"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                async with self._session_factory() as db:
+                    renewed = await JobRepository(db).renew_lease(job.id, job.attempts)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to renew lease of background job %s", job.id)
+                continue
+            if not renewed:
+                logger.warning("Background job %s was claimed by another worker", job.id)
+                return
+
+job_queue = JobQueue(
+    AsyncSessionLocal,
+    workers=settings.JOB_WORKERS,
+    poll_interval=settings.JOB_POLL_INTERVAL_SECONDS,
+    lease_seconds=settings.JOB_LEASE_SECONDS,
+    retry_base_seconds=settings.JOB_RETRY_BASE_SECONDS,
+    retry_max_seconds=settings.JOB_RETRY_MAX_SECONDS
+)
@@ -0,0 +1,189 @@
+from datetime import datetime, timedelta
+from typing import Optional, List, cast
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, and_, or_
+from sqlalchemy.engine import CursorResult, Result
+from .model import Job, JOB_PENDING, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED
+
+
+def _rowcount(result: Result) -> int:
+    """Число строк, затронутых UPDATE (execute() типизирован как Result без rowcount)"""
+    return cast(CursorResult, result).rowcount
+
+
+class JobRepository:
+    """
+    Репозиторий для операций с фоновыми задачами (Job) в базе данных.
+
+    Задачи захватываются через SELECT ... FOR UPDATE SKIP LOCKED, поэтому
+    воркеры всех процессов разбирают одну таблицу, не блокируя друг друга
+    и не получая одну задачу дважды. Номер попытки (attempts) служит токеном
+    аренды: продление и запись результата проходят, только пока задачу
+    не захватили повторно.
+    """
+    def __init__(self, db: AsyncSession):
+        """
+        Инициализация репозитория задач.
+
+        Args:
+            db: Асинхронная сессия SQLAlchemy
+        """
+        self.db = db
+
+    async def create_job(
+        self,
+        kind: str,
+        payload: dict,
+        max_attempts: int,
+        user_id: Optional[int] = None,
+        commit: bool = True
+    ) -> Job:
+        """
+        Ставит задачу в очередь.
+
+        Args:
+            kind: Тип задачи (имя зарегистрированного обработчика)
+            payload: Параметры задачи (JSON)
+            max_attempts: Максимальное число попыток выполнения
+            user_id: Владелец задачи, которому доступен ее статус
+            commit: Закоммитить задачу сразу; иначе она только отправляется
+                в БД и сохраняется вместе с транзакцией вызывающего кода
+
+        Returns:
+            Созданная задача
+        """
+        job = Job(kind=kind, payload=payload, max_attempts=max_attempts, user_id=user_id)
+        self.db.add(job)
+        if not commit:
+            await self.db.flush()
+            return job
+        await self.db.commit()
+        await self.db.refresh(job)
+        return job
+
+    async def get_job(self, job_id: int) -> Optional[Job]:
+        """
+        Получает задачу по идентификатору.
+
+        Args:
+            job_id: Идентификатор задачи
+
+        Returns:
+            Объект Job или None, если задача не найдена
+        """
+        result = await self.db.execute(select(Job).where(Job.id == job_id))
+        return result.scalars().first()
+
+    async def claim_jobs(self, limit: int, lease_seconds: float) -> List[Job]:
+        """
+        Захватывает готовые к выполнению задачи.
+
+        Готовы задачи в pending с наступившим run_at, а также задачи в running,
+        захваченные дольше lease_seconds назад: их воркер, вероятно, остановился
+        аварийно. Попытка засчитывается в момент захвата, поэтому задача,
+        которая роняет воркер без исключения (OOM, segfault в декодере),
+        тоже расходует попытки: просроченные задачи с исчерпанными попытками
+        переводятся в failed вместо повторного захвата.
+
+        Args:
+            limit: Максимальное число задач
+            lease_seconds: Время, после которого незавершенную задачу можно захватить повторно
+
+        Returns:
+            Захваченные задачи в статусе running
+        """
+        now = datetime.utcnow()
+        expired = and_(Job.status == JOB_RUNNING, Job.locked_at < now - timedelta(seconds=lease_seconds))
+        await self.db.execute(
+            update(Job)
+            .where(expired, Job.attempts >= Job.max_attempts)
+            .values(
+                status=JOB_FAILED, finished_at=now, locked_at=None, updated_at=now,
+                last_error="Lease expired on the last attempt"
+            )
+            .execution_options(synchronize_session=False)
+        )
+        ready = (
+            select(Job.id)
+            .where(or_(
+                and_(Job.status == JOB_PENDING, Job.run_at <= now),
+                and_(expired, Job.attempts < Job.max_attempts),
+            ))
+            .order_by(Job.run_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await self.db.execute(
+            update(Job)
+            .where(Job.id.in_(ready.scalar_subquery()))
+            .values(status=JOB_RUNNING, attempts=Job.attempts + 1, locked_at=now, updated_at=now)
+            .returning(Job)
+            .execution_options(synchronize_session=False)
+        )
+        jobs = list(result.scalars().all())
+        await self.db.commit()
+        return jobs
+
+    async def renew_lease(self, job_id: int, attempt: int) -> bool:
+        """
+        Продлевает аренду выполняющейся задачи.
+
+        Args:
+            job_id: Идентификатор задачи
+            attempt: Номер попытки, полученный при захвате
+
+        Returns:
+            False, если задачу уже захватил другой воркер
+        """
+        now = datetime.utcnow()
+        result = await self.db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == JOB_RUNNING, Job.attempts == attempt)
+            .values(locked_at=now, updated_at=now)
+        )
+        await self.db.commit()
+        return _rowcount(result) > 0
+
+    async def complete_job(self, job_id: int, attempt: int) -> bool:
+        """
+        Отмечает задачу выполненной.
+
+        Args:
+            job_id: Идентификатор задачи
+            attempt: Номер попытки, полученный при захвате
+
+        Returns:
+            False, если задачу уже захватил другой воркер и результат не записан
+        """
+        result = await self.db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == JOB_RUNNING, Job.attempts == attempt)
+            .values(status=JOB_SUCCEEDED, finished_at=datetime.utcnow(), locked_at=None, last_error=None)
+        )
+        await self.db.commit()
+        return _rowcount(result) > 0
+
+    async def fail_job(self, job_id: int, attempt: int, error: str, retry_at: Optional[datetime]) -> bool:
+        """
+        Записывает ошибку выполнения задачи.
+
+        Args:
+            job_id: Идентификатор задачи
+            attempt: Номер попытки, полученный при захвате
+            error: Текст ошибки
+            retry_at: Время следующей попытки или None, если попытки исчерпаны
+
+        Returns:
+            False, если задачу уже захватил другой воркер и результат не записан
+        """
+        if retry_at is not None:
+            values = {"status": JOB_PENDING, "run_at": retry_at}
+        else:
+            values = {"status": JOB_FAILED, "finished_at": datetime.utcnow()}
+        result = await self.db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == JOB_RUNNING, Job.attempts == attempt)
+            .values(locked_at=None, last_error=error, **values)
+        )
+        await self.db.commit()
+        return _rowcount(result) > 0
@@ -0,0 +1,118 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+from src.core.config import settings
+from src.core.metrics import registry
+from .schemas import UserInDB
+
+
+class UserCacheBackend(ABC):
+    """
+    Хранилище кэша пользователей.
+
+    По умолчанию используется хранилище в памяти процесса. Для нескольких
+    воркеров можно подключить общее хранилище (например, Redis), тогда
+    инвалидация в одном воркере будет видна всем остальным.
+    """
+
+    @abstractmethod
+    async def get(self, user_id: int) -> Optional[UserInDB]:
+        """Возвращает пользователя из кэша или None"""
+        pass
+
+    @abstractmethod
+    async def set(self, user: UserInDB, ttl: float) -> None:
+        """Сохраняет пользователя в кэш на ttl секунд"""
+        pass
+
+    @abstractmethod
+    async def delete(self, user_id: int) -> None:
+        """Удаляет пользователя из кэша"""
+        pass
+
+
+class InMemoryUserCacheBackend(UserCacheBackend):
+    """Кэш в памяти процесса с ограничением по времени жизни и размеру (LRU)"""
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[int, tuple[float, UserInDB]] = OrderedDict()
+
+    async def get(self, user_id: int) -> Optional[UserInDB]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return user
+
+    async def set(self, user: UserInDB, ttl: float) -> None:
+        self._entries[user.id] = (time.monotonic() + ttl, user)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, user_id: int) -> None:
+        self._entries.pop(user_id, None)
+
+
+class UserCache:
+    """
+    Кэш проверенных пользователей по идентификатору.
+
+    Позволяет аутентифицировать запрос без обращения к БД. Записи
+    инвалидируются при изменении и удалении пользователя в UserRepository,
+    но только в текущем процессе (если не подключено общее хранилище):
+    отзыв токенов в других воркерах get_current_user отслеживает по версиям
+    токенов (token_versions).
+    """
+    def __init__(self, backend: UserCacheBackend, ttl: float, enabled: bool = True):
+        """
+        Инициализация кэша пользователей
+
+        Args:
+            backend: Хранилище записей кэша
+            ttl: Время жизни записи в секундах
+            enabled: Включен ли кэш
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def set_backend(self, backend: UserCacheBackend) -> None:
+        """Подключает другое хранилище, например общее для всех воркеров"""
+        self.backend = backend
+
+    async def get(self, user_id: int) -> Optional[UserInDB]:
+        if not self.enabled:
+            return None
+        user = await self.backend.get(user_id)
+        if user is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return user
+
+    async def set(self, user: UserInDB) -> None:
+        if self.enabled:
+            await self.backend.set(user, self.ttl)
+
+    async def invalidate(self, user_id: int) -> None:
+        await self.backend.delete(user_id)
+
+
+user_cache = UserCache(
+    InMemoryUserCacheBackend(settings.USER_CACHE_MAX_SIZE),
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+    enabled=settings.USER_CACHE_ENABLED
+)
+
+USER_CACHE_REQUESTS = registry.counter(
+    "user_cache_requests_total", "Authenticated user cache lookups by result", ("result",)
+)
+USER_CACHE_REQUESTS.set_function(lambda: {("hit",): user_cache.hits, ("miss",): user_cache.misses})
@@ -1,15 +1,31 @@
-from fastapi import APIRouter, Depends
-from .schemas import UserInDB, UserOut
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.core.db_session import get_read_db
+from src.core.responses import ModelResponse
+from .schemas import CurrentUser, UserInDB, UserOut
 from src.auth.dependencies import get_current_user
+from .service import UserService
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/me", response_model=UserOut)
 async def get_me(
-    current_user: UserInDB = Depends(get_current_user)
+    fresh: bool = False,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Получение информации о текущем аутентифицированном пользователе"""
-    current_user_dict = current_user.model_dump()
-    # Преобразуем UserInDB в UserOut, исключив пароль
-    return UserOut(**current_user_dict)
-    
\ No newline at end of file
+    """
+    Получение информации о текущем аутентифицированном пользователе.
+
+    При AUTH_STATELESS_TOKENS ответ строится из claims токена без запроса
+    к БД; fresh=true загружает пользователя из БД со всеми полями.
+    """
+    user = current_user
+    if fresh and not isinstance(current_user, UserInDB):
+        stored_user = await UserService(db).get(current_user.id)
+        if stored_user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        user = stored_user
+    # Преобразуем пользователя в UserOut, исключив пароль
+    return ModelResponse(UserOut(**user.model_dump()))
+
@@ -1,19 +1,28 @@
 from __future__ import annotations
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import String
+from sqlalchemy import String, Integer, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from src.core.base_model import BaseModel
 
 
 class User(BaseModel):
     __tablename__ = "users"
+    __table_args__ = (
+        # Подгрузка отозванных версий токенов; пользователи без отзыва в индекс не попадают
+        Index(
+            "ix_users_revoked_updated_at", "updated_at",
+            postgresql_where=text("token_version > 0")
+        ),
+    )
 
     email: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     password: Mapped[str] = mapped_column(String(255), nullable=False)
     full_name: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     is_active: Mapped[bool] = mapped_column(default=True)
     last_login: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+    # Токены с меньшей версией недействительны; увеличивается при отзыве токенов
+    token_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     
     cards: Mapped[List["Card"]] = relationship("Card", back_populates="user")
 
@@ -1,7 +1,10 @@
-from typing import Optional, List
+from datetime import datetime
+from typing import AsyncIterator, Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, Row
 from .model import User
+from .cache import user_cache
+from .token_versions import token_versions
 from .schemas import UserCreate, UserUpdate
 
 
@@ -74,17 +77,70 @@ class UserRepository:
         Returns:
             Обновленный объект User или None, если пользователь не найден
         """
+        values = user_data.model_dump(exclude_unset=True)
+        if "password" in values:
+            # Смена пароля отзывает выданные токены
+            values["token_version"] = User.token_version + 1
         await self.db.execute(
             update(User)
             .where(User.id == user_id)
-            .values(**user_data.model_dump(exclude_unset=True))
+            .values(**values)
         )
         await self.db.commit()
-        return await self.get_user(user_id)
+        await user_cache.invalidate(user_id)
+        user = await self.get_user(user_id)
+        if user is not None:
+            token_versions.set(user_id, user.token_version)
+        return user
+
+    async def revoke_tokens(self, user_id: int) -> Optional[int]:
+        """
+        Отзывает все выданные пользователю токены, увеличивая token_version.
+
+        Args:
+            user_id: Идентификатор пользователя
+
+        Returns:
+            Новая версия токенов или None, если пользователь не найден
+        """
+        result = await self.db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(token_version=User.token_version + 1, updated_at=datetime.utcnow())
+            .returning(User.token_version)
+        )
+        version = result.scalar_one_or_none()
+        await self.db.commit()
+        await user_cache.invalidate(user_id)
+        if version is not None:
+            token_versions.set(user_id, version)
+        return version
+
+    async def iter_token_versions(self, updated_since: Optional[datetime] = None) -> AsyncIterator[Row]:
+        """
+        Перебирает версии токенов пользователей, отзывавших токены.
+
+        Args:
+            updated_since: Вернуть только пользователей, обновленных начиная с этого момента
+
+        Yields:
+            Строки (id, token_version, updated_at)
+        """
+        query = select(User.id, User.token_version, User.updated_at).where(User.token_version > 0)
+        if updated_since is not None:
+            query = query.where(User.updated_at >= updated_since)
+        result = await self.db.stream(query)
+        async for row in result:
+            yield row
 
     async def delete_user(self, user_id: int) -> bool:
         """
         Удаляет пользователя.
+
+        Удаление мягкое: пользователь деактивируется, а версия его токенов
+        увеличивается вместе с updated_at. Строка остается в таблице, поэтому
+        остальные воркеры видят отзыв токенов через iter_token_versions при
+        ближайшем обновлении версий, в том числе для stateless токенов.
         
         Args:
             user_id: Идентификатор пользователя
@@ -92,8 +148,17 @@ class UserRepository:
         Returns:
             Всегда True (для сохранения обратной совместимости)
         """
-        await self.db.execute(delete(User).where(User.id == user_id))
+        result = await self.db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(is_active=False, token_version=User.token_version + 1, updated_at=datetime.utcnow())
+            .returning(User.token_version)
+        )
+        version = result.scalar_one_or_none()
         await self.db.commit()
+        await user_cache.invalidate(user_id)
+        if version is not None:
+            token_versions.set(user_id, version)
         return True
 
     async def get_all_users(self) -> List[User]:
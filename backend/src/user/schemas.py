@@ -18,9 +18,19 @@ class UserUpdate(BaseModel):
     password: Optional[str] = Field(None, min_length=8, max_length=255)
 
 
-class UserInDB(UserBase):
+class CurrentUser(UserBase):
+    """
+    Аутентифицированный пользователь.
+
+    При AUTH_STATELESS_TOKENS строится из claims access токена без запроса
+    к БД, иначе это UserInDB из кэша или БД.
+    """
     id: int
     is_active: bool
+    token_version: int = 0
+
+
+class UserInDB(CurrentUser):
     last_login: Optional[datetime]
     created_at: datetime
     updated_at: datetime
@@ -34,6 +44,7 @@ class UserInDB(UserBase):
                 "full_name": "John Doe",
                 "id": 1,
                 "is_active": True,
+                "token_version": 0,
                 "created_at": "2023-01-01T00:00:00",
                 "updated_at": "2023-01-01T00:00:00",
                 "password": "hashed_password_string"
@@ -44,9 +55,10 @@ class UserInDB(UserBase):
 class UserOut(UserBase):
     id: int
     is_active: bool
-    last_login: Optional[datetime]
-    created_at: datetime
-    updated_at: datetime
+    # Не заполняются, если пользователь взят из claims токена (AUTH_STATELESS_TOKENS)
+    last_login: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -1,9 +1,12 @@
+from datetime import timedelta
 from typing import Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.core.base_service import BaseService
+from src.core.config import settings
 from .repository import UserRepository
 from .schemas import UserInDB, UserCreate
 from .model import User
+from .token_versions import token_versions
 
 class UserService(BaseService[UserInDB, UserCreate]):
     def __init__(self, db: AsyncSession):
@@ -27,4 +30,28 @@ class UserService(BaseService[UserInDB, UserCreate]):
         return UserInDB.model_validate(user) if user else None
 
     async def delete(self, id: int) -> bool:
-        return await self.repository.delete_user(id)
\ No newline at end of file
+        return await self.repository.delete_user(id)
+
+    async def revoke_tokens(self, id: int) -> Optional[int]:
+        """Отзывает все токены пользователя; возвращает новую версию или None"""
+        return await self.repository.revoke_tokens(id)
+
+    async def refresh_token_versions(self) -> None:
+        """
+        Подгружает в память версии токенов, отозванных после предыдущего обновления.
+
+        При первом вызове загружаются все пользователи с token_version > 0,
+        далее только обновленные начиная с последнего увиденного updated_at.
+        Запрос захватывает еще TOKEN_VERSION_REFRESH_SECONDS до него: строка,
+        закоммиченная позже строки с большим updated_at, иначе была бы
+        пропущена навсегда. Повторно прочитанные версии ничего не меняют.
+        """
+        watermark = token_versions.watermark
+        updated_since = None
+        if watermark is not None:
+            updated_since = watermark - timedelta(seconds=settings.TOKEN_VERSION_REFRESH_SECONDS)
+        async for row in self.repository.iter_token_versions(updated_since=updated_since):
+            token_versions.set(row.id, row.token_version)
+            if watermark is None or row.updated_at > watermark:
+                watermark = row.updated_at
+        token_versions.mark_refreshed(watermark)
@@ -0,0 +1,44 @@
+from datetime import datetime
+from typing import Optional
+import time
+
+
+class TokenVersionRegistry:
+    """
+    Минимальные действующие версии токенов пользователей в памяти процесса.
+
+    Хранятся только пользователи, которые отзывали токены (token_version > 0),
+    поэтому набор небольшой. Отзыв в текущем воркере виден сразу, отзывы
+    в других воркерах подгружаются из БД по updated_at не чаще раза
+    в TOKEN_VERSION_REFRESH_SECONDS.
+    """
+    def __init__(self) -> None:
+        self._versions: dict[int, int] = {}
+        self.watermark: Optional[datetime] = None
+        self.refreshed_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def get(self, user_id: int) -> int:
+        """Текущая версия токенов пользователя (0, если токены не отзывались)"""
+        return self._versions.get(user_id, 0)
+
+    def set(self, user_id: int, version: int) -> None:
+        # Версии только растут: устаревшая строка из БД не отменяет локальный отзыв
+        if version > self._versions.get(user_id, 0):
+            self._versions[user_id] = version
+
+    def is_current(self, user_id: int, version: int) -> bool:
+        """Проверяет, что токен с версией version не отозван"""
+        return version >= self._versions.get(user_id, 0)
+
+    def is_stale(self, max_age: float) -> bool:
+        return self.refreshed_at is None or time.monotonic() - self.refreshed_at > max_age
+
+    def mark_refreshed(self, watermark: Optional[datetime]) -> None:
+        self.refreshed_at = time.monotonic()
+        self.watermark = watermark
+
+
+token_versions = TokenVersionRegistry()
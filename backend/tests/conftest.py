@@ -0,0 +1,54 @@
+import os
+import tempfile
+
+# Настройки читаются при импорте src, поэтому окружение задается до него
+_workdir = tempfile.mkdtemp(prefix="cv-project-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(_workdir, 'app.db')}")
+os.environ.setdefault("PHOTO_FOLDER_FULL_NAME", os.path.join(_workdir, "photos"))
+os.environ.setdefault("ARCHIVE_CACHE_DIR", os.path.join(_workdir, "archive_cache"))
+os.environ.setdefault("EMBEDDING_INDEX_DIR", os.path.join(_workdir, "embeddings"))
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from src.core.base_model import Base
+from src.user.model import User
+from src.cards.model import Card, PhotoBlob
+from src.jobs.model import Job
+
+
+def _compare_bytes(a: str, b: str) -> int:
+    a_bytes, b_bytes = a.encode(), b.encode()
+    return (a_bytes > b_bytes) - (a_bytes < b_bytes)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    """Фабрика сессий к пустой SQLite базе со всеми таблицами"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _register_c_collation(dbapi_connection, connection_record):
+        # Побайтовое сравнение, как COLLATE "C" в PostgreSQL; функция регистрируется в потоке aiosqlite
+        connection = dbapi_connection._connection
+        dbapi_connection.await_(connection._execute(connection._conn.create_collation, "C", _compare_bytes))
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(bind=engine, expire_on_commit=False, autoflush=False)
+    await engine.dispose()
+
+
+
+@pytest.fixture
+async def user_id(session_factory) -> int:
+    async with session_factory() as db:
+        user = User(email="owner@example.com", password="hash")
+        db.add(user)
+        await db.commit()
+        return user.id
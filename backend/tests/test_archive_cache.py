@@ -0,0 +1,47 @@
+import os
+import time
+import pytest
+from src.cards.archive_cache import ArchiveCache, iter_file
+from src.core.config import settings
+
+pytestmark = pytest.mark.anyio
+
+FINGERPRINT = "f" * 64
+
+
+async def _cache_archive(cache: ArchiveCache, user_id: int, data: bytes) -> None:
+    async def chunks():
+        yield data
+
+    assert b"".join([chunk async for chunk in cache.tee(user_id, FINGERPRINT, chunks())]) == data
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArchiveCache(str(tmp_path), max_bytes=1024)
+
+
+async def test_open_archive_is_read_after_eviction(cache):
+    await _cache_archive(cache, 1, b"a" * 1000)
+    file_obj = cache.open(1, FINGERPRINT)
+
+    # Архив вытеснили после открытия, но до отправки ответа
+    await _cache_archive(cache, 2, b"b" * 1000)
+    cache.invalidate(1)
+
+    assert cache.open(1, FINGERPRINT) is None
+    assert b"".join([chunk async for chunk in iter_file(file_obj, chunk_size=300)]) == b"a" * 1000
+    assert file_obj.closed
+
+
+async def test_evict_removes_stale_temp_files(cache, tmp_path):
+    stale = tmp_path / "abandoned.part"
+    stale.write_bytes(b"partial")
+    old = time.time() - settings.ARCHIVE_CACHE_PART_TTL_SECONDS - 1
+    os.utime(stale, (old, old))
+    # Архив, который сейчас записывается в другом запросе
+    (tmp_path / "in_progress.part").write_bytes(b"partial")
+
+    cache.evict()
+
+    assert sorted(os.listdir(tmp_path)) == ["in_progress.part"]
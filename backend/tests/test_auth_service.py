@@ -0,0 +1,94 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+from src.auth.service import AuthService, _token_claims
+from src.auth.utils import create_access_token
+from src.core.config import settings
+from src.user.cache import InMemoryUserCacheBackend, user_cache
+from src.user.model import User
+from src.user.repository import UserRepository
+from src.user.schemas import UserInDB
+from src.user.token_versions import token_versions
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def fresh_auth_state(monkeypatch):
+    """Кэш пользователей и версии токенов — состояние процесса, у каждого теста свое"""
+    monkeypatch.setattr(user_cache, "backend", InMemoryUserCacheBackend(max_size=100))
+    monkeypatch.setattr(token_versions, "_versions", {})
+    monkeypatch.setattr(token_versions, "watermark", None)
+    monkeypatch.setattr(token_versions, "refreshed_at", None)
+
+
+async def _access_token(session_factory, user_id: int) -> str:
+    async with session_factory() as db:
+        user = UserInDB.model_validate(await db.get(User, user_id))
+    return create_access_token(_token_claims(user))
+
+
+async def test_user_is_cached_after_database_lookup(session_factory, user_id):
+    token = await _access_token(session_factory, user_id)
+    async with session_factory() as db:
+        await AuthService(db).get_current_user(token)
+
+    assert (await user_cache.get(user_id)).id == user_id
+
+
+async def test_cache_hit_rejects_token_revoked_in_another_worker(session_factory, user_id):
+    token = await _access_token(session_factory, user_id)
+    async with session_factory() as db:
+        await AuthService(db).get_current_user(token)
+
+    # Другой воркер отозвал токены: кэш этого воркера об этом не знает
+    async with session_factory() as db:
+        await db.execute(update(User).where(User.id == user_id).values(token_version=User.token_version + 1))
+        await db.commit()
+    token_versions.refreshed_at = None
+
+    async with session_factory() as db:
+        with pytest.raises(HTTPException) as error:
+            await AuthService(db).get_current_user(token)
+    assert error.value.status_code == 401
+    assert (await user_cache.get(user_id)).token_version == 1
+
+
+async def _delete_in_another_worker(session_factory, user_id: int, monkeypatch) -> None:
+    """Удаляет пользователя так, как это видит воркер, не обрабатывавший удаление"""
+    cached = await user_cache.get(user_id)
+    async with session_factory() as db:
+        await UserRepository(db).delete_user(user_id)
+    if cached is not None:
+        await user_cache.set(cached)
+    monkeypatch.setattr(token_versions, "_versions", {})
+    token_versions.refreshed_at = None
+
+
+async def test_cache_hit_rejects_token_of_user_deleted_in_another_worker(session_factory, user_id, monkeypatch):
+    token = await _access_token(session_factory, user_id)
+    async with session_factory() as db:
+        await AuthService(db).get_current_user(token)
+
+    await _delete_in_another_worker(session_factory, user_id, monkeypatch)
+
+    async with session_factory() as db:
+        with pytest.raises(HTTPException) as error:
+            await AuthService(db).get_current_user(token)
+    assert error.value.status_code == 401
+
+
+async def test_stateless_token_of_user_deleted_in_another_worker_is_rejected(session_factory, user_id, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_STATELESS_TOKENS", True)
+    token = await _access_token(session_factory, user_id)
+    async with session_factory() as db:
+        assert (await AuthService(db).get_current_user(token)).id == user_id
+
+    await _delete_in_another_worker(session_factory, user_id, monkeypatch)
+
+    async with session_factory() as db:
+        with pytest.raises(HTTPException) as error:
+            await AuthService(db).get_current_user(token)
+    assert error.value.status_code == 401
+    async with session_factory() as db:
+        assert not (await db.get(User, user_id)).is_active
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+from src.cards.model import Card
+from src.cards.repository import CardRepository
+from src.cards.schemas import CardCreate
+from src.cards.service import CardService
+
+pytestmark = pytest.mark.anyio
+
+CREATED_AT = datetime(2026, 1, 1, 12, 0, 0)
+
+
+async def _create_cards(session_factory, user_id: int, created_at: list[datetime]) -> list[int]:
+    """Создает карточки с заданным временем создания; совпадающее время дает связи в сортировке"""
+    async with session_factory() as db:
+        repository = CardRepository(db)
+        card_ids = []
+        for number, moment in enumerate(created_at):
+            content_hash = f"{number:064x}"
+            card = await repository.create_card(CardCreate(
+                title=f"card {number}",
+                price=number + 1,
+                user_id=user_id,
+                photo_path=f"00/00/{content_hash}.jpg",
+                content_hash=content_hash
+            ))
+            await db.execute(update(Card).where(Card.id == card.id).values(created_at=moment))
+            card_ids.append(card.id)
+        await db.commit()
+        return card_ids
+
+
+async def _list_all(session_factory, user_id: int, limit: int, **filters) -> list[list[int]]:
+    pages = []
+    cursor = None
+    while True:
+        # Каждая страница запрашивается в своей сессии, как отдельные HTTP запросы
+        async with session_factory() as db:
+            page = await CardService(db).list_user_cards(user_id, limit, cursor=cursor, **filters)
+        pages.append([card.id for card in page.items])
+        cursor = page.next_cursor
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 8])
+async def test_pages_cover_cards_with_equal_created_at_once(session_factory, user_id, limit):
+    later = CREATED_AT + timedelta(seconds=1)
+    created_at = [CREATED_AT, later, CREATED_AT, later, CREATED_AT, later, CREATED_AT + timedelta(seconds=2)]
+    card_ids = await _create_cards(session_factory, user_id, created_at)
+
+    pages = await _list_all(session_factory, user_id, limit)
+
+    expected = [card_id for _, card_id in sorted(zip(created_at, card_ids), reverse=True)]
+    assert [card_id for page in pages for card_id in page] == expected
+    assert all(len(page) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+
+
+async def test_cursor_keeps_position_when_tied_cards_are_added(session_factory, user_id):
+    card_ids = await _create_cards(session_factory, user_id, [CREATED_AT] * 4)
+    async with session_factory() as db:
+        first = await CardService(db).list_user_cards(user_id, 2)
+
+    # Новая карточка с тем же временем получает больший id и должна попасть до курсора
+    [new_id] = await _create_cards(session_factory, user_id, [CREATED_AT])
+    async with session_factory() as db:
+        second = await CardService(db).list_user_cards(user_id, 10, cursor=first.next_cursor)
+
+    assert [card.id for card in first.items] == [card_ids[3], card_ids[2]]
+    assert [card.id for card in second.items] == [card_ids[1], card_ids[0]]
+    assert new_id not in [card.id for card in second.items]
+    assert second.next_cursor is None
+
+
+async def test_pages_with_filter(session_factory, user_id):
+    card_ids = await _create_cards(session_factory, user_id, [CREATED_AT] * 6)
+
+    pages = await _list_all(session_factory, user_id, 2, min_price=3)
+
+    assert pages == [[card_ids[5], card_ids[4]], [card_ids[3], card_ids[2]]]
+
+
+async def test_invalid_cursor_is_rejected(session_factory, user_id):
+    async with session_factory() as db:
+        with pytest.raises(HTTPException) as error:
+            await CardService(db).list_user_cards(user_id, 2, cursor="not a cursor")
+
+    assert error.value.status_code == 400
@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import select
+from src.cards.model import PhotoBlob
+from src.cards.repository import CardRepository
+from src.cards.schemas import CardCreate
+from src.core.storage import photo_storage
+
+pytestmark = pytest.mark.anyio
+
+CONTENT_HASH = "ab" * 32
+PHOTO_KEY = f"ab/ab/{CONTENT_HASH}.jpg"
+VARIANT_KEY = f"ab/ab/{CONTENT_HASH}.thumb.jpg"
+
+
+async def _create_cards(session_factory, user_id: int, count: int) -> list[int]:
+    await photo_storage.put(PHOTO_KEY, b"photo")
+    await photo_storage.put(VARIANT_KEY, b"thumb")
+    async with session_factory() as db:
+        card = CardCreate(title="card", price=1, user_id=user_id, photo_path=PHOTO_KEY, content_hash=CONTENT_HASH)
+        cards = await CardRepository(db).create_cards([(card, 5)] * count)
+        return [card.id for card in cards]
+
+
+async def _blob(session_factory):
+    async with session_factory() as db:
+        return (await db.execute(select(PhotoBlob))).scalar_one_or_none()
+
+
+async def test_delete_last_card_removes_blob_and_files(session_factory, user_id):
+    [card_id] = await _create_cards(session_factory, user_id, 1)
+
+    async with session_factory() as db:
+        assert await CardRepository(db).delete_card(card_id)
+
+    assert await _blob(session_factory) is None
+    assert not await photo_storage.exists(PHOTO_KEY)
+    assert not await photo_storage.exists(VARIANT_KEY)
+
+
+async def test_delete_keeps_blob_shared_with_another_card(session_factory, user_id):
+    first, _ = await _create_cards(session_factory, user_id, 2)
+
+    async with session_factory() as db:
+        assert await CardRepository(db).delete_card(first)
+
+    assert (await _blob(session_factory)).ref_count == 1
+    assert await photo_storage.exists(PHOTO_KEY)
+
+
+async def test_failed_commit_keeps_photo_files(session_factory, user_id, monkeypatch):
+    [card_id] = await _create_cards(session_factory, user_id, 1)
+
+    async with session_factory() as db:
+        async def broken_commit():
+            raise ConnectionError("connection dropped")
+
+        monkeypatch.setattr(db, "commit", broken_commit)
+        with pytest.raises(ConnectionError):
+            await CardRepository(db).delete_card(card_id)
+        await db.rollback()
+
+    assert (await _blob(session_factory)).ref_count == 1
+    assert await photo_storage.exists(PHOTO_KEY)
+    assert await photo_storage.exists(VARIANT_KEY)
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import update
+from src.jobs.model import Job, JOB_FAILED, JOB_PENDING, JOB_RUNNING, JOB_SUCCEEDED
+from src.jobs.repository import JobRepository
+
+pytestmark = pytest.mark.anyio
+
+
+async def _create(session_factory, max_attempts: int = 3, **values) -> int:
+    async with session_factory() as db:
+        job = await JobRepository(db).create_job("process_photo", {"card_id": 1}, max_attempts=max_attempts)
+        if values:
+            await db.execute(update(Job).where(Job.id == job.id).values(**values))
+            await db.commit()
+        return job.id
+
+
+async def _claim(session_factory) -> list[Job]:
+    # Как воркер очереди: каждый захват в своей сессии
+    async with session_factory() as db:
+        return await JobRepository(db).claim_jobs(10, lease_seconds=60)
+
+
+async def _get(session_factory, job_id: int) -> Job:
+    async with session_factory() as db:
+        return await JobRepository(db).get_job(job_id)
+
+
+async def _expire_lease(session_factory, job_id: int) -> None:
+    async with session_factory() as db:
+        await db.execute(
+            update(Job).where(Job.id == job_id).values(locked_at=datetime.utcnow() - timedelta(hours=1))
+        )
+        await db.commit()
+
+
+async def test_claim_takes_ready_job_and_counts_attempt(session_factory):
+    job_id = await _create(session_factory)
+
+    claimed = await _claim(session_factory)
+
+    assert [(job.id, job.status, job.attempts) for job in claimed] == [(job_id, JOB_RUNNING, 1)]
+    assert await _claim(session_factory) == []
+
+
+async def test_claim_skips_jobs_scheduled_in_future(session_factory):
+    await _create(session_factory, run_at=datetime.utcnow() + timedelta(hours=1))
+
+    assert await _claim(session_factory) == []
+
+
+async def test_expired_lease_is_reclaimed_and_stale_attempt_is_fenced(session_factory):
+    job_id = await _create(session_factory)
+    [first] = await _claim(session_factory)
+    await _expire_lease(session_factory, job_id)
+
+    [second] = await _claim(session_factory)
+
+    assert (first.attempts, second.attempts) == (1, 2)
+    async with session_factory() as db:
+        repo = JobRepository(db)
+        # Воркер первой попытки потерял аренду: ни продление, ни результат не проходят
+        assert not await repo.renew_lease(job_id, first.attempts)
+        assert not await repo.complete_job(job_id, first.attempts)
+        assert await repo.renew_lease(job_id, second.attempts)
+        assert await repo.complete_job(job_id, second.attempts)
+    assert (await _get(session_factory, job_id)).status == JOB_SUCCEEDED
+
+
+async def test_expired_job_without_attempts_left_is_failed_not_reclaimed(session_factory):
+    job_id = await _create(session_factory, max_attempts=1)
+    await _claim(session_factory)
+    await _expire_lease(session_factory, job_id)
+
+    assert await _claim(session_factory) == []
+
+    job = await _get(session_factory, job_id)
+    assert (job.status, job.attempts, job.locked_at) == (JOB_FAILED, 1, None)
+    assert job.finished_at is not None
+
+
+async def test_failed_attempt_returns_job_to_queue_until_retry_at(session_factory):
+    job_id = await _create(session_factory)
+    [claimed] = await _claim(session_factory)
+
+    async with session_factory() as db:
+        retry_at = datetime.utcnow() + timedelta(hours=1)
+        assert await JobRepository(db).fail_job(job_id, claimed.attempts, "boom", retry_at)
+
+    job = await _get(session_factory, job_id)
+    assert (job.status, job.last_error) == (JOB_PENDING, "boom")
+    assert await _claim(session_factory) == []
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+import json
+import jwt
+import pytest
+from src.auth import utils
+from src.auth.keyring import SigningKeyring
+from src.core.config import settings
+
+SECRET_KEY = "static-secret"
+
+
+def _legacy_token(secret: str = SECRET_KEY, token_type: str = "access") -> str:
+    """Токен без заголовка kid, как до появления файла ключей"""
+    payload = {"sub": "1", "type": token_type, "exp": datetime.utcnow() + timedelta(minutes=5)}
+    return jwt.encode(payload, secret, algorithm=settings.ALGORITHM)
+
+
+@pytest.fixture
+def keys_file(tmp_path):
+    path = tmp_path / "keys.json"
+    path.write_text(json.dumps({"active_kid": "2026-10", "keys": {"2026-10": "rotated-secret"}}))
+    return str(path)
+
+
+@pytest.fixture
+def use_keyring(monkeypatch):
+    def use(keyring: SigningKeyring) -> SigningKeyring:
+        monkeypatch.setattr(utils, "signing_keyring", keyring)
+        return keyring
+    return use
+
+
+def test_legacy_token_accepted_without_keys_file(use_keyring):
+    use_keyring(SigningKeyring(SECRET_KEY))
+
+    assert utils.decode_token(_legacy_token())["sub"] == "1"
+
+
+@pytest.mark.parametrize("token_type", ["access", "refresh"])
+def test_legacy_token_rejected_once_keys_file_is_loaded(use_keyring, keys_file, token_type):
+    use_keyring(SigningKeyring(SECRET_KEY, keys_file=keys_file))
+
+    with pytest.raises(jwt.InvalidTokenError):
+        utils.decode_token(_legacy_token(token_type=token_type), token_type=token_type)
+
+
+def test_legacy_token_accepted_until_deadline(use_keyring, keys_file):
+    deadline = datetime.now(timezone.utc) + timedelta(hours=1)
+    use_keyring(SigningKeyring(SECRET_KEY, keys_file=keys_file, legacy_until=deadline))
+    assert utils.decode_token(_legacy_token())["sub"] == "1"
+
+    # Время без пояса считается UTC
+    expired = datetime.utcnow() - timedelta(seconds=1)
+    use_keyring(SigningKeyring(SECRET_KEY, keys_file=keys_file, legacy_until=expired))
+    with pytest.raises(jwt.InvalidTokenError):
+        utils.decode_token(_legacy_token())
+
+
+def test_tokens_signed_by_keys_file_are_accepted(use_keyring, keys_file):
+    use_keyring(SigningKeyring(SECRET_KEY, keys_file=keys_file))
+
+    token = utils.create_access_token({"sub": "1"})
+
+    assert jwt.get_unverified_header(token)["kid"] == "2026-10"
+    assert utils.decode_token(token)["sub"] == "1"
+    with pytest.raises(jwt.InvalidTokenError):
+        utils.decode_token(_legacy_token(secret="rotated-secret"))
@@ -0,0 +1,50 @@
+import os
+import time
+from src.core.metrics import MetricsRegistry, MultiprocessMetrics
+
+
+def _worker(directory: str, pid: str, requests: int, checked_out: int) -> MultiprocessMetrics:
+    """Реестр и снимки одного воркера; все воркеры теста живут в одном процессе, поэтому pid задается явно"""
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests", ["route"]).inc(requests, route="/a")
+    registry.histogram("request_seconds", "Latency", buckets=[0.1, 1]).observe(0.05 * requests)
+    registry.gauge("pool_checked_out", "Pool").set(checked_out)
+    metrics = MultiprocessMetrics(registry, directory, flush_seconds=5)
+    metrics._file_name = f"{pid}-test.json"
+    metrics.write()
+    return metrics
+
+
+def test_scrape_merges_snapshots_of_all_workers(tmp_path):
+    first = _worker(str(tmp_path), "101", requests=1, checked_out=2)
+    _worker(str(tmp_path), "102", requests=3, checked_out=5)
+
+    lines = first.render().splitlines()
+
+    assert 'requests_total{route="/a"} 4.0' in lines
+    assert 'request_seconds_bucket{le="0.1"} 1' in lines
+    assert 'request_seconds_bucket{le="1.0"} 2' in lines
+    assert "request_seconds_count 2" in lines
+    assert 'pool_checked_out{pid="101"} 2.0' in lines
+    assert 'pool_checked_out{pid="102"} 5.0' in lines
+
+
+def test_stopped_worker_keeps_counters_but_not_gauges(tmp_path):
+    first = _worker(str(tmp_path), "101", requests=1, checked_out=2)
+    _worker(str(tmp_path), "102", requests=3, checked_out=5)
+    old = time.time() - 60
+    os.utime(tmp_path / "102-test.json", (old, old))
+
+    lines = first.render().splitlines()
+
+    assert 'requests_total{route="/a"} 4.0' in lines
+    assert 'pool_checked_out{pid="101"} 2.0' in lines
+    assert not any(line.startswith('pool_checked_out{pid="102"}') for line in lines)
+
+
+def test_clear_removes_previous_snapshots(tmp_path):
+    metrics = _worker(str(tmp_path), "101", requests=1, checked_out=2)
+
+    metrics.clear()
+
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,61 @@
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.core.db_session import current_read_routing
+from src.core.middleware import PrimaryPinMiddleware
+
+PIN_SECONDS = 5
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(PrimaryPinMiddleware, pin_seconds=PIN_SECONDS)
+
+    @app.get("/read")
+    async def read():
+        return {"pinned": current_read_routing.get().pinned}
+
+    @app.post("/write")
+    async def write():
+        # Так отмечает запись обработчик событий движка БД
+        current_read_routing.get().wrote = True
+        return {}
+
+    return TestClient(app)
+
+
+def test_read_without_write_is_not_pinned(client):
+    response = client.get("/read")
+
+    assert response.json() == {"pinned": False}
+    assert "x-db-primary-until" not in response.headers
+    assert "set-cookie" not in response.headers
+
+
+def test_write_pins_by_cookie(client):
+    response = client.post("/write")
+
+    assert response.headers["x-db-primary-until"].isdigit()
+    assert "db_primary_until" in response.headers["set-cookie"]
+    assert client.get("/read").json() == {"pinned": True}
+
+
+def test_write_pins_by_echoed_header(client):
+    pinned_until = client.post("/write").headers["x-db-primary-until"]
+    client.cookies.clear()
+
+    assert client.get("/read").json() == {"pinned": False}
+    assert client.get("/read", headers={"X-DB-Primary-Until": pinned_until}).json() == {"pinned": True}
+
+
+@pytest.mark.parametrize("offset", [-1, PIN_SECONDS + 60])
+def test_expired_or_too_distant_header_is_ignored(client, offset):
+    pinned_until = str(int(time.time()) + offset)
+
+    assert client.get("/read", headers={"X-DB-Primary-Until": pinned_until}).json() == {"pinned": False}
+
+
+def test_malformed_header_is_ignored(client):
+    assert client.get("/read", headers={"X-DB-Primary-Until": "soon"}).json() == {"pinned": False}
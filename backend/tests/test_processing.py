@@ -0,0 +1,42 @@
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from src.cards.processing import compute_photo_embedding, process_photo
+from src.core.config import settings
+
+
+@pytest.fixture(scope="module")
+def photo() -> bytes:
+    # Шумное изображение заметно меняется при декодировании в другом масштабе
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, size=(900, 1200, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def specs() -> dict[str, dict]:
+    return {name: spec.model_dump() for name, spec in settings.PHOTO_VARIANTS.items()}
+
+
+def test_reprocessing_with_existing_variants_gives_same_analysis(photo, specs):
+    first = process_photo(photo, specs)
+    # Повторная загрузка того же фото: все варианты уже в хранилище
+    duplicate = process_photo(photo, specs, pending=[])
+
+    assert duplicate["variants"] == {}
+    assert set(first["variants"]) == set(specs)
+    assert duplicate["phash"] == first["phash"]
+    assert duplicate["dominant_color"] == first["dominant_color"]
+    np.testing.assert_array_equal(duplicate["embedding"], first["embedding"])
+    np.testing.assert_array_equal(compute_photo_embedding(photo, specs), first["embedding"])
+
+
+def test_only_pending_variants_are_rendered(photo, specs):
+    name = next(iter(specs))
+
+    outcome = process_photo(photo, specs, pending=[name])
+
+    assert list(outcome["variants"]) == [name]
@@ -0,0 +1,134 @@
+import pytest
+from src.cards import reconcile_storage as reconcile
+from src.cards.model import PhotoBlob
+from src.cards.repository import CardRepository
+from src.cards.schemas import CardCreate
+from src.core.storage.local import LocalPhotoStorage
+
+pytestmark = pytest.mark.anyio
+
+
+def _key(digit: str, name: str = "jpg") -> str:
+    content_hash = digit * 64
+    return f"{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.{name}"
+
+
+# Карточка с оригиналом и вариантом в хранилище
+REFERENCED = _key("1")
+REFERENCED_VARIANT = _key("1", "thumb.jpg")
+# Потерянные оригинал и его вариант
+ORPHAN = _key("2")
+ORPHAN_VARIANT = _key("2", "thumb.jpg")
+# Карточка, от фото которой остался только вариант
+MISSING_WITH_VARIANT = _key("3")
+MISSING_VARIANT = _key("3", "thumb.jpg")
+# Блоб без ссылок: удаление карточки не успело убрать файл
+UNREFERENCED_BLOB = _key("4", "png")
+# Карточка без файлов
+MISSING = _key("5")
+# Потерянный файл после всех ключей из БД: сливается уже после конца ссылок
+ORPHAN_LAST = _key("a")
+
+
+@pytest.fixture
+async def storage(tmp_path):
+    storage = LocalPhotoStorage(str(tmp_path / "photos"))
+    for key in (
+        REFERENCED, REFERENCED_VARIANT, ORPHAN, ORPHAN_VARIANT, MISSING_VARIANT, UNREFERENCED_BLOB, ORPHAN_LAST
+    ):
+        await storage.put(key, b"photo")
+    await storage.put(f"{reconcile.QUARANTINE_PREFIX}{_key('6')}", b"quarantined")
+    return storage
+
+
+@pytest.fixture
+async def db(session_factory, user_id, monkeypatch):
+    async with session_factory() as db:
+        repository = CardRepository(db)
+        for photo_path in (REFERENCED, MISSING_WITH_VARIANT, MISSING):
+            content_hash = photo_path.rsplit("/", 1)[1].split(".")[0]
+            card = CardCreate(title="card", price=1, user_id=user_id, photo_path=photo_path, content_hash=content_hash)
+            await repository.create_cards([(card, 5)])
+        db.add(PhotoBlob(content_hash="4" * 64, photo_path=UNREFERENCED_BLOB, size=5, ref_count=0))
+        await db.commit()
+
+    # Повторная сверка перед удалением открывает собственную сессию
+    monkeypatch.setattr(reconcile, "AsyncSessionLocal", session_factory)
+    async with session_factory() as db:
+        yield db
+
+
+async def _keys(storage) -> list[str]:
+    return [key async for key in storage.iter_keys()]
+
+
+async def test_report_finds_orphans_and_missing_photos(db, storage):
+    keys = await _keys(storage)
+
+    report = await reconcile.reconcile_storage(db, storage, min_age_seconds=0, batch_size=2)
+
+    assert report.action == "report"
+    assert report.scanned_objects == 7
+    assert report.referenced_photos == 3
+    assert report.orphan_objects == 4
+    assert report.orphan_bytes == 4 * len(b"photo")
+    assert report.missing_photos == 2
+    assert report.missing_sample == [MISSING_WITH_VARIANT, MISSING]
+    assert report.reclaimed == 0
+    assert await _keys(storage) == keys
+
+
+async def test_delete_removes_only_orphans(db, storage):
+    report = await reconcile.reconcile_storage(db, storage, action="delete", min_age_seconds=0, rate=0, batch_size=2)
+
+    assert report.reclaimed == 4
+    assert report.failed == 0
+    assert await _keys(storage) == sorted([
+        REFERENCED, REFERENCED_VARIANT, MISSING_VARIANT, f"{reconcile.QUARANTINE_PREFIX}{_key('6')}"
+    ])
+
+
+async def test_quarantine_moves_orphans(db, storage):
+    report = await reconcile.reconcile_storage(db, storage, action="quarantine", min_age_seconds=0, rate=0)
+
+    assert report.reclaimed == 4
+    keys = await _keys(storage)
+    for key in (ORPHAN, ORPHAN_VARIANT, UNREFERENCED_BLOB, ORPHAN_LAST):
+        assert key not in keys
+        assert f"{reconcile.QUARANTINE_PREFIX}{key}" in keys
+
+
+async def test_recent_orphans_are_kept(db, storage):
+    report = await reconcile.reconcile_storage(db, storage, action="delete", min_age_seconds=3600, rate=0)
+
+    assert report.recent_skipped == 4
+    assert report.orphan_objects == 0
+    assert report.reclaimed == 0
+    assert ORPHAN in await _keys(storage)
+
+
+async def test_orphan_referenced_again_before_reclaim_is_kept(db, storage, session_factory, user_id, monkeypatch):
+    reclaim = reconcile._reclaim
+
+    async def reupload_then_reclaim(*args, **kwargs):
+        # Фото загрузили заново после прохода по БД, и publish_photo переиспользовал файл
+        async with session_factory() as other_db:
+            card = CardCreate(title="card", price=1, user_id=user_id, photo_path=ORPHAN, content_hash="2" * 64)
+            await CardRepository(other_db).create_cards([(card, 5)])
+        await reclaim(*args, **kwargs)
+
+    monkeypatch.setattr(reconcile, "_reclaim", reupload_then_reclaim)
+    report = await reconcile.reconcile_storage(db, storage, action="delete", min_age_seconds=0, rate=0)
+
+    keys = await _keys(storage)
+    assert ORPHAN in keys and ORPHAN_VARIANT in keys
+    assert UNREFERENCED_BLOB not in keys and ORPHAN_LAST not in keys
+    assert report.reclaimed == 2
+
+
+async def test_legacy_absolute_paths_stop_reconciliation(db, storage, user_id):
+    card = CardCreate(title="card", price=1, user_id=user_id, photo_path="/srv/photos/legacy.jpg")
+    await CardRepository(db).create_cards([(card, 5)])
+
+    with pytest.raises(RuntimeError):
+        await reconcile.reconcile_storage(db, storage)
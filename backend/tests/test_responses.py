@@ -0,0 +1,96 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from src.core.responses import file_response
+
+CONTENT = bytes(range(100))
+ETAG = '"abc123"'
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(CONTENT)
+    app = FastAPI()
+
+    @app.get("/photo")
+    async def photo(request: Request):
+        return await file_response(request, str(path), etag="abc123")
+
+    return TestClient(app)
+
+
+def test_full_file_with_etag(client):
+    response = client.get("/photo")
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == ETAG
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+@pytest.mark.parametrize("if_none_match", [ETAG, f"W/{ETAG}", f'"other", {ETAG}', "*"])
+def test_matching_if_none_match_returns_304(client, if_none_match):
+    response = client.get("/photo", headers={"If-None-Match": if_none_match})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == ETAG
+
+
+@pytest.mark.parametrize("range_header, start, end", [
+    ("bytes=10-19", 10, 19),
+    ("bytes=90-", 90, 99),
+    ("bytes=95-200", 95, 99),
+    ("bytes=-5", 95, 99),
+    ("bytes=-500", 0, 99),
+])
+def test_range_returns_206(client, range_header, start, end):
+    response = client.get("/photo", headers={"Range": range_header})
+
+    assert response.status_code == 206
+    assert response.content == CONTENT[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/100"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+@pytest.mark.parametrize("range_header", ["bytes=100-", "bytes=150-200", "bytes=-0"])
+def test_unsatisfiable_range_returns_416(client, range_header):
+    response = client.get("/photo", headers={"Range": range_header})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */100"
+
+
+@pytest.mark.parametrize("range_header", [
+    "bytes=5-3", "bytes=abc", "bytes=-", "bytes=+1-2", "bytes=0-1,5-6", "items=0-1",
+])
+def test_invalid_or_unsupported_range_is_ignored(client, range_header):
+    response = client.get("/photo", headers={"Range": range_header})
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_if_range_with_current_etag_applies_range(client):
+    response = client.get("/photo", headers={"Range": "bytes=0-9", "If-Range": ETAG})
+
+    assert response.status_code == 206
+    assert response.content == CONTENT[:10]
+
+
+def test_if_range_with_stale_etag_returns_full_file(client):
+    response = client.get("/photo", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_missing_file_returns_404(tmp_path):
+    app = FastAPI()
+
+    @app.get("/photo")
+    async def photo(request: Request):
+        return await file_response(request, str(tmp_path / "missing.jpg"))
+
+    assert TestClient(app).get("/photo").status_code == 404
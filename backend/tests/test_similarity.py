@@ -0,0 +1,141 @@
+import random
+import pytest
+from PIL import Image
+from sqlalchemy import update
+from src.cards import service
+from src.cards.model import Card
+from src.cards.repository import CardRepository
+from src.cards.schemas import CardCreate
+from src.cards.service import CardService
+from src.cards.similarity import PhotoHashIndex, dhash, hamming_distance, to_signed, to_unsigned
+from src.user.model import User
+
+
+def flip(value: int, *bits: int) -> int:
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+BASE = 0x0123456789ABCDEF
+
+
+@pytest.fixture
+def index():
+    index = PhotoHashIndex()
+    index.add(1, BASE)
+    index.add(2, flip(BASE, 0))
+    index.add(3, flip(BASE, 0, 1, 2))
+    index.add(4, flip(BASE, *range(10)))
+    return index
+
+
+def test_search_returns_cards_within_radius_sorted_by_distance(index):
+    assert index.search(BASE, 0) == [(1, 0)]
+    assert index.search(BASE, 3) == [(1, 0), (2, 1), (3, 3)]
+    assert index.search(flip(BASE, 0), 2) == [(2, 0), (1, 1), (3, 2)]
+
+
+def test_search_in_empty_index():
+    assert PhotoHashIndex().search(BASE, 64) == []
+
+
+def test_cards_with_equal_hash_share_a_node(index):
+    index.add(5, BASE)
+
+    assert index.search(BASE, 0) == [(1, 0), (5, 0)]
+    assert len(index) == 5
+
+
+def test_remove_hides_card_from_search(index):
+    index.remove(2)
+    index.remove(42)
+
+    assert index.get(2) is None
+    assert index.search(BASE, 3) == [(1, 0), (3, 3)]
+    # Узел удаленной карточки остается в дереве, и поиск проходит через него к потомкам
+    assert index.search(flip(BASE, 0), 9) == [(1, 1), (3, 2), (4, 9)]
+
+
+def test_add_updates_hash_of_existing_card(index):
+    index.add(2, flip(BASE, *range(10)))
+
+    assert index.get(2) == flip(BASE, *range(10))
+    assert index.search(BASE, 3) == [(1, 0), (3, 3)]
+    assert index.search(flip(BASE, *range(10)), 0) == [(2, 0), (4, 0)]
+
+
+def test_search_matches_linear_scan():
+    rng = random.Random(0)
+    hashes = {card_id: rng.getrandbits(64) for card_id in range(1, 301)}
+    # Кластеры близких хэшей, чтобы поиск находил больше одной карточки
+    for card_id in range(301, 401):
+        hashes[card_id] = flip(hashes[card_id - 300], *rng.sample(range(64), rng.randint(0, 6)))
+    index = PhotoHashIndex()
+    index.add_many(hashes.items())
+    for card_id in range(1, 401, 7):
+        index.remove(card_id)
+        del hashes[card_id]
+
+    for _ in range(50):
+        query = rng.choice(list(hashes.values()))
+        for max_distance in (0, 4, 12):
+            expected = sorted(
+                ((card_id, hamming_distance(query, value)) for card_id, value in hashes.items()
+                 if hamming_distance(query, value) <= max_distance),
+                key=lambda match: (match[1], match[0])
+            )
+            assert index.search(query, max_distance) == expected
+
+
+def test_signed_round_trip():
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        signed = to_signed(value)
+        assert -(1 << 63) <= signed < 1 << 63
+        assert to_unsigned(signed) == value
+
+
+def test_dhash_is_stable_under_resize():
+    image = Image.linear_gradient("L").rotate(30).convert("RGB")
+
+    assert hamming_distance(dhash(image), dhash(image.resize((64, 64)))) <= 4
+
+
+async def _create_card(session_factory, user_id: int, number: int, phash: int) -> int:
+    async with session_factory() as db:
+        content_hash = f"{number:064x}"
+        card = await CardRepository(db).create_card(CardCreate(
+            title=f"card {number}",
+            price=number + 1,
+            user_id=user_id,
+            photo_path=f"00/00/{content_hash}.jpg",
+            content_hash=content_hash
+        ))
+        await db.execute(update(Card).where(Card.id == card.id).values(phash=to_signed(phash)))
+        await db.commit()
+        return card.id
+
+
+@pytest.mark.anyio
+async def test_find_similar_fills_limit_with_own_cards(session_factory, user_id, monkeypatch):
+    monkeypatch.setattr(service, "similarity_index", PhotoHashIndex())
+    async with session_factory() as db:
+        other = User(email="other@example.com", password="hash")
+        db.add(other)
+        await db.commit()
+
+    query_id = await _create_card(session_factory, user_id, 0, BASE)
+    # Ближайшие совпадения — чужие карточки и карточка, удаленная в другом воркере
+    foreign = [await _create_card(session_factory, other.id, number, flip(BASE, 0)) for number in (1, 2, 3)]
+    deleted = await _create_card(session_factory, user_id, 4, flip(BASE, 1))
+    own = [await _create_card(session_factory, user_id, number, flip(BASE, 0, number)) for number in (5, 6, 7)]
+    async with session_factory() as db:
+        await CardService(db).refresh_similarity_index()
+    async with session_factory() as db:
+        await CardRepository(db).delete_card(deleted)
+
+    async with session_factory() as db:
+        similar = await CardService(db).find_similar(query_id, user_id, max_distance=4, limit=2)
+
+    assert [(match.card.id, match.distance) for match in similar] == [(own[0], 2), (own[1], 2)]
+    assert not {match.card.id for match in similar} & set(foreign)
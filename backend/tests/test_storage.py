@@ -0,0 +1,166 @@
+import os
+import threading
+import pytest
+from src.core.storage import local
+from src.core.storage.local import LocalPhotoStorage
+
+pytestmark = pytest.mark.anyio
+
+PART_SIZE = 5 * 1024 * 1024
+BUCKET = "photos"
+
+
+async def _read(storage, key: str, start: int = 0, end=None) -> bytes:
+    return b"".join([chunk async for chunk in storage.get_stream(key, start, end)])
+
+
+@pytest.fixture
+def local_storage(tmp_path):
+    return LocalPhotoStorage(str(tmp_path))
+
+
+async def test_local_put_leaves_no_temp_files(local_storage, tmp_path):
+    await local_storage.put("ab/cd/photo.jpg", b"photo")
+
+    assert await _read(local_storage, "ab/cd/photo.jpg") == b"photo"
+    assert os.listdir(tmp_path / "ab" / "cd") == ["photo.jpg"]
+    assert os.stat(tmp_path / "ab" / "cd" / "photo.jpg").st_mode & 0o777 == 0o644
+
+
+def test_local_concurrent_writes_use_separate_temp_files(tmp_path, monkeypatch):
+    # Записи переименовывают временные файлы только после того, как все их
+    # записали: с общим именем временного файла записи мешали бы друг другу
+    path = str(tmp_path / "ab" / "cd" / "photo.jpg")
+    barrier = threading.Barrier(4)
+    real_replace = os.replace
+    errors = []
+
+    def waiting_replace(source, destination):
+        barrier.wait(timeout=5)
+        real_replace(source, destination)
+
+    def write(data: bytes) -> None:
+        try:
+            local._write_file(path, data)
+        except Exception as e:
+            errors.append(e)
+
+    monkeypatch.setattr(local.os, "replace", waiting_replace)
+    threads = [threading.Thread(target=write, args=(bytes([number]) * 1000,)) for number in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with open(path, "rb") as file_obj:
+        data = file_obj.read()
+    assert len(data) == 1000 and len(set(data)) == 1
+    assert os.listdir(tmp_path / "ab" / "cd") == ["photo.jpg"]
+
+
+async def test_local_iter_keys_skips_temp_files(local_storage, tmp_path):
+    await local_storage.put("ab/cd/b.jpg", b"b")
+    await local_storage.put("ab/cd/a.jpg", b"a")
+    (tmp_path / "ab" / "cd" / "c.jpg.x1y2.part").write_bytes(b"partial")
+
+    assert [key async for key in local_storage.iter_keys("ab/")] == ["ab/cd/a.jpg", "ab/cd/b.jpg"]
+
+
+@pytest.fixture(scope="module")
+def s3_endpoint():
+    server_module = pytest.importorskip("moto.server")
+    pytest.importorskip("aiobotocore")
+    server = server_module.ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture
+async def s3_storage(s3_endpoint):
+    from src.core.storage.s3 import S3PhotoStorage
+
+    storage = S3PhotoStorage(
+        BUCKET,
+        endpoint_url=s3_endpoint,
+        region="us-east-1",
+        access_key_id="test",
+        secret_access_key="test",
+        prefix="photos/",
+        multipart_threshold=PART_SIZE,
+        multipart_chunk_size=PART_SIZE
+    )
+    client = await storage._get_client()
+    await client.create_bucket(Bucket=BUCKET)
+    yield storage
+    async for key in storage.iter_keys():
+        await storage.delete(key)
+    await client.delete_bucket(Bucket=BUCKET)
+    await storage.close()
+
+
+async def test_s3_put_and_read_small_object(s3_storage):
+    await s3_storage.put("ab/cd/photo.jpg", b"0123456789")
+
+    assert await _read(s3_storage, "ab/cd/photo.jpg") == b"0123456789"
+    assert await _read(s3_storage, "ab/cd/photo.jpg", 2, 4) == b"234"
+    assert (await s3_storage.stat("ab/cd/photo.jpg")).size == 10
+    client = await s3_storage._get_client()
+    head = await client.head_object(Bucket=BUCKET, Key="photos/ab/cd/photo.jpg")
+    assert head["ContentType"] == "image/jpeg"
+
+
+async def test_s3_missing_object(s3_storage):
+    assert await s3_storage.stat("ab/cd/missing.jpg") is None
+    with pytest.raises(FileNotFoundError):
+        await _read(s3_storage, "ab/cd/missing.jpg")
+    await s3_storage.delete("ab/cd/missing.jpg")
+
+
+async def test_s3_put_file_uses_multipart_upload(s3_storage, tmp_path):
+    data = os.urandom(PART_SIZE * 2 + 100)
+    path = tmp_path / "upload.part"
+    path.write_bytes(data)
+
+    await s3_storage.put_file("ab/cd/large.jpg", str(path))
+
+    client = await s3_storage._get_client()
+    head = await client.head_object(Bucket=BUCKET, Key="photos/ab/cd/large.jpg")
+    # ETag объекта из multipart upload оканчивается числом частей
+    assert head["ETag"].strip('"').endswith("-3")
+    assert await _read(s3_storage, "ab/cd/large.jpg") == data
+    assert await _read(s3_storage, "ab/cd/large.jpg", PART_SIZE - 2, PART_SIZE + 1) == data[PART_SIZE - 2:PART_SIZE + 2]
+
+
+async def test_s3_failed_multipart_upload_is_aborted(s3_storage, monkeypatch):
+    client = await s3_storage._get_client()
+
+    async def failing_complete(**kwargs):
+        raise ConnectionError("connection reset")
+
+    monkeypatch.setattr(client, "complete_multipart_upload", failing_complete)
+    with pytest.raises(ConnectionError):
+        await s3_storage.put("ab/cd/large.jpg", bytes(PART_SIZE + 1))
+
+    assert (await client.list_multipart_uploads(Bucket=BUCKET)).get("Uploads", []) == []
+    assert await s3_storage.stat("ab/cd/large.jpg") is None
+
+
+async def test_s3_move_copies_and_deletes_source(s3_storage):
+    await s3_storage.put("tmp/photo.jpg", b"photo")
+
+    await s3_storage.move("tmp/photo.jpg", "ab/cd/photo.jpg")
+
+    assert await s3_storage.stat("tmp/photo.jpg") is None
+    assert await _read(s3_storage, "ab/cd/photo.jpg") == b"photo"
+    with pytest.raises(FileNotFoundError):
+        await s3_storage.move("tmp/photo.jpg", "ab/cd/other.jpg")
+
+
+async def test_s3_iter_keys_strips_prefix(s3_storage):
+    for key in ("ab/cd/b.jpg", "ab/cd/a.jpg", "ef/gh/c.jpg"):
+        await s3_storage.put(key, b"x")
+
+    assert [key async for key in s3_storage.iter_keys("ab/")] == ["ab/cd/a.jpg", "ab/cd/b.jpg"]
@@ -0,0 +1,93 @@
+import io
+import os
+import zipfile
+import pytest
+from src.core.storage.local import LocalPhotoStorage
+from src.core.utils import _ChunkSink, iter_zip_archive
+
+pytestmark = pytest.mark.anyio
+
+CHUNK_SIZE = 1024
+# Бит 3 флагов записи: размеры и CRC записаны в data descriptor после данных
+_DATA_DESCRIPTOR_FLAG = 0x08
+
+
+@pytest.fixture
+async def storage(tmp_path):
+    storage = LocalPhotoStorage(str(tmp_path))
+    await storage.put("ab/cd/photo.jpg", os.urandom(10 * CHUNK_SIZE + 7))
+    await storage.put("ab/cd/notes.txt", b"some text " * 2000)
+    await storage.put("ef/gh/empty.png", b"")
+    return storage
+
+
+async def _collect(storage, photo_paths, **kwargs) -> list[bytes]:
+    return [chunk async for chunk in iter_zip_archive(photo_paths, storage=storage, chunk_size=CHUNK_SIZE, **kwargs)]
+
+
+def test_chunk_sink_is_not_seekable():
+    sink = _ChunkSink()
+
+    assert sink.writable() and not sink.seekable()
+    with pytest.raises(io.UnsupportedOperation):
+        sink.seek(0)
+    sink.write(b"ab")
+    sink.write(memoryview(b"cd"))
+    assert sink.drain() == b"abcd"
+    assert sink.drain() == b""
+
+
+async def test_archive_is_streamed_in_chunks(storage):
+    paths = ["ab/cd/photo.jpg", "ab/cd/notes.txt", "ef/gh/empty.png"]
+
+    chunks = await _collect(storage, paths)
+
+    # Блоки файла отдаются по мере чтения, а не одним архивом в конце
+    assert len(chunks) > 10
+    assert all(chunk for chunk in chunks)
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == ["photo.jpg", "notes.txt", "empty.png"]
+        for path, info in zip(paths, archive.infolist()):
+            assert archive.read(info) == await storage.read(path)
+            # Приемник не перематывается, поэтому размеры пишутся после данных записи
+            assert info.flag_bits & _DATA_DESCRIPTOR_FLAG
+
+
+async def test_precompressed_formats_are_stored(storage):
+    chunks = await _collect(storage, ["ab/cd/photo.jpg", "ab/cd/notes.txt"])
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.getinfo("photo.jpg").compress_type == zipfile.ZIP_STORED
+        assert archive.getinfo("notes.txt").compress_type == zipfile.ZIP_DEFLATED
+
+
+async def test_store_only_disables_compression(storage):
+    chunks = await _collect(storage, ["ab/cd/notes.txt"], store_only=True)
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.getinfo("notes.txt").compress_type == zipfile.ZIP_STORED
+
+
+async def test_missing_files_are_skipped(storage, monkeypatch):
+    stat = storage.stat
+
+    async def stale_stat(key):
+        # Файл удален между запросом размера и чтением
+        if key == "ab/cd/deleted.jpg":
+            return await stat("ab/cd/photo.jpg")
+        return await stat(key)
+
+    monkeypatch.setattr(storage, "stat", stale_stat)
+    chunks = await _collect(storage, ["ab/cd/missing.jpg", "ab/cd/deleted.jpg", "ab/cd/notes.txt"])
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.namelist() == ["notes.txt"]
+        assert archive.testzip() is None
+
+
+async def test_empty_archive(storage):
+    chunks = await _collect(storage, [])
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.namelist() == []